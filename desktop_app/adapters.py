@@ -31,6 +31,14 @@ except ImportError as e:
     def log(*args, **kwargs):
         pass
 
+# Limite d'uploads simultanés partagée par tous les threads de traitement
+# (Préférences > « Uploads simultanés » = processing.concurrent_uploads)
+try:
+    from t2y.pipeline import StageLimiter, load_concurrency
+    _stages = StageLimiter()
+except ImportError:
+    _stages = None
+
 class TikTokDownloader:
     """Adaptateur pour les fonctions de téléchargement TikTok"""
     
@@ -117,15 +125,26 @@ class YouTubeUploader:
                 'profile': self.profile
             }
             
-            # Upload
-            return upload_to_youtube(
-                video_path=video_path,
-                title=title,
-                description=description,
-                privacy=privacy,
-                on_progress=metadata.get('on_progress'),
-                advanced=advanced
-            )
+            # Upload (attend un slot si la limite d'uploads simultanés est atteinte)
+            if _stages is None:
+                return upload_to_youtube(
+                    video_path=video_path,
+                    title=title,
+                    description=description,
+                    privacy=privacy,
+                    on_progress=metadata.get('on_progress'),
+                    advanced=advanced
+                )
+            _stages.resize({'upload': load_concurrency()['upload']})
+            with _stages.slot('upload'):
+                return upload_to_youtube(
+                    video_path=video_path,
+                    title=title,
+                    description=description,
+                    privacy=privacy,
+                    on_progress=metadata.get('on_progress'),
+                    advanced=advanced
+                )
             
         except Exception as e:
             log('error', f"Erreur d'upload: {e}")
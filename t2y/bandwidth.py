@@ -0,0 +1,138 @@
+"""
+Gestionnaire de bande passante du processus (seaux à jetons), partagé par les
+téléchargements TikTok et les uploads YouTube/TikTok.
+
+- Deux budgets séparés: descendant (`down_mbps`) et montant (`up_mbps`), en Mbit/s;
+  0 = illimité.
+- Chaque étape (`download`, `youtube`, `tiktok`) a sa part du budget de son sens
+  (`shares`): une étape est plafonnée à `part × budget` et l'ensemble au budget.
+  Des uploads YouTube en cours ne peuvent donc pas saturer le lien au point
+  d'affamer les uploads TikTok (et inversement).
+- Les transferts paient leurs octets avant ou juste après les avoir envoyés/reçus;
+  un seau peut passer en dette, le transfert suivant attend qu'elle soit résorbée.
+
+Réglages (settings.json):
+`"bandwidth": {"down_mbps": 0, "up_mbps": 0, "shares": {"download": 1.0, "youtube": 0.7, "tiktok": 0.5}}`.
+"""
+from __future__ import annotations
+from typing import Dict, Optional
+import json
+import os
+import threading
+import time
+
+from .config import SETTINGS_FILE
+
+# étape -> sens du trafic
+STAGES = {'download': 'down', 'youtube': 'up', 'tiktok': 'up'}
+DEFAULT_SHARES = {'download': 1.0, 'youtube': 0.7, 'tiktok': 0.5}
+
+
+def load_bandwidth_settings(settings_file=SETTINGS_FILE) -> Dict:
+    conf: Dict = {}
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            conf = (json.load(f) or {}).get('bandwidth') or {}
+    except Exception:
+        conf = {}
+
+    def _float(v, default):
+        try:
+            return max(0.0, float(v if v is not None else default))
+        except Exception:
+            return default
+    shares = dict(DEFAULT_SHARES)
+    for k, v in (conf.get('shares') or {}).items():
+        if k in STAGES:
+            shares[k] = min(1.0, _float(v, shares[k])) or 1.0  # 0: pas de plafond propre à l'étape
+    return {'down_mbps': _float(conf.get('down_mbps'), 0.0), 'up_mbps': _float(conf.get('up_mbps'), 0.0),
+            'shares': shares}
+
+
+class TokenBucket:
+    """Seau à jetons en octets/s; `rate` 0 = illimité."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)  # ~1 s de débit d'avance
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def reserve(self, n: int) -> float:
+        """Débite `n` octets; retourne l'attente (s) avant de pouvoir les transférer."""
+        with self._lock:
+            self.total += n
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= n
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class BandwidthManager:
+    def __init__(self, down_mbps: float = 0.0, up_mbps: float = 0.0, shares: Optional[Dict[str, float]] = None):
+        self.configure(down_mbps, up_mbps, shares)
+
+    def configure(self, down_mbps: float = 0.0, up_mbps: float = 0.0, shares: Optional[Dict[str, float]] = None):
+        budgets = {'down': float(down_mbps) * 125000.0, 'up': float(up_mbps) * 125000.0}  # Mbit/s -> octets/s
+        shares = {**DEFAULT_SHARES, **(shares or {})}
+        self.budgets = budgets
+        self.shares = shares
+        self._global = {d: TokenBucket(rate) for d, rate in budgets.items()}
+        self._stage = {s: TokenBucket(budgets[d] * shares.get(s, 1.0)) for s, d in STAGES.items()}
+
+    def consume(self, stage: str, n: int):
+        """Bloque jusqu'à ce que `n` octets de `stage` tiennent dans sa part et dans le budget global."""
+        if n <= 0 or stage not in STAGES:
+            return
+        wait = max(self._stage[stage].reserve(n), self._global[STAGES[stage]].reserve(n))
+        if wait > 0:
+            time.sleep(wait)
+
+    def limited(self, stage: str) -> bool:
+        return stage in STAGES and (self._stage[stage].rate > 0 or self._global[STAGES[stage]].rate > 0)
+
+    def snapshot(self) -> Dict:
+        return {
+            'down_mbps': self.budgets['down'] / 125000.0,
+            'up_mbps': self.budgets['up'] / 125000.0,
+            'shares': dict(self.shares),
+            'bytes': {s: b.total for s, b in self._stage.items()},
+        }
+
+
+class ThrottledFile:
+    """Fichier en lecture dont chaque bloc lu est payé auprès du gestionnaire (corps de requête HTTP).
+
+    `__len__` permet à `requests` de poser un Content-Length au lieu d'un envoi chunked.
+    """
+
+    def __init__(self, path: str, stage: str, bandwidth: Optional[BandwidthManager] = None):
+        self._f = open(path, 'rb')
+        self._size = os.path.getsize(path)
+        self.stage = stage
+        self.bandwidth = bandwidth or manager
+
+    def __len__(self) -> int:
+        return self._size
+
+    def read(self, n: int = -1) -> bytes:
+        data = self._f.read(n)
+        self.bandwidth.consume(self.stage, len(data))
+        return data
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+manager = BandwidthManager(**load_bandwidth_settings())
@@ -0,0 +1,152 @@
+"""
+Import en masse d'URLs (CSV / TXT / JSONL), lu en flux.
+
+- TXT: une URL par ligne, `url[,titre]` accepté.
+- CSV: `url,titre` positionnel, ou en-tête avec colonnes `url,title,description,tags,privacy,priority`.
+- JSONL: un objet par ligne (`{"url": ..., "title": ..., "tags": [...]}`) ou une URL en chaîne JSON.
+
+Les entrées sont produites une à une (mémoire bornée) puis regroupées en lots par
+l'appelant, qui les écrit en une transaction par lot.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+import csv
+import io
+import json
+
+from .validators import sanitize_tags_500
+
+FORMATS = ('csv', 'txt', 'jsonl')
+BATCH_SIZE = 500
+
+
+def detect_format(name: str = '', first_line: str = '') -> str:
+    n = (name or '').lower()
+    for fmt in FORMATS:
+        if n.endswith('.' + fmt):
+            return fmt
+    if n.endswith('.json') or first_line.lstrip().startswith(('{', '"')):
+        return 'jsonl'
+    return 'txt'
+
+
+def normalize_url(url: str) -> str:
+    """Clé de déduplication: sans espaces, fragment ni slash final."""
+    u = (url or '').strip()
+    u = u.split('#', 1)[0]
+    return u.rstrip('/')
+
+
+def _to_tags(v) -> List[str]:
+    if v is None:
+        return []
+    if isinstance(v, list):
+        return [str(x) for x in v]
+    return [t for t in str(v).replace('|', ',').split(',')]
+
+
+def _entry(url, title='', description='', tags=None, privacy=None, priority=None) -> Optional[Dict]:
+    url = (url or '').strip() if isinstance(url, str) else ''
+    if not url:
+        return None
+    e = {
+        'url': url,
+        'title': (title or '').strip() if isinstance(title, str) else '',
+        'description': (description or '').strip() if isinstance(description, str) else '',
+        'tags': sanitize_tags_500(_to_tags(tags)),
+    }
+    if privacy:
+        e['privacy'] = str(privacy).strip()
+    if priority:
+        e['priority'] = str(priority).strip().lower()
+    return e
+
+
+def _skip(stats: Optional[Dict]):
+    if stats is not None:
+        stats['skipped'] = stats.get('skipped', 0) + 1
+
+
+def iter_entries(lines: Iterable[str], fmt: str = 'txt', stats: Optional[Dict] = None) -> Iterator[Dict]:
+    """Produit les entrées valides d'un flux de lignes; les lignes invalides sont ignorées
+    et comptées dans `stats['skipped']`."""
+    if fmt == 'jsonl':
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except Exception:
+                _skip(stats)
+                continue
+            if isinstance(obj, str):
+                e = _entry(obj)
+            elif isinstance(obj, dict):
+                e = _entry(obj.get('url'), obj.get('title'), obj.get('description'), obj.get('tags'),
+                           obj.get('privacy'), obj.get('priority'))
+            else:
+                e = None
+            if e:
+                yield e
+            else:
+                _skip(stats)
+    elif fmt == 'csv':
+        header = None
+        for row in csv.reader(lines):
+            if not row:
+                continue
+            if header is None and any(c.strip().lower() == 'url' for c in row):
+                header = [c.strip().lower() for c in row]
+                continue
+            if header:
+                d = dict(zip(header, row))
+                e = _entry(d.get('url'), d.get('title'), d.get('description'), d.get('tags'),
+                           d.get('privacy'), d.get('priority'))
+            else:
+                e = _entry(row[0], row[1] if len(row) > 1 else '')
+            if e:
+                yield e
+            elif any(c.strip() for c in row):
+                _skip(stats)
+    else:
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            url, _, title = line.partition(',')
+            e = _entry(url, title)
+            if e:
+                yield e
+            else:
+                _skip(stats)
+
+
+def dedupe(entries: Iterable[Dict], seen: Set[str], stats: Optional[Dict] = None) -> Iterator[Dict]:
+    """Filtre les URLs déjà vues (`seen` est complété au fil de l'eau)."""
+    for e in entries:
+        key = normalize_url(e['url'])
+        if key in seen:
+            if stats is not None:
+                stats['duplicates'] = stats.get('duplicates', 0) + 1
+            continue
+        seen.add(key)
+        yield e
+
+
+def batched(entries: Iterable[Dict], size: int = BATCH_SIZE) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for e in entries:
+        batch.append(e)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def open_lines(path: str) -> Iterator[str]:
+    """Lignes d'un fichier texte (UTF-8, BOM toléré), lues en flux."""
+    with io.open(path, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+        for line in f:
+            yield line
@@ -0,0 +1,98 @@
+"""
+Journal de versions de la file (en mémoire) pour l'API delta.
+
+Chaque mutation d'item incrémente un compteur monotone et enregistre une copie
+de l'item à cette version (instantané lu par l'API, jamais le dict que le worker
+est en train de modifier). Les entrées sont gardées dans l'ordre des versions:
+`since(n)` ne parcourt que ce qui a changé après `n` (coût ∝ activité, pas ∝ taille
+de la file). Les suppressions laissent une pierre tombale, en nombre borné; un client
+plus ancien que la plus vieille pierre tombale oubliée doit tout recharger (`reset`).
+
+Les versions d'un processus partent de son époque (heure de démarrage en µs): une
+version obtenue avant un redémarrage est sous le plancher, le client recharge tout au
+lieu de recevoir un delta faux. Elles restent des entiers exacts en JavaScript (< 2^53).
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import threading
+import time
+
+MAX_TOMBSTONES = 10000
+
+
+def new_epoch() -> int:
+    return int(time.time() * 1_000_000)
+
+
+class ChangeLog:
+    def __init__(self, max_tombstones: int = MAX_TOMBSTONES, epoch: Optional[int] = None):
+        self._lock = threading.Lock()
+        # iid -> (version, instantané ou None si supprimé), ordonné par version
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.epoch = new_epoch() if epoch is None else int(epoch)
+        self._version = self.epoch
+        # versions < floor: delta incomplet (autre processus, pierres tombales oubliées)
+        self._floor = self.epoch
+        self._tombstones = 0
+        self.max_tombstones = int(max_tombstones or MAX_TOMBSTONES)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def touch(self, iid: str, snapshot: Dict) -> int:
+        with self._lock:
+            self._version += 1
+            old = self._entries.pop(iid, None)
+            if old is not None and old[1] is None:
+                self._tombstones -= 1
+            self._entries[iid] = (self._version, snapshot)
+            return self._version
+
+    def remove(self, iid: str) -> int:
+        with self._lock:
+            self._version += 1
+            old = self._entries.pop(iid, None)
+            if old is None or old[1] is not None:
+                self._tombstones += 1
+            self._entries[iid] = (self._version, None)
+            if self._tombstones > self.max_tombstones:
+                self._prune()
+            return self._version
+
+    def _prune(self):
+        # oublier les plus vieilles pierres tombales (les items vivants restent)
+        for iid in list(self._entries):
+            if self._tombstones <= self.max_tombstones // 2:
+                break
+            ver, snap = self._entries[iid]
+            if snap is None:
+                del self._entries[iid]
+                self._tombstones -= 1
+                self._floor = max(self._floor, ver)
+
+    def since(self, version: int, limit: Optional[int] = None) -> Dict:
+        """Items modifiés et iids supprimés après `version` (du plus ancien au plus récent)."""
+        with self._lock:
+            cur = self._version
+            if version < self._floor or version > cur:
+                return {'version': cur, 'epoch': self.epoch, 'reset': True, 'items': [], 'removed': []}
+            changed: List[tuple] = []
+            for iid in reversed(self._entries):
+                ver, snap = self._entries[iid]
+                if ver <= version:
+                    break
+                changed.append((ver, iid, snap))
+        changed.reverse()
+        if limit and len(changed) > limit:
+            # page partielle: le client repart de la version du dernier élément renvoyé
+            changed = changed[:limit]
+            cur = changed[-1][0]
+        return {
+            'version': cur,
+            'epoch': self.epoch,
+            'reset': False,
+            'items': [snap for _, _, snap in changed if snap is not None],
+            'removed': [iid for _, iid, snap in changed if snap is None],
+        }
@@ -1,24 +1,111 @@
-import os, tempfile
+import copy, os
+from http.cookies import SimpleCookie
 
 try:
     import yt_dlp  # type: ignore
 except Exception:
     yt_dlp = None
 
+from .ydl_pool import pool as ydl_pool
+from .metadata import info_expired
+from .logger import log
+from .source_cache import get_cache, video_id_from_url
+from .segmented import download_ranged, load_segmented_settings
+from .bandwidth import manager as bandwidth
+from .workdir import scratch_dir
+from .formats import FormatPolicy, format_policy
 
-def download_tiktok_with_info(url: str, timeout=None, proxy=None, on_progress=None):
+
+def _download_segmented(ydl, url, ie, tmpdir, conf, timeout, proxy, on_progress):
+    """Télécharge le format choisi par requêtes Range parallèles quand c'est une URL directe.
+
+    Retourne (chemin, info résolue) en cas de succès, sinon (None, info à passer au chemin
+    yt-dlp habituel: l'extraction faite ici n'est pas perdue).
+    """
+    try:
+        raw = ie if ie is not None else ydl.extract_info(url, download=False)
+        sel = ydl.process_ie_result(copy.deepcopy(raw), download=False)
+    except Exception as e:
+        log('info', f'download: résolution pour le mode segmenté échouée ({e})')
+        return None, ie
+    if sel.get('requested_formats') or sel.get('protocol') not in ('http', 'https') or not sel.get('url'):
+        return None, raw
+    dest = os.path.join(tmpdir, f"{sel.get('id') or 'video'}.{sel.get('ext') or 'mp4'}")
+    headers = dict(sel.get('http_headers') or {})
+    cookies = None
+    if sel.get('cookies'):
+        jar = SimpleCookie()
+        jar.load(sel['cookies'])
+        headers['Cookie'] = '; '.join(f'{k}={m.value}' for k, m in jar.items())
+    else:
+        cookies = getattr(ydl, 'cookiejar', None)
+    try:
+        ok = download_ranged(sel['url'], dest, headers=headers, cookies=cookies, proxy=proxy,
+                             timeout=float(timeout or 30), connections=conf['connections'],
+                             min_bytes=int(conf['min_mb'] * 1024 ** 2), on_progress=on_progress,
+                             throttle=lambda n: bandwidth.consume('download', n))
+    except Exception as e:
+        log('info', f'download: mode segmenté échoué ({e}), repli sur yt-dlp')
+        return None, raw
+    return (dest, sel) if ok else (None, raw)
+
+
+def download_tiktok_with_info(url: str, timeout=None, proxy=None, on_progress=None, info=None, workdir=None,
+                              policy: FormatPolicy = None):
     """
     Télécharge une vidéo TikTok via yt_dlp.
     - Retourne (path, info) où path est le chemin du fichier vidéo téléchargé et info contient au moins 'duration' si disponible.
+    - `info`: extraction compacte déjà faite (`metadata.compact_info`); si ses URLs sont encore
+      valides, le téléchargement part de là (`process_ie_result`) sans ré-extraire la page.
+      En cas d'échec (URLs expirées/refusées), repli sur une extraction complète.
+    - Une vidéo déjà présente dans le cache de sources (par id TikTok) dans un format accepté par
+      `policy` n'est pas retéléchargée: le fichier retourné est un lien vers l'entrée du cache,
+      que l'appelant peut supprimer.
+    - `workdir`: dossier stable (par item) au lieu d'un dossier temporaire neuf (sous la racine de travail): un `.part`
+      laissé par un essai interrompu (crash, timeout, redémarrage) y est repris.
+    - Si le format choisi est une URL directe et que le CDN accepte les requêtes Range, le fichier
+      est téléchargé en plusieurs connexions parallèles (`segmented`), sinon par yt-dlp.
+    - Le débit reçu est prélevé sur le budget descendant partagé (`bandwidth`, étape `download`).
+    - `policy`: choix du format selon le traitement prévu (`formats.format_policy(adv)`); par défaut
+      H.264/AAC jusqu'à 1080x1920, pour qu'un remux suffise (`policy.accepts` pour le cache de sources).
     - Lève une RuntimeError si yt_dlp est indisponible ou si le téléchargement échoue.
     """
+    if workdir:
+        os.makedirs(workdir, exist_ok=True)
+    policy = policy or format_policy()
+    cache = get_cache()
+    vid = video_id_from_url(url) or ((info or {}).get('id') if isinstance(info, dict) else None)
+    if cache is not None and vid:
+        hit = cache.get(vid, accept=policy.accepts)
+        if hit is not None:
+            try:
+                path = cache.checkout(hit[0], workdir or scratch_dir())
+                log('info', f'download: {vid} servi depuis le cache de sources')
+                if on_progress:
+                    on_progress(100)
+                duration = hit[1].get('duration')
+                return path, ({'duration': duration} if duration else {})
+            except Exception as e:
+                log('error', f'download: lecture du cache échouée ({e}), téléchargement')
+
     if yt_dlp is None:
         raise RuntimeError("yt_dlp non disponible pour le téléchargement")
 
-    tmpdir = tempfile.mkdtemp(prefix='t2y_')
+    tmpdir = workdir or scratch_dir()
     outtmpl = os.path.join(tmpdir, '%(id)s.%(ext)s')
 
+    throttled = bandwidth.limited('download')
+    seen = {}
+
     def _hook(d):
+        if throttled and d.get('status') == 'downloading':
+            # payer les octets reçus depuis le dernier appel: bloquer le hook ralentit la boucle de yt-dlp
+            key = d.get('filename') or d.get('tmpfilename') or ''
+            done = d.get('downloaded_bytes') or 0
+            last = seen.get(key)
+            seen[key] = done
+            if last is not None and done > last:
+                bandwidth.consume('download', done - last)
         if on_progress and d.get('status') == 'downloading':
             try:
                 total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
@@ -34,42 +121,70 @@ def download_tiktok_with_info(url: str, timeout=None, proxy=None, on_progress=No
                 pass
 
     ydl_opts = {
-        'outtmpl': outtmpl,
         'noplaylist': True,
         'quiet': True,
         'no_warnings': True,
         'ignoreerrors': False,
         'socket_timeout': float(timeout or 30),
         'retries': 3,
-        'progress_hooks': [_hook] if on_progress else [],
-        # Essayer d’obtenir directement un MP4 pour éviter un merge (ffmpeg requis sinon)
-        'format': 'mp4/best',
+        # reprendre les .part d'un essai précédent (dossier stable par item)
+        'continuedl': True,
+        'nopart': False,
+        # Un seul fichier audio+vidéo (pas de merge), classé selon le traitement prévu (voir formats.py)
+        'format': policy,
     }
     if proxy:
         ydl_opts['proxy'] = proxy
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=True)
-        # Récupérer le chemin résultant
+    # instance réutilisée (cookies/connexions) pour ce profil d'options; outtmpl et hook propres à l'appel
+    seg_conf = load_segmented_settings()
+    with ydl_pool.get(ydl_opts, outtmpl=outtmpl, hook=_hook if (on_progress or throttled) else None) as ydl:
+        ie = None
+        if info and not info_expired(info):
+            ie = copy.deepcopy(info)
+            ie.pop('_t2y_expires', None)
+            ie.pop('_t2y_extracted_at', None)
+            ie.setdefault('webpage_url', url)
         path = None
-        try:
-            # requested_downloads est plus fiable si présent
-            rd = info.get('requested_downloads') or []
-            if rd:
-                path = rd[0].get('filepath')
-        except Exception:
-            path = None
-        if not path:
+        if seg_conf['enabled']:
+            path, ie = _download_segmented(ydl, url, ie, tmpdir, seg_conf, timeout, proxy, on_progress)
+        if path is not None:
+            info = ie
+        else:
+            result = None
+            if ie is not None:
+                try:
+                    result = ydl.process_ie_result(ie, download=True)
+                except Exception as e:
+                    log('info', f'download: info en cache inutilisable ({e}), nouvelle extraction')
+                    result = None
+            info = result or ydl.extract_info(url, download=True)
+            # Récupérer le chemin résultant
             try:
-                path = ydl.prepare_filename(info)
+                # requested_downloads est plus fiable si présent
+                rd = info.get('requested_downloads') or []
+                if rd:
+                    path = rd[0].get('filepath')
             except Exception:
                 path = None
+            if not path:
+                try:
+                    path = ydl.prepare_filename(info)
+                except Exception:
+                    path = None
         if not path or not os.path.exists(path):
             raise RuntimeError('Téléchargement TikTok échoué: fichier introuvable')
+        if info.get('format_id'):
+            log('info', f"download: format {info.get('format_id')} ({info.get('vcodec')}/{info.get('acodec')}, "
+                        f"{info.get('width')}x{info.get('height')}) [{policy.key}]")
         # Extraire durée si possible
         duration = None
         try:
             duration = int(info.get('duration') or 0) or None
         except Exception:
             duration = None
+        if cache is not None and (vid or info.get('id')):
+            # format réel du fichier: une autre politique pourra le réutiliser s'il lui convient
+            fmt = {k: info.get(k) for k in ('vcodec', 'acodec', 'width', 'height', 'ext', 'dynamic_range')}
+            cache.put(vid or str(info.get('id')), path, {'duration': duration, 'policy': policy.key, **fmt})
         return path, ({'duration': duration} if duration else {})
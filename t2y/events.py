@@ -0,0 +1,156 @@
+"""
+Bus d'événements pour le flux SSE de la webapp (`/api/events`).
+
+Les threads (workers, watcher, logger) publient; chaque client SSE est un abonné
+avec sa propre file asyncio bornée, alimentée via `call_soon_threadsafe`.
+
+- Les mises à jour d'item sont limitées à une par `min_interval` et par item:
+  les pourcentages intermédiaires sont fusionnés et envoyés par le thread de
+  purge; un changement de statut part immédiatement.
+- Un abonné trop lent (file pleine) reçoit `resync` et doit recharger par l'API.
+- Le thread de purge dort sur une condition: réveillé par une publication ou une mise à
+  jour en attente, il ne tourne jamais à vide (ni sans abonné, ni file au repos).
+"""
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional
+import asyncio
+import threading
+import time
+
+MIN_INTERVAL = 0.25
+SUBSCRIBER_QUEUE = 1000
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.lagged = False
+
+    def _put(self, event: Dict):
+        if self.lagged:
+            if not self.queue.empty():
+                return
+            self.lagged = False  # `resync` consommé: le client a rechargé, reprendre le flux
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # vider et demander une resynchronisation complète plutôt que perdre des deltas en silence
+            self.lagged = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'event': 'resync', 'data': {}})
+
+    def push(self, event: Dict):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # boucle fermée: l'abonné sera retiré par son générateur
+
+
+class EventBus:
+    def __init__(self, min_interval: float = MIN_INTERVAL, maxsize: int = SUBSCRIBER_QUEUE):
+        self.min_interval = float(min_interval)
+        self.maxsize = int(maxsize)
+        self._lock = threading.Lock()
+        # réveil du thread de purge (même verrou que l'état du bus)
+        self._cv = threading.Condition(self._lock)
+        # publication depuis le dernier tour: `on_tick` peut avoir du nouveau à envoyer
+        self._dirty = False
+        self._subs: List[_Subscriber] = []
+        # iid -> (dernier envoi, dernier statut envoyé)
+        self._sent: Dict[str, tuple] = {}
+        # iid -> (instantané, version) en attente (débit limité)
+        self._pending: Dict[str, tuple] = {}
+        self._flusher: Optional[threading.Thread] = None
+        # appelé à chaque tour du thread de purge (résumés périodiques côté appelant)
+        self.on_tick: Optional[Callable[[], None]] = None
+
+    # --- abonnés ---
+    def subscribe(self) -> _Subscriber:
+        sub = _Subscriber(asyncio.get_running_loop(), self.maxsize)
+        with self._lock:
+            self._subs.append(sub)
+            self._signal()
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+        return sub
+
+    def unsubscribe(self, sub: _Subscriber):
+        with self._lock:
+            try:
+                self._subs.remove(sub)
+            except ValueError:
+                pass
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subs)
+
+    def _signal(self):
+        # verrou tenu
+        self._dirty = True
+        self._cv.notify()
+
+    def wake(self):
+        """Demande un tour de purge (état résumé par `on_tick` modifié sans publication)."""
+        with self._lock:
+            if self._subs:
+                self._signal()
+
+    # --- publication ---
+    def publish(self, event: str, data, id: Optional[int] = None):
+        with self._lock:
+            subs = list(self._subs)
+            if subs:
+                self._signal()
+        if not subs:
+            return
+        ev = {'event': event, 'data': data, 'id': id}
+        for sub in subs:
+            sub.push(ev)
+
+    def item(self, iid: str, snapshot: Dict, version: int):
+        """Mise à jour d'item, limitée par item (sauf changement de statut)."""
+        if not self._subs:
+            return
+        now = time.monotonic()
+        status = snapshot.get('status')
+        with self._lock:
+            last, last_status = self._sent.get(iid, (0.0, None))
+            if status == last_status and now - last < self.min_interval:
+                self._pending[iid] = (snapshot, version)
+                self._signal()
+                return
+            self._pending.pop(iid, None)
+            self._sent[iid] = (now, status)
+        self.publish('item', snapshot, id=version)
+
+    def removed(self, iid: str, version: int):
+        with self._lock:
+            self._pending.pop(iid, None)
+            self._sent.pop(iid, None)
+        self.publish('removed', {'iid': iid}, id=version)
+
+    def _flush_loop(self):
+        while True:
+            with self._cv:
+                # au repos (aucun abonné ou rien de neuf): attente sans réveil périodique
+                while not (self._subs and (self._dirty or self._pending)):
+                    self._cv.wait()
+                self._dirty = False
+            # regroupe les mises à jour du tour (débit limité par item)
+            time.sleep(self.min_interval)
+            now = time.monotonic()
+            with self._lock:
+                due = list(self._pending.items())
+                self._pending.clear()
+                for iid, (snap, _) in due:
+                    self._sent[iid] = (now, snap.get('status'))
+            for iid, (snap, version) in due:
+                self.publish('item', snap, id=version)
+            if self.on_tick is not None and self._subs:
+                try:
+                    self.on_tick()
+                except Exception:
+                    pass
@@ -0,0 +1,56 @@
+"""
+Verrous de fichier inter-processus (flock sous POSIX, msvcrt sous Windows).
+
+Le verrou porte sur un fichier `.lock` dédié; il est libéré à la fermeture du
+fichier, y compris par le système si le processus meurt.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def try_lock(f: IO) -> bool:
+    """Verrou exclusif non bloquant sur `f`; False s'il est tenu ailleurs."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _lock(f: IO):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # réessaie ~10 s puis OSError
+            return
+        except OSError:
+            continue
+
+
+@contextmanager
+def locked(path: str) -> Iterator[None]:
+    """Section critique partagée par tous les processus qui verrouillent `path` (bloquant)."""
+    with open(path, 'a+') as f:
+        _lock(f)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
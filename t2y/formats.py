@@ -0,0 +1,135 @@
+"""
+Choix du format source selon le traitement prévu pour l'item.
+
+`mp4/best` prend le « meilleur » format au sens de yt-dlp, souvent un HEVC/bytevc1
+plus lourd que nécessaire: l'étape ffmpeg finit alors par un remux qui échoue puis un
+ré-encodage libx264 complet (`.enc.mp4`). Ici les formats sont classés selon le plan:
+
+- `copy` (aucun filtre ffmpeg, au plus un remux `-c copy`): H.264 + AAC en MP4 (SDR,
+  donc yuv420p) d'abord, puis la plus grande résolution qui tient dans `ff_target_w/h`,
+  puis le plus petit fichier.
+- `encode` (recadrage/padding, normalisation audio, filigrane, découpe sans remux):
+  le codec source importe peu; la plus petite résolution qui ne force pas d'agrandissement
+  vers la cible, puis le plus petit fichier (moins d'octets à télécharger et à décoder).
+
+La politique est passée à yt-dlp comme sélecteur (`format` appelable); sa représentation
+est stable, donc une politique = un profil du pool `ydl_pool`. `accepts` dit si un fichier
+déjà téléchargé pour une autre politique (cache de sources) convient quand même.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+H264 = ('avc1', 'avc', 'h264')
+AAC = ('mp4a', 'aac')
+DEFAULT_TARGET = (1080, 1920)
+
+
+def processing_plan(adv: Optional[Dict]) -> str:
+    """`encode` si l'étape ffmpeg ré-encodera la vidéo quelle que soit la source, sinon `copy`."""
+    adv = adv if isinstance(adv, dict) else {}
+    ff_mode = str(adv.get('ff_mode') or 'none').strip().lower()
+    trim = str(adv.get('ff_trim_start') or '').strip() or str(adv.get('ff_trim_end') or '').strip()
+    if ff_mode != 'none' or adv.get('ff_normalize') or str(adv.get('ff_wm_path') or '').strip():
+        return 'encode'
+    # découpe sans remux: ffmpeg ré-encode avec ses codecs par défaut
+    if trim and not adv.get('ff_remux'):
+        return 'encode'
+    return 'copy'
+
+
+def _codec(v) -> str:
+    return str(v or '').lower()
+
+
+def _filesize(f: Dict) -> float:
+    return float(f.get('filesize') or f.get('filesize_approx') or 0)
+
+
+def _weight(f: Dict, by_size: bool) -> float:
+    """Poids du format: taille si tous les candidats la donnent, sinon débit (même durée pour tous)."""
+    w = _filesize(f) if by_size else float(f.get('tbr') or 0)
+    return w or float('inf')  # inconnu: classé après les poids connus
+
+
+def _complete(f: Dict) -> bool:
+    # None = inconnu (fréquent chez TikTok): considéré comme présent
+    return _codec(f.get('vcodec')) != 'none' and _codec(f.get('acodec')) != 'none'
+
+
+class FormatPolicy:
+    def __init__(self, plan: str = 'copy', target_w: int = DEFAULT_TARGET[0], target_h: int = DEFAULT_TARGET[1]):
+        self.plan = plan if plan in ('copy', 'encode') else 'copy'
+        self.target_w = int(target_w)
+        self.target_h = int(target_h)
+        self._short, self._long = sorted((self.target_w, self.target_h))
+
+    @property
+    def key(self) -> str:
+        """Identifiant stable (profil du pool yt-dlp, noté dans le cache de sources)."""
+        return f'{self.plan}-{self.target_w}x{self.target_h}'
+
+    def __repr__(self) -> str:
+        # sert de clé de profil au pool YoutubeDL: ne doit pas dépendre de l'adresse de l'objet
+        return f'FormatPolicy({self.key})'
+
+    def _compat(self, f: Dict) -> Tuple[int, int, int, int]:
+        v, a = _codec(f.get('vcodec')), _codec(f.get('acodec'))
+        return (int(v.startswith(H264)), int(not a or a.startswith(AAC)),
+                int((f.get('ext') or '') == 'mp4'), int((f.get('dynamic_range') or 'SDR') == 'SDR'))
+
+    def score(self, f: Dict, by_size: bool = True) -> Tuple:
+        """Clé de tri (plus grand = meilleur)."""
+        w, h = int(f.get('width') or 0), int(f.get('height') or 0)
+        short, long_ = sorted((w, h))
+        area = w * h
+        if self.plan == 'copy':
+            fits = short <= self._short and long_ <= self._long
+            return (self._compat(f), int(fits), area if fits else -area, -_weight(f, by_size))
+        # encode: pas d'agrandissement (côté court >= cible), au plus près de la cible
+        above = short >= self._short if short else False
+        return (int(above), -area if above else area, -_weight(f, by_size), self._compat(f))
+
+    def accepts(self, fmt: Dict) -> bool:
+        """Un fichier déjà téléchargé au format `fmt` (codecs, dimensions) convient-il au plan?
+
+        `encode` ré-encode quel que soit la source; `copy` exige ce que le remux conserve:
+        H.264/AAC en MP4 SDR, dans la cible. Format inconnu: seulement s'il vient de cette politique.
+        """
+        if fmt.get('policy') == self.key or self.plan == 'encode':
+            return True
+        if not fmt.get('vcodec'):
+            return False
+        w, h = int(fmt.get('width') or 0), int(fmt.get('height') or 0)
+        short, long_ = sorted((w, h))
+        return all(self._compat(fmt)) and short <= self._short and long_ <= self._long
+
+    def rank(self, formats: List[Dict]) -> List[Dict]:
+        complete = [f for f in formats if _complete(f)]
+        by_size = all(_filesize(f) for f in complete)
+        return sorted(complete, key=lambda f: self.score(f, by_size), reverse=True)
+
+    def __call__(self, ctx: Dict) -> Iterator[Dict]:
+        """Sélecteur yt-dlp: reçoit `{'formats': [...], ...}`, produit le format à télécharger."""
+        formats = ctx.get('formats') or []
+        ranked = self.rank(formats)
+        if ranked:
+            yield ranked[0]
+        elif formats:
+            yield formats[-1]  # aucun format audio+vidéo: le meilleur de yt-dlp (liste triée du pire au meilleur)
+
+
+@lru_cache(maxsize=32)
+def _policy(plan: str, target_w: int, target_h: int) -> FormatPolicy:
+    return FormatPolicy(plan, target_w, target_h)
+
+
+def format_policy(adv: Optional[Dict] = None) -> FormatPolicy:
+    """Politique de format d'un item d'après ses options avancées (instance partagée par plan/cible)."""
+    adv = adv if isinstance(adv, dict) else {}
+    try:
+        tw = int(adv.get('ff_target_w') or DEFAULT_TARGET[0])
+        th = int(adv.get('ff_target_h') or DEFAULT_TARGET[1])
+    except Exception:
+        tw, th = DEFAULT_TARGET
+    return _policy(processing_plan(adv), tw, th)
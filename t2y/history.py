@@ -0,0 +1,186 @@
+"""
+Historique des items terminés: segments JSONL compressés (gzip), en ajout seul.
+
+Les items terminés quittent la file active (automatiquement après N minutes ou
+quand la file dépasse une taille) et sont ajoutés au segment courant de
+`history/`. Chaque ajout écrit un membre gzip à la fin du fichier (un fichier gzip
+peut en contenir plusieurs); un segment plein est clos et un nouveau est ouvert.
+La lecture parcourt les segments du plus récent au plus ancien, avec filtres et
+curseur de pagination.
+
+Réglages (settings.json):
+    "history": {"archive_after_min": 60, "max_live": 1000, "segment_items": 5000}
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional
+import gzip
+import json
+import os
+import threading
+import time
+
+from .config import CONFIG_DIR, SETTINGS_FILE
+from .logger import log
+
+HISTORY_DIR = CONFIG_DIR / 'history'
+# Champs volatils inutiles dans l'historique
+_DROP_KEYS = ('d_pct', 'u_pct', 'f_pct', 'ie_info')
+
+
+def load_history_settings(settings_file=SETTINGS_FILE) -> Dict:
+    conf: Dict = {}
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            conf = (json.load(f) or {}).get('history') or {}
+    except Exception:
+        conf = {}
+
+    def _num(k, default):
+        try:
+            v = conf.get(k)
+            return default if v is None else max(0, float(v))
+        except Exception:
+            return default
+    return {
+        'archive_after_min': _num('archive_after_min', 60.0),
+        'max_live': int(_num('max_live', 1000)),
+        'segment_items': int(_num('segment_items', 5000)) or 5000,
+    }
+
+
+class HistoryStore:
+    def __init__(self, directory=HISTORY_DIR, segment_items: int = 5000):
+        self.dir = str(directory)
+        self.segment_items = int(segment_items or 5000)
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        self._current: Optional[str] = None
+        self._current_count = 0
+        segs = self.segments()
+        if segs:
+            # reprendre le dernier segment s'il n'est pas plein
+            last = segs[0]
+            n = sum(1 for _ in self._read_segment(last))
+            if n < self.segment_items:
+                self._current, self._current_count = last, n
+
+    # --- écriture ---
+    def segments(self) -> List[str]:
+        """Noms des segments, du plus récent au plus ancien."""
+        try:
+            names = [n for n in os.listdir(self.dir) if n.startswith('history-') and n.endswith('.jsonl.gz')]
+        except FileNotFoundError:
+            names = []
+        return sorted(names, reverse=True)
+
+    def _new_segment(self) -> str:
+        base = time.strftime('history-%Y%m%d-%H%M%S')
+        i = 0
+        while os.path.exists(os.path.join(self.dir, f'{base}-{i:03d}.jsonl.gz')):
+            i += 1
+        return f'{base}-{i:03d}.jsonl.gz'
+
+    def append(self, items: Iterable[Dict]) -> int:
+        now = time.time()
+        recs = []
+        for it in items:
+            rec = {k: v for k, v in it.items() if k not in _DROP_KEYS}
+            rec['archived_at'] = now
+            recs.append(rec)
+        if not recs:
+            return 0
+        with self._lock:
+            i = 0
+            while i < len(recs):
+                if self._current is None or self._current_count >= self.segment_items:
+                    self._current, self._current_count = self._new_segment(), 0
+                room = self.segment_items - self._current_count
+                chunk = recs[i:i + room]
+                data = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in chunk).encode('utf-8')
+                # un membre gzip par ajout: le fichier reste lisible même après un crash en cours d'écriture
+                with open(os.path.join(self.dir, self._current), 'ab') as f:
+                    f.write(gzip.compress(data))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._current_count += len(chunk)
+                i += len(chunk)
+        return len(recs)
+
+    # --- lecture ---
+    def _read_segment(self, name: str) -> List[Dict]:
+        out = []
+        try:
+            with gzip.open(os.path.join(self.dir, name), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        out.append(json.loads(line))
+                    except Exception:
+                        continue
+        except (EOFError, OSError) as e:
+            # membre final tronqué: garder ce qui a pu être lu
+            log('error', f'history: segment {name} partiellement lisible: {e}')
+        except Exception as e:
+            log('error', f'history: lecture {name} échouée: {e}')
+        return out
+
+    @staticmethod
+    def _match(rec: Dict, status: Optional[str], q: Optional[str], dest: Optional[str],
+               since: Optional[float], until: Optional[float]) -> bool:
+        if status and (rec.get('status') or '') != status:
+            return False
+        results = rec.get('results') or {}
+        if dest and not results.get(dest):
+            return False
+        ts = rec.get('finished_at') or rec.get('archived_at') or 0
+        if since and ts < since:
+            return False
+        if until and ts > until:
+            return False
+        if q:
+            ql = q.lower()
+            hay = ' '.join(str(x) for x in (rec.get('iid'), rec.get('url'), rec.get('title'), rec.get('result'),
+                                            *results.values()) if x)
+            if ql not in hay.lower():
+                return False
+        return True
+
+    def query(self, limit: int = 50, cursor: str = '', status: Optional[str] = None, q: Optional[str] = None,
+              dest: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None) -> Dict:
+        """Page d'historique (plus récent d'abord). `cursor` = 'segment:index' renvoyé par la page précédente."""
+        limit = max(1, min(int(limit or 50), 500))
+        seg_from, idx_from = '', -1
+        if cursor:
+            seg_from, _, idx = cursor.rpartition(':')
+            try:
+                idx_from = int(idx)
+            except Exception:
+                seg_from, idx_from = '', -1
+        items: List[Dict] = []
+        next_cursor = ''
+        for name in self.segments():
+            if seg_from and name > seg_from:
+                continue
+            recs = self._read_segment(name)
+            start = len(recs) - 1
+            if seg_from and name == seg_from:
+                start = idx_from - 1
+            for i in range(start, -1, -1):
+                if not self._match(recs[i], status, q, dest, since, until):
+                    continue
+                if len(items) >= limit:
+                    next_cursor = f'{name}:{i + 1}'
+                    break
+                items.append(recs[i])
+            if next_cursor:
+                break
+        return {'items': items, 'next_cursor': next_cursor}
+
+    def stats(self) -> Dict:
+        segs = self.segments()
+        size = 0
+        for n in segs:
+            try:
+                size += os.path.getsize(os.path.join(self.dir, n))
+            except Exception:
+                pass
+        return {'segments': len(segs), 'bytes': size}
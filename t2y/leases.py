@@ -0,0 +1,115 @@
+"""
+Baux d'items partagés entre plusieurs processus workers (backend SQLite).
+
+Chaque processus a un `owner` unique. Un item pris en bail n'est traité que par
+lui; un thread prolonge les baux tenus (heartbeat) et remet en attente les items
+dont le bail a expiré (processus mort, crash pendant un téléchargement...).
+"""
+from __future__ import annotations
+from typing import Dict, Optional
+import os
+import socket
+import threading
+
+from .logger import log
+
+DEFAULT_TTL = 120.0
+
+
+def make_owner(name: str = '') -> str:
+    return f"{socket.gethostname()}:{os.getpid()}{(':' + name) if name else ''}"
+
+
+def supports_leases(store) -> bool:
+    return store is not None and hasattr(store, 'lease_next')
+
+
+class LeaseKeeper:
+    def __init__(self, store, owner: Optional[str] = None, ttl: float = DEFAULT_TTL):
+        self.store = store
+        self.owner = owner or make_owner()
+        self.ttl = float(ttl or DEFAULT_TTL)
+        self._lock = threading.Lock()
+        self._held: Dict[str, bool] = {}
+        # Baux refusés au heartbeat (item repris ailleurs): le pipeline abandonne ces items
+        self._lost = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # --- prise / libération ---
+    def lease_next(self, profile: Optional[str] = None) -> Optional[Dict]:
+        it = self.store.lease_next(self.owner, self.ttl, profile=profile)
+        if it is not None:
+            with self._lock:
+                self._held[it['iid']] = True
+                self._lost.discard(it['iid'])
+        return it
+
+    def acquire(self, iid: str) -> bool:
+        if not self.store.acquire(iid, self.owner, self.ttl):
+            return False
+        with self._lock:
+            self._held[iid] = True
+            self._lost.discard(iid)
+        return True
+
+    def release(self, iid: str):
+        with self._lock:
+            self._held.pop(iid, None)
+            self._lost.discard(iid)
+        try:
+            self.store.release(iid, self.owner)
+        except Exception as e:
+            log('error', f'lease: libération {iid} échouée: {e}')
+
+    def hold(self, iid: str, until: float):
+        """Rend l'item et le réserve jusqu'à `until` (repris ensuite par n'importe quel worker)."""
+        with self._lock:
+            self._held.pop(iid, None)
+        try:
+            self.store.hold(iid, until)
+        except Exception as e:
+            log('error', f'lease: réservation {iid} échouée: {e}')
+
+    def held(self):
+        with self._lock:
+            return list(self._held.keys())
+
+    def lost(self, iid: str) -> bool:
+        """Vrai si le bail de `iid` a été refusé au heartbeat depuis sa prise."""
+        with self._lock:
+            return iid in self._lost
+
+    # --- heartbeat + reprise des baux expirés ---
+    def reclaim(self) -> int:
+        try:
+            n = self.store.reclaim_expired()
+            if n:
+                log('info', f'lease: {n} item(s) bloqué(s) remis en attente')
+            return n
+        except Exception as e:
+            log('error', f'lease: reprise échouée: {e}')
+            return 0
+
+    def beat(self):
+        """Prolonge les baux tenus; ceux que la base refuse passent dans `lost`."""
+        try:
+            lost = self.store.heartbeat(self.held(), self.owner, self.ttl)
+            for iid in lost:
+                log('error', f'lease: bail perdu pour {iid} (repris par un autre worker?)')
+                with self._lock:
+                    if self._held.pop(iid, None) is not None:
+                        self._lost.add(iid)
+        except Exception as e:
+            log('error', f'lease: heartbeat échoué: {e}')
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 3.0):
+            self.beat()
+            self.reclaim()
+
+    def close(self):
+        self._stop.set()
+        for iid in self.held():
+            self.release(iid)
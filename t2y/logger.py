@@ -1,10 +1,19 @@
 from .config import LOG_FILE
 from datetime import datetime
 
+# Abonnés aux nouvelles lignes (flux SSE de la webapp)
+_listeners = []
+
+def add_listener(fn):
+    _listeners.append(fn)
+
 def log(level: str, message: str):
     try:
         ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        line = f"[{ts}] {level.upper()}: {message}\n"
         with open(LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(f"[{ts}] {level.upper()}: {message}\n")
+            f.write(line)
+        for fn in list(_listeners):
+            fn(line)
     except Exception:
         pass
@@ -0,0 +1,185 @@
+"""
+Cache persistant (SQLite) des métadonnées TikTok de `fetch_tiktok_metadata`.
+
+Préremplir deux fois la même URL ou relancer un watcher sur un profil de
+500 vidéos ne ré-extrait plus chaque page: le résultat est servi depuis
+`meta_cache.db` tant qu'il n'a pas dépassé `ttl_h`.
+
+- Clé: id de vidéo TikTok (`id:<id>`), à défaut l'URL normalisée (liens courts);
+  après extraction, l'entrée est aussi rangée sous l'id réel.
+- Taille bornée: au-delà de `max_entries`, les entrées les moins récemment
+  utilisées sont supprimées.
+- Anti-emballement: des appels concurrents pour la même clé n'extraient qu'une
+  fois (les suivants attendent le résultat du premier, dans le processus).
+
+Réglages (settings.json): `"meta_cache": {"enabled": true, "ttl_h": 24, "max_entries": 20000}`.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, Optional
+import json
+import sqlite3
+import threading
+import time
+
+from .bulk_import import normalize_url
+from .config import CONFIG_DIR, SETTINGS_FILE
+from .logger import log
+from .source_cache import video_id_from_url
+
+META_DB = CONFIG_DIR / 'meta_cache.db'
+# une éviction toutes les N écritures (COUNT + DELETE évités à chaque put)
+_EVICT_EVERY = 100
+
+
+def load_meta_cache_settings(settings_file=SETTINGS_FILE) -> Dict:
+    conf: Dict = {}
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            conf = (json.load(f) or {}).get('meta_cache') or {}
+    except Exception:
+        conf = {}
+    try:
+        ttl_h = max(0.0, float(conf.get('ttl_h') if conf.get('ttl_h') is not None else 24))
+    except Exception:
+        ttl_h = 24.0
+    try:
+        max_entries = max(1, int(conf.get('max_entries') or 20000))
+    except Exception:
+        max_entries = 20000
+    return {'enabled': bool(conf.get('enabled', True)), 'ttl_h': ttl_h, 'max_entries': max_entries}
+
+
+def cache_key(url: str) -> Optional[str]:
+    vid = video_id_from_url(url)
+    if vid:
+        return f'id:{vid}'
+    u = normalize_url(url)
+    return f'url:{u}' if u else None
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Dict] = None
+
+
+class MetaCache:
+    def __init__(self, path=META_DB, ttl_h: float = 24.0, max_entries: int = 20000):
+        self.path = str(path)
+        self.ttl = float(ttl_h) * 3600.0
+        self.max_entries = int(max_entries)
+        self._lock = threading.RLock()
+        self._flights: Dict[str, _Flight] = {}
+        self._puts = 0
+        self.stats = {'hits': 0, 'misses': 0, 'shared': 0}
+        CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS meta ('
+            ' k TEXT PRIMARY KEY,'
+            ' data TEXT NOT NULL,'
+            ' fetched_at REAL NOT NULL,'
+            ' used_at REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS meta_used ON meta(used_at)')
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Entrée encore valide (TTL) ou None; marque l'entrée comme récemment utilisée."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT data, fetched_at FROM meta WHERE k=?', (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl and row[1] + self.ttl < now:
+                self._db.execute('DELETE FROM meta WHERE k=?', (key,))
+                return None
+            self._db.execute('UPDATE meta SET used_at=? WHERE k=?', (now, key))
+        try:
+            return json.loads(row[0])
+        except Exception:
+            return None
+
+    def put(self, keys, meta: Dict):
+        now = time.time()
+        data = json.dumps(meta, ensure_ascii=False)
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO meta (k, data, fetched_at, used_at) VALUES (?, ?, ?, ?)',
+                                 [(k, data, now, now) for k in keys if k])
+            self._puts += 1
+            if self._puts % _EVICT_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        n = self._db.execute('SELECT COUNT(*) FROM meta').fetchone()[0]
+        if n > self.max_entries:
+            self._db.execute('DELETE FROM meta WHERE k IN (SELECT k FROM meta ORDER BY used_at LIMIT ?)',
+                             (n - self.max_entries,))
+            log('info', f'meta_cache: {n - self.max_entries} entrée(s) évincée(s)')
+
+    def invalidate(self, url: str):
+        key = cache_key(url)
+        if key:
+            with self._lock:
+                self._db.execute('DELETE FROM meta WHERE k=?', (key,))
+
+    def fetch(self, url: str, loader: Callable[[], Optional[Dict]]) -> Optional[Dict]:
+        """Métadonnées de `url` depuis le cache, sinon via `loader()` (un seul appel par clé à la fois)."""
+        key = cache_key(url)
+        if not key:
+            return loader()
+        meta = self.get(key)
+        if meta is not None:
+            self.stats['hits'] += 1
+            return meta
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            # même URL déjà en cours d'extraction: attendre son résultat
+            self.stats['shared'] += 1
+            flight.done.wait()
+            return flight.result
+        self.stats['misses'] += 1
+        try:
+            meta = loader()
+            flight.result = meta
+            if meta is not None:
+                vid = str(((meta.get('info') or {}).get('id')) or '')
+                try:
+                    self.put([key, f'id:{vid}' if vid.isdigit() else None], meta)
+                except Exception as e:
+                    log('error', f'meta_cache: écriture {key} échouée: {e}')
+            return meta
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            n = self._db.execute('SELECT COUNT(*) FROM meta').fetchone()[0]
+        return {**self.stats, 'entries': n, 'max_entries': self.max_entries, 'ttl_h': self.ttl / 3600.0}
+
+
+_cache: Optional[MetaCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_meta_cache() -> Optional[MetaCache]:
+    """Cache partagé du processus (None si désactivé dans les réglages)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            conf = load_meta_cache_settings()
+            if not conf['enabled']:
+                return None
+            try:
+                _cache = MetaCache(ttl_h=conf['ttl_h'], max_entries=conf['max_entries'])
+            except Exception as e:
+                log('error', f'meta_cache: initialisation échouée: {e}')
+                return None
+        return _cache
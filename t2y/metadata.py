@@ -6,12 +6,62 @@ def fetch_tiktok_metadata(url: str) -> dict:
         'hashtags': [],
         'duration': 30,
     }
-import yt_dlp
 from typing import Optional, Dict, List
+from urllib.parse import parse_qs, urlparse
+import copy
 import re
+import time
 
+from .ydl_pool import pool as ydl_pool
+from .meta_cache import get_meta_cache
 
-def fetch_tiktok_metadata(url: str) -> Optional[Dict[str, str | List[str] | int]]:
+# Durée de validité supposée des URLs de formats sans paramètre d'expiration
+INFO_TTL = 1800.0
+# Champs gardés pour relancer un téléchargement via `process_ie_result` sans ré-extraction
+_INFO_KEYS = ('id', 'title', 'ext', 'duration', 'extractor', 'extractor_key', 'webpage_url',
+              'webpage_url_basename', 'webpage_url_domain', 'original_url', 'display_id',
+              'http_headers', 'timestamp', 'uploader', 'uploader_id')
+_FORMAT_KEYS = ('format_id', 'format_note', 'url', 'ext', 'protocol', 'http_headers', 'cookies',
+                'vcodec', 'acodec', 'width', 'height', 'fps', 'tbr', 'vbr', 'abr', 'filesize',
+                'filesize_approx', 'quality', 'preference', 'source_preference', 'format', 'dynamic_range')
+
+
+def _url_expiry(url: str) -> Optional[float]:
+    try:
+        qs = parse_qs(urlparse(url).query)
+        for k in ('expire', 'x-expires', 'Expires'):
+            if qs.get(k):
+                return float(qs[k][0])
+    except Exception:
+        pass
+    return None
+
+
+def compact_info(info: Dict) -> Optional[Dict]:
+    """Forme compacte (JSON) d'un résultat `extract_info`, avec l'échéance de ses URLs de formats."""
+    if not isinstance(info, dict) or info.get('_type', 'video') != 'video' or not info.get('formats'):
+        return None
+    out = {k: info[k] for k in _INFO_KEYS if info.get(k) is not None}
+    out['formats'] = [{k: f[k] for k in _FORMAT_KEYS if f.get(k) is not None}
+                      for f in info['formats'] if isinstance(f, dict) and f.get('url')]
+    if not out['formats']:
+        return None
+    now = time.time()
+    expiries = [e for e in (_url_expiry(f['url']) for f in out['formats']) if e]
+    out['_t2y_expires'] = min(expiries) if expiries else now + INFO_TTL
+    out['_t2y_extracted_at'] = now
+    return out
+
+
+def info_expired(info: Optional[Dict], margin: float = 120.0) -> bool:
+    try:
+        return not info or time.time() + margin >= float(info.get('_t2y_expires') or 0)
+    except Exception:
+        return True
+
+
+def fetch_tiktok_metadata(url: str, with_info: bool = False,
+                          use_cache: bool = True) -> Optional[Dict[str, str | List[str] | int]]:
     """Récupère les métadonnées principales d'une URL TikTok sans télécharger la vidéo.
 
     Retourne un dict avec: {
@@ -20,10 +70,26 @@ def fetch_tiktok_metadata(url: str) -> Optional[Dict[str, str | List[str] | int]
         'thumbnail': str | None,
         'hashtags': List[str] | [],
         'duration': int | None
-    } ou None si échec.
+    } ou None si échec. Avec `with_info`, ajoute 'info': forme compacte de l'extraction,
+    réutilisable par `download_tiktok_with_info(info=...)` (voir `compact_info`); None si
+    l'extraction servie par le cache a des URLs expirées (le téléchargement ré-extraira).
+    Les résultats sont mis en cache par id de vidéo (`meta_cache`), sauf `use_cache=False`.
     """
+    cache = get_meta_cache() if use_cache else None
+    meta = cache.fetch(url, lambda: _extract_metadata(url)) if cache is not None else _extract_metadata(url)
+    if meta is None:
+        return None
+    meta = copy.deepcopy(meta)  # l'entrée peut être partagée entre appelants concurrents
+    info = meta.pop('info', None)
+    if with_info:
+        meta['info'] = None if info_expired(info) else info
+    return meta
+
+
+def _extract_metadata(url: str) -> Optional[Dict]:
+    """Extraction yt-dlp (toujours avec la forme compacte: c'est elle qui est mise en cache)."""
     try:
-        with yt_dlp.YoutubeDL({"quiet": True}) as ydl:
+        with ydl_pool.get({"quiet": True}) as ydl:
             info = ydl.extract_info(url, download=False)
         if not info:
             return None
@@ -49,12 +115,14 @@ def fetch_tiktok_metadata(url: str) -> Optional[Dict[str, str | List[str] | int]
             if ct and ct.lower() not in seen:
                 seen.add(ct.lower())
                 hashtags.append(ct)
-        return {
+        meta = {
             "title": info.get("title"),
             "description": info.get("description") or "",
             "thumbnail": info.get("thumbnail"),
             "hashtags": hashtags,
             "duration": info.get("duration") if isinstance(info.get("duration"), (int, float)) else None,
         }
+        meta["info"] = compact_info(info)
+        return meta
     except Exception:
         return None
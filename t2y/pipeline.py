@@ -0,0 +1,169 @@
+"""
+Concurrence par étape du pipeline (téléchargement → ffmpeg → upload).
+
+Chaque étape a sa propre limite de slots; plusieurs items peuvent ainsi avancer
+en parallèle (ex: 4 téléchargements, N-1 cœurs ffmpeg, 2 uploads) au lieu d'un
+seul item de bout en bout.
+
+Configuration (settings.json):
+    "concurrency": {"download": 4, "ffmpeg": "auto", "upload": 2, "workers": 0}
+`ffmpeg: "auto"` = nombre de cœurs - 1; `workers: 0` = max des limites.
+À défaut, `processing.concurrent_uploads` de l'app desktop fixe la limite d'upload.
+
+Mode pipeline (chevauchement des étapes, même sans concurrence):
+    "pipeline": {"enabled": true, "lookahead": 2, "max_temp_gb": 4}
+L'item n+1 se télécharge pendant l'upload de l'item n, avec au plus `lookahead`
+items d'avance et `max_temp_gb` de fichiers temporaires en attente.
+"""
+from __future__ import annotations
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+import json
+import os
+import threading
+
+from .config import SETTINGS_FILE
+
+STAGES = ('download', 'ffmpeg', 'upload')
+DESKTOP_CONFIG_FILE = Path.home() / '.tiktok-to-youtube-desktop' / 'config.json'
+
+
+def _cpu_auto() -> int:
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def _to_limit(v, default: int) -> int:
+    if isinstance(v, str) and v.strip().lower() == 'auto':
+        return _cpu_auto()
+    try:
+        n = int(v)
+        return n if n > 0 else default
+    except Exception:
+        return default
+
+
+def load_concurrency(settings_file=SETTINGS_FILE, desktop_file=DESKTOP_CONFIG_FILE) -> Dict[str, int]:
+    """Limites par étape (+ `workers`). Défaut: 1/1/1, soit le comportement séquentiel historique."""
+    conf: Dict = {}
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            conf = (json.load(f) or {}).get('concurrency') or {}
+    except Exception:
+        conf = {}
+    upload_default = 1
+    try:
+        with open(desktop_file, 'r', encoding='utf-8') as f:
+            d = json.load(f) or {}
+        upload_default = _to_limit((d.get('processing') or {}).get('concurrent_uploads'), 1)
+    except Exception:
+        pass
+    limits = {
+        'download': _to_limit(conf.get('download'), 1),
+        'ffmpeg': _to_limit(conf.get('ffmpeg'), 1),
+        'upload': _to_limit(conf.get('upload'), upload_default),
+    }
+    limits['workers'] = _to_limit(conf.get('workers'), max(limits[s] for s in STAGES))
+    return limits
+
+
+def load_pipeline(settings_file=SETTINGS_FILE) -> Dict:
+    conf: Dict = {}
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            conf = (json.load(f) or {}).get('pipeline') or {}
+    except Exception:
+        conf = {}
+    try:
+        max_gb = float(conf.get('max_temp_gb') or 4)
+    except Exception:
+        max_gb = 4.0
+    return {
+        'enabled': bool(conf.get('enabled')),
+        'lookahead': _to_limit(conf.get('lookahead'), 2),
+        'max_temp_gb': max_gb,
+    }
+
+
+class PrefetchGate:
+    """Borne le volume de fichiers temporaires des items téléchargés d'avance.
+
+    Un item n'entre que si le total des octets en attente est sous la limite;
+    le premier item en vol passe toujours (pas d'interblocage).
+    """
+
+    def __init__(self, max_bytes: int = 0):
+        self._cv = threading.Condition()
+        self.max_bytes = int(max_bytes or 0)
+        self._bytes: Dict[str, int] = {}
+
+    def enter(self, key: str, should_continue=lambda: True) -> bool:
+        """Attend une place; False (item non entré) si `should_continue()` devient faux pendant l'attente."""
+        with self._cv:
+            while self.max_bytes and self._bytes and sum(self._bytes.values()) >= self.max_bytes:
+                if not should_continue():
+                    return False
+                self._cv.wait()
+            self._bytes[key] = 0
+            return True
+
+    def wake(self):
+        """Réveille les attentes pour réévaluer `should_continue` (ex: arrêt de la file)."""
+        with self._cv:
+            self._cv.notify_all()
+
+    def set_bytes(self, key: str, n: int):
+        with self._cv:
+            if key in self._bytes:
+                self._bytes[key] = int(n or 0)
+
+    def leave(self, key: str):
+        with self._cv:
+            self._bytes.pop(key, None)
+            self._cv.notify_all()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._cv:
+            return {'items': len(self._bytes), 'bytes': sum(self._bytes.values()), 'max_bytes': self.max_bytes}
+
+
+class StageLimiter:
+    """Slots par étape, redimensionnables à chaud (Condition + compteurs)."""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self._cv = threading.Condition()
+        self._limits = {s: 1 for s in STAGES}
+        self._active = {s: 0 for s in STAGES}
+        # Files d'attente FIFO: les items passent les étapes dans leur ordre d'arrivée
+        self._waiters = {s: deque() for s in STAGES}
+        if limits:
+            self.resize(limits)
+
+    def resize(self, limits: Dict[str, int]):
+        with self._cv:
+            for s in STAGES:
+                if s in limits:
+                    self._limits[s] = max(1, int(limits[s] or 1))
+            self._cv.notify_all()
+
+    @contextmanager
+    def slot(self, stage: str):
+        token = object()
+        with self._cv:
+            self._waiters[stage].append(token)
+            while self._waiters[stage][0] is not token or self._active[stage] >= self._limits[stage]:
+                self._cv.wait()
+            self._waiters[stage].popleft()
+            self._active[stage] += 1
+            self._cv.notify_all()
+        try:
+            yield
+        finally:
+            with self._cv:
+                self._active[stage] -= 1
+                self._cv.notify_all()
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._cv:
+            return {s: {'active': self._active[s], 'limit': self._limits[s], 'waiting': len(self._waiters[s])} for s in STAGES}
@@ -0,0 +1,64 @@
+"""
+Registre de progression volatile (en mémoire), indexé par iid d'item.
+
+Les pourcentages (`d_pct` téléchargement, `f_pct` ffmpeg, `u_pct` upload) changent
+des centaines de fois par item: ils ne sont plus écrits dans la file persistée.
+Seules les transitions de statut sont sauvegardées; l'API/UI lit la progression ici.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, Optional
+import threading
+
+PCT_KEYS = ('d_pct', 'u_pct', 'f_pct')
+
+
+class ProgressRegistry:
+    def __init__(self, on_change: Optional[Callable[[str], None]] = None):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, int]] = {}
+        # appelé (hors verrou) avec l'iid quand une valeur change
+        self.on_change = on_change
+
+    def set(self, iid: str, **pcts) -> bool:
+        """Met à jour les pourcentages fournis. Retourne True si une valeur a changé."""
+        changed = False
+        with self._lock:
+            cur = self._data.setdefault(iid, {})
+            for k, v in pcts.items():
+                if k not in PCT_KEYS or v is None:
+                    continue
+                try:
+                    v = int(max(0, min(100, float(v))))
+                except Exception:
+                    continue
+                if cur.get(k) != v:
+                    cur[k] = v
+                    changed = True
+        if changed and self.on_change is not None:
+            self.on_change(iid)
+        return changed
+
+    def get(self, iid: str) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._data.get(iid) or {})
+
+    def clear(self, iid: str):
+        with self._lock:
+            self._data.pop(iid, None)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._data.items()}
+
+    def merged(self, item: Dict) -> Dict[str, int]:
+        """Pourcentages d'un item: registre si connu, sinon valeurs persistées (ou 100 si terminé)."""
+        cur = self.get(item.get('iid') or '')
+        done = (item.get('status') or '') == 'terminé'
+        out = {}
+        for k in PCT_KEYS:
+            if k in cur:
+                out[k] = cur[k]
+            else:
+                v = item.get(k) or 0
+                out[k] = 100 if (done and k != 'f_pct' and not v) else v
+        return out
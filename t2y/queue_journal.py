@@ -0,0 +1,329 @@
+"""
+File d'attente en mode journal (JSONL append-only) + snapshot compacté.
+
+Chaque opération (`put`, `update`, `delete`, `swap`...) ajoute une petite ligne à
+`queue.journal.jsonl`: persister un changement coûte O(1) quelle que soit la taille
+de la file. Un thread de compaction replie périodiquement le journal dans
+`queue.snapshot.json`. Au démarrage: snapshot + rejeu de la fin du journal
+(les événements déjà inclus dans le snapshot sont ignorés grâce à `seq`).
+
+Compaction: sous le verrou, seulement une copie des items et la rotation du journal
+(`queue.journal.jsonl` → `.old`, nouveau journal vide); l'écriture et le fsync du snapshot
+se font hors verrou, puis `.old` est supprimé. Un crash entre les deux rejoue `.old`.
+Rejeu: une dernière ligne tronquée (crash pendant l'écriture) est coupée; une ligne
+corrompue au milieu est ignorée (et signalée), les suivantes sont rejouées.
+
+Un seul processus par journal: chaque processus garde sa propre copie de la file et
+réécrit le snapshot depuis celle-ci. Un verrou exclusif (`queue.journal.jsonl.lock`,
+flock / msvcrt) est pris à l'ouverture; un second processus reçoit `JournalLockedError`.
+Pour partager la file entre l'app Tk, la webapp et des workers: backend SQLite.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional
+import json
+import os
+import shutil
+import threading
+
+from .config import CONFIG_DIR
+from .filelock import try_lock
+from .logger import log
+
+QUEUE_JSON = CONFIG_DIR / 'queue.json'
+SNAPSHOT_FILE = CONFIG_DIR / 'queue.snapshot.json'
+JOURNAL_FILE = CONFIG_DIR / 'queue.journal.jsonl'
+
+
+class JournalLockedError(RuntimeError):
+    """Le journal est déjà ouvert par un autre processus."""
+
+
+class JournalQueueStore:
+    """Même interface que `SqliteQueueStore`, persistée en journal JSONL."""
+
+    def __init__(self, snapshot_path=SNAPSHOT_FILE, journal_path=JOURNAL_FILE, compact_every: float = 60.0, compact_min_events: int = 200):
+        self.snapshot_path = str(snapshot_path)
+        self.journal_path = str(journal_path)
+        self.compact_every = float(compact_every)
+        self.compact_min_events = int(compact_min_events)
+        self._lock = threading.RLock()
+        # une compaction à la fois (thread de compaction, close)
+        self._compact_lock = threading.Lock()
+        self._items: Dict[str, Dict] = {}
+        self._order: List[str] = []
+        self._seq = 0
+        self._pending = 0  # événements depuis la dernière compaction
+        self._meta: Dict[str, str] = {}
+        CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+        # un seul processus par journal: deux copies en mémoire s'écraseraient à la compaction
+        self._lockf = open(self.journal_path + '.lock', 'a+')
+        if not try_lock(self._lockf):
+            self._lockf.close()
+            raise JournalLockedError(f'{self.journal_path} déjà ouvert par un autre processus '
+                                     f'(backend journal mono-processus; utiliser T2Y_QUEUE_BACKEND=sqlite)')
+        self._replay()
+        self._fp = open(self.journal_path, 'a', encoding='utf-8')
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._compactor, daemon=True)
+        self._thread.start()
+
+    # --- relecture ---
+    def _replay(self):
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snap = json.load(f)
+            self._seq = int(snap.get('seq') or 0)
+            self._meta = dict(snap.get('meta') or {})
+            for it in snap.get('items') or []:
+                iid = it.get('iid')
+                if iid and iid not in self._items:
+                    self._items[iid] = it
+                    self._order.append(iid)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log('error', f'queue journal: snapshot illisible: {e}')
+        # journal mis de côté par une compaction interrompue, puis journal courant
+        self._replay_journal(self._old_path, cut_tail=False)
+        self._replay_journal(self.journal_path, cut_tail=True)
+
+    @property
+    def _old_path(self) -> str:
+        return self.journal_path + '.old'
+
+    def _replay_journal(self, path: str, cut_tail: bool):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        lines = data.split(b'\n')
+        # après le dernier saut de ligne: vide, ou ligne incomplète (crash pendant l'écriture)
+        tail = lines.pop()
+        offset = 0
+        bad = []  # (début de la ligne, fin de la ligne) des lignes illisibles
+        for raw in lines:
+            start, offset = offset, offset + len(raw) + 1
+            if not raw.strip():
+                continue
+            try:
+                ev = json.loads(raw.decode('utf-8'))
+                seq = int(ev.get('seq') or 0)
+            except Exception:
+                bad.append((start, offset))
+                continue
+            if seq <= self._seq:
+                continue
+            self._apply(ev)
+            self._seq = seq
+            self._pending += 1
+        cut = None
+        if tail.strip():
+            cut = offset
+        elif bad and bad[-1][1] == offset:
+            # la dernière ligne complète est illisible: même traitement qu'une fin tronquée
+            cut = bad.pop()[0]
+        if bad:
+            log('error', f'queue journal: {len(bad)} ligne(s) corrompue(s) ignorée(s) dans {path}')
+        if cut is not None and cut_tail:
+            # couper la fin corrompue pour que les prochains ajouts restent relisibles
+            with open(path, 'r+b') as f:
+                f.truncate(cut)
+            log('error', f'queue journal: fin tronquée ignorée ({path})')
+
+    def _apply(self, ev: Dict):
+        op = ev.get('op')
+        if op == 'put':
+            it = ev.get('item') or {}
+            iid = it.get('iid')
+            if not iid:
+                return
+            if iid not in self._items:
+                self._order.append(iid)
+            self._items[iid] = it
+        elif op == 'put_many':
+            for it in ev.get('items') or []:
+                iid = it.get('iid')
+                if not iid:
+                    continue
+                if iid not in self._items:
+                    self._order.append(iid)
+                self._items[iid] = it
+        elif op == 'update':
+            it = self._items.get(ev.get('iid'))
+            if it is not None:
+                it.update(ev.get('fields') or {})
+        elif op == 'delete':
+            for iid in ev.get('iids') or []:
+                if self._items.pop(iid, None) is not None:
+                    try:
+                        self._order.remove(iid)
+                    except ValueError:
+                        pass
+        elif op == 'swap':
+            a, b = ev.get('a'), ev.get('b')
+            try:
+                ia, ib = self._order.index(a), self._order.index(b)
+                self._order[ia], self._order[ib] = b, a
+            except ValueError:
+                pass
+        elif op == 'replace':
+            self._items.clear()
+            self._order.clear()
+            for it in ev.get('items') or []:
+                iid = it.get('iid')
+                if iid and iid not in self._items:
+                    self._items[iid] = it
+                    self._order.append(iid)
+        elif op == 'meta':
+            self._meta[str(ev.get('k'))] = str(ev.get('v'))
+
+    def _append(self, ev: Dict):
+        with self._lock:
+            self._seq += 1
+            ev['seq'] = self._seq
+            line = json.dumps(ev, ensure_ascii=False)
+            # appliquer une copie: le miroir ne partage rien avec les dicts de l'appelant
+            self._apply(json.loads(line))
+            self._fp.write(line + '\n')
+            self._fp.flush()
+            self._pending += 1
+
+    # --- compaction ---
+    def compact(self):
+        """Replie le journal dans le snapshot puis supprime le journal replié."""
+        with self._compact_lock:
+            with self._lock:
+                # copies superficielles: `_apply` remplace les valeurs, il ne modifie jamais
+                # un dict imbriqué en place
+                snap = {
+                    'seq': self._seq,
+                    'meta': dict(self._meta),
+                    'items': [dict(self._items[i]) for i in self._order],
+                }
+                self._rotate()
+                self._pending = 0
+            # sérialisation + fsync hors verrou: les écritures continuent dans le nouveau journal
+            tmp = self.snapshot_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(snap, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.snapshot_path)
+            # Un crash avant cette ligne est sans effet: `.old` est rejoué, seq <= snapshot.seq ignorés
+            try:
+                os.remove(self._old_path)
+            except FileNotFoundError:
+                pass
+
+    def _rotate(self):
+        """Met le journal courant de côté (`.old`) et en ouvre un vide (verrou tenu)."""
+        self._fp.close()
+        if os.path.exists(self._old_path):
+            # compaction précédente inachevée: `.old` n'est pas encore couvert par un snapshot
+            with open(self.journal_path, 'rb') as src, open(self._old_path, 'ab') as dst:
+                shutil.copyfileobj(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self._old_path)
+        self._fp = open(self.journal_path, 'a', encoding='utf-8')
+
+    def _compactor(self):
+        while not self._stop.wait(self.compact_every):
+            try:
+                if self._pending >= self.compact_min_events or (self._pending and os.path.getsize(self.journal_path) > 4 * 1024 * 1024):
+                    self.compact()
+            except Exception as e:
+                log('error', f'queue journal: compaction échouée: {e}')
+
+    def close(self):
+        self._stop.set()
+        try:
+            self.compact()
+        except Exception:
+            pass
+        self._unlock()
+
+    def _unlock(self):
+        # fermer le fichier libère le verrou (flock comme msvcrt)
+        try:
+            self._lockf.close()
+        except Exception:
+            pass
+
+    # --- interface store ---
+    def get_meta(self, k: str) -> Optional[str]:
+        with self._lock:
+            return self._meta.get(k)
+
+    def set_meta(self, k: str, v: str):
+        self._append({'op': 'meta', 'k': k, 'v': v})
+
+    def load(self) -> List[Dict]:
+        with self._lock:
+            return [json.loads(json.dumps(self._items[i])) for i in self._order]
+
+    def replace_all(self, items: Iterable[Dict]):
+        self._append({'op': 'replace', 'items': list(items)})
+
+    def put(self, item: Dict):
+        self._append({'op': 'put', 'item': item})
+
+    def put_many(self, items: Iterable[Dict]):
+        items = list(items)
+        if items:
+            self._append({'op': 'put_many', 'items': items})
+
+    def update(self, iid: str, fields: Dict):
+        if fields:
+            self._append({'op': 'update', 'iid': iid, 'fields': fields})
+
+    def delete(self, iid: str):
+        self._append({'op': 'delete', 'iids': [iid]})
+
+    def delete_many(self, iids: Iterable[str]):
+        iids = list(iids)
+        if iids:
+            self._append({'op': 'delete', 'iids': iids})
+
+    def swap(self, iid_a: str, iid_b: str):
+        self._append({'op': 'swap', 'a': iid_a, 'b': iid_b})
+
+    # --- compat queue.json ---
+    def import_json(self, path=QUEUE_JSON) -> int:
+        with open(path, 'r', encoding='utf-8') as f:
+            items = json.load(f)
+        n = 0
+        for it in items or []:
+            if not isinstance(it, dict):
+                continue
+            iid = it.get('iid') or f'item_{len(self._items)+1}'
+            if iid in self._items:
+                continue
+            it['iid'] = iid
+            self.put(it)
+            n += 1
+        return n
+
+    def export_json(self, path=QUEUE_JSON) -> int:
+        items = self.load()
+        tmp = str(path) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        return len(items)
+
+    def migrate_from_json(self, path=QUEUE_JSON):
+        if self._meta.get('json_imported'):
+            return 0
+        n = 0
+        try:
+            if os.path.exists(path):
+                n = self.import_json(path)
+                log('info', f'queue: {n} item(s) importé(s) depuis {path}')
+        except Exception as e:
+            log('error', f'queue: import {path} échoué: {e}')
+        self._append({'op': 'meta', 'k': 'json_imported', 'v': '1'})
+        return n
@@ -0,0 +1,349 @@
+"""
+Modèle de file indexé: dict par iid, liste d'ordre et deque des items prêts.
+
+- Recherche par iid en O(1) (plus de parcours linéaire de la liste).
+- Le worker dépile les items prêts en O(1) et ne revoit jamais les terminés.
+- Identifiants monotones (`item_<n>`): plus de collision après suppression.
+
+Ordonnancement (settings.json `"scheduler": {"mode": "deadline", "horizon_h": 12}`):
+- `fifo` (défaut): ordre de la liste.
+- `deadline`: un item dont `adv.publishAt` tombe dans l'horizon passe en premier
+  (échéance la plus proche d'abord), puis par classe de priorité
+  `urgent` > `normal` (ajout manuel) > `bulk` (surveillance), puis ordre de la liste.
+"""
+from __future__ import annotations
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import heapq
+import json
+import re
+import threading
+import time
+
+from .config import SETTINGS_FILE
+from .validators import parse_rfc3339
+
+# Statuts non dispatchables automatiquement (les erreurs repartent via resume_errors)
+IDLE_STATUSES = ('terminé', 'erreur')
+# Tous les statuts d'item, dans l'ordre du cycle de vie (filtres de l'UI)
+STATUSES = ('en attente', 'en cours', 'attente espace disque', 'téléchargement', 'pré-traitement vidéo',
+            'préparation pour YouTube', 'upload', 'quota', 'terminé', 'erreur')
+
+SCHED_MODES = ('fifo', 'deadline')
+PRIORITIES = ('urgent', 'normal', 'bulk')
+
+_ID_RE = re.compile(r'^item_(\d+)$')
+
+
+def iid_number(iid: str) -> int:
+    m = _ID_RE.match(iid or '')
+    return int(m.group(1)) if m else 0
+
+
+def load_scheduler(settings_file=SETTINGS_FILE) -> Dict:
+    conf: Dict = {}
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            conf = (json.load(f) or {}).get('scheduler') or {}
+    except Exception:
+        conf = {}
+    mode = str(conf.get('mode') or 'fifo').strip().lower()
+    try:
+        horizon_h = max(0.0, float(conf.get('horizon_h') if conf.get('horizon_h') is not None else 12))
+    except Exception:
+        horizon_h = 12.0
+    return {'mode': mode if mode in SCHED_MODES else 'fifo', 'horizon_h': horizon_h}
+
+
+def item_priority(item: Dict) -> str:
+    p = str(item.get('priority') or 'normal').strip().lower()
+    return p if p in PRIORITIES else 'normal'
+
+
+def item_deadline(item: Dict) -> Optional[float]:
+    """Échéance (timestamp) tirée de `adv.publishAt`, ou None."""
+    v = (item.get('adv') or {}).get('publishAt')
+    if not v:
+        return None
+    dt = parse_rfc3339(str(v))
+    if dt is None:
+        return None
+    try:
+        return dt.timestamp()
+    except Exception:
+        return None
+
+
+class IndexedQueue:
+    def __init__(self, items: Optional[Iterable[Dict]] = None, next_id: int = 0, mode: str = 'fifo', horizon_h: float = 12.0):
+        self._lock = threading.RLock()
+        self._by_id: Dict[str, Dict] = {}
+        self._order: List[str] = []
+        self._ready: deque = deque()
+        self._ready_set = set()
+        self._next_id = int(next_id or 0)
+        # Mode deadline: deux tas à suppression paresseuse (jeton par mise en file)
+        self.mode = mode if mode in SCHED_MODES else 'fifo'
+        self.horizon_s = float(horizon_h or 0) * 3600.0
+        self._class_heap: List = []     # (rang priorité, échéance, jeton, iid)
+        self._dated_heap: List = []     # (échéance, rang priorité, jeton, iid)
+        self._tokens: Dict[str, int] = {}
+        self._tok = 0
+        for it in items or []:
+            self.append(it)
+
+    # --- identifiants ---
+    def new_iid(self) -> str:
+        with self._lock:
+            self._next_id += 1
+            while f'item_{self._next_id}' in self._by_id:
+                self._next_id += 1
+            return f'item_{self._next_id}'
+
+    @property
+    def last_id(self) -> int:
+        return self._next_id
+
+    # --- accès ---
+    def __iter__(self) -> Iterator[Dict]:
+        with self._lock:
+            items = [self._by_id[i] for i in self._order]
+        return iter(items)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, iid) -> bool:
+        return iid in self._by_id
+
+    def get(self, iid: str) -> Optional[Dict]:
+        return self._by_id.get(iid)
+
+    def to_list(self) -> List[Dict]:
+        with self._lock:
+            return [self._by_id[i] for i in self._order]
+
+    def index(self, iid: str) -> int:
+        with self._lock:
+            try:
+                return self._order.index(iid)
+            except ValueError:
+                return -1
+
+    def page(self, cursor: str = '', limit: int = 50,
+             pred: Optional[Callable[[Dict], bool]] = None) -> Tuple[List[Dict], str, int]:
+        """Page de la file dans l'ordre affiché: (items, curseur suivant, nombre total filtré).
+
+        Le curseur `pos:iid` désigne le dernier item renvoyé; si cet item a disparu
+        entre-temps (supprimé, archivé), la lecture reprend à la position `pos`.
+        """
+        limit = max(1, int(limit or 50))
+        with self._lock:
+            start = 0
+            if cursor:
+                pos, _, last = cursor.partition(':')
+                try:
+                    start = int(pos) + 1
+                except Exception:
+                    start = 0
+                if last and (start - 1 >= len(self._order) or self._order[start - 1] != last):
+                    idx = self.index(last)
+                    start = idx + 1 if idx >= 0 else max(0, start - 1)
+            items: List[Dict] = []
+            last_pos = -1
+            more = False
+            total = 0
+            for pos, iid in enumerate(self._order):
+                it = self._by_id[iid]
+                if pred is not None and not pred(it):
+                    continue
+                total += 1
+                if pos < start:
+                    continue
+                if len(items) < limit:
+                    items.append(it)
+                    last_pos = pos
+                else:
+                    more = True
+            next_cursor = f"{last_pos}:{items[-1]['iid']}" if more and items else ''
+            return items, next_cursor, total
+
+    def status_counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for iid in self._order:
+                st = self._by_id[iid].get('status') or 'en attente'
+                counts[st] = counts.get(st, 0) + 1
+            return counts
+
+    # --- mutations ---
+    def append(self, item: Dict) -> Dict:
+        with self._lock:
+            iid = item.get('iid') or ''
+            if not iid or iid in self._by_id:
+                iid = self.new_iid()
+                item['iid'] = iid
+            self._next_id = max(self._next_id, iid_number(iid))
+            self._by_id[iid] = item
+            self._order.append(iid)
+            if (item.get('status') or 'en attente') not in IDLE_STATUSES:
+                self._push_ready(iid)
+            return item
+
+    def remove(self, iid: str) -> Optional[Dict]:
+        with self._lock:
+            it = self._by_id.pop(iid, None)
+            if it is None:
+                return None
+            try:
+                self._order.remove(iid)
+            except ValueError:
+                pass
+            self._ready_set.discard(iid)  # l'entrée de la deque sera ignorée au dépilage
+            return it
+
+    def remove_where(self, pred: Callable[[Dict], bool]) -> List[Dict]:
+        with self._lock:
+            removed = [self._by_id[i] for i in self._order if pred(self._by_id[i])]
+            if removed:
+                gone = {it['iid'] for it in removed}
+                self._order = [i for i in self._order if i not in gone]
+                for iid in gone:
+                    self._by_id.pop(iid, None)
+                    self._ready_set.discard(iid)
+            return removed
+
+    def move(self, iid: str, direction: str) -> Optional[str]:
+        """Échange avec le voisin; retourne l'iid du voisin ou None si impossible."""
+        with self._lock:
+            idx = self.index(iid)
+            if idx < 0:
+                return None
+            j = idx - 1 if direction == 'up' else idx + 1 if direction == 'down' else -1
+            if j < 0 or j >= len(self._order):
+                return None
+            other = self._order[j]
+            self._order[idx], self._order[j] = other, iid
+            if iid in self._ready_set and other in self._ready_set:
+                # garder l'ordre de dispatch aligné sur l'ordre affiché
+                self._rebuild_ready()
+            return other
+
+    # --- ordonnancement ---
+    def set_mode(self, mode: str, horizon_h: Optional[float] = None):
+        with self._lock:
+            if mode in SCHED_MODES:
+                self.mode = mode
+            if horizon_h is not None:
+                self.horizon_s = max(0.0, float(horizon_h)) * 3600.0
+            self._rebuild_ready()
+
+    def _rebuild_ready(self):
+        ready = [i for i in self._order if i in self._ready_set]
+        self._ready = deque()
+        self._ready_set = set()
+        self._class_heap = []
+        self._dated_heap = []
+        self._tokens = {}
+        for iid in ready:
+            self._push_ready(iid)
+
+    # --- dispatch ---
+    def _push_ready(self, iid: str):
+        if iid in self._ready_set:
+            return
+        self._ready_set.add(iid)
+        if self.mode != 'deadline':
+            self._ready.append(iid)
+            return
+        it = self._by_id[iid]
+        self._tok += 1
+        self._tokens[iid] = self._tok
+        rank = PRIORITIES.index(item_priority(it))
+        dl = item_deadline(it)
+        # le jeton croît avec l'ordre d'arrivée (= ordre de la liste après reconstruction)
+        heapq.heappush(self._class_heap, (rank, dl if dl is not None else float('inf'), self._tok, iid))
+        if dl is not None:
+            heapq.heappush(self._dated_heap, (dl, rank, self._tok, iid))
+
+    def _heap_top(self, heap: List):
+        """Purge les entrées périmées et retourne l'entrée valide au sommet (ou None)."""
+        while heap:
+            e = heap[0]
+            iid, tok = e[-1], e[-2]
+            if iid in self._ready_set and self._tokens.get(iid) == tok:
+                return e
+            heapq.heappop(heap)
+        return None
+
+    def _take_next(self, taken: List) -> Optional[str]:
+        """Retire le prochain iid prêt selon le mode; l'entrée retirée est ajoutée à `taken`."""
+        if self.mode == 'deadline':
+            heap = self._dated_heap
+            e = self._heap_top(heap)
+            # échéance dans l'horizon (ou dépassée): prioritaire sur toutes les classes
+            if e is None or e[0] - time.time() > self.horizon_s:
+                heap = self._class_heap
+                e = self._heap_top(heap)
+                if e is None:
+                    return None
+            heapq.heappop(heap)
+            taken.append((heap, e))
+            return e[-1]
+        while self._ready:
+            iid = self._ready.popleft()
+            if iid in self._ready_set:  # sinon: supprimé entre-temps
+                taken.append((None, iid))
+                return iid
+        return None
+
+    def _put_back(self, taken: List):
+        for heap, e in reversed(taken):
+            if heap is None:
+                self._ready.appendleft(e)
+            else:
+                heapq.heappush(heap, e)
+
+    def mark_ready(self, item: Dict):
+        """Remet un item dans la deque des prêts (ex: reprise d'erreur)."""
+        with self._lock:
+            iid = item.get('iid')
+            if iid in self._by_id:
+                self._push_ready(iid)
+
+    def discard_ready(self, iid: str):
+        """Retire un item des prêts (pris par un autre processus); ses entrées sont ignorées au dépilage."""
+        with self._lock:
+            self._ready_set.discard(iid)
+            self._tokens.pop(iid, None)
+
+    def pop_ready(self, match: Optional[Callable[[Dict], bool]] = None) -> Optional[Dict]:
+        """Dépile le prochain item prêt; avec `match`, le premier item prêt qui le satisfait
+        (les autres gardent leur place)."""
+        with self._lock:
+            skipped: List = []
+            seen = set()
+            found = None
+            while self._ready_set:
+                taken: List = []
+                iid = self._take_next(taken)
+                if iid is None:
+                    break
+                it = self._by_id.get(iid)
+                if it is None or (it.get('status') or 'en attente') in IDLE_STATUSES:
+                    self._ready_set.discard(iid)
+                    self._tokens.pop(iid, None)
+                    continue
+                if match is not None and (iid in seen or not match(it)):
+                    seen.add(iid)
+                    skipped.extend(taken)
+                    continue
+                self._ready_set.discard(iid)
+                self._tokens.pop(iid, None)
+                found = it
+                break
+            self._put_back(skipped)
+            return found
+
+    def ready_count(self) -> int:
+        return len(self._ready_set)
@@ -0,0 +1,458 @@
+"""
+Persistance de la file d'attente (webapp + app Tk).
+
+Historiquement la file était réécrite intégralement dans `queue.json` à chaque
+tick de progression. Ce module fournit un backend SQLite (WAL) avec une ligne
+par item: un changement de statut/progression devient un simple UPDATE.
+
+Backend choisi via la variable d'env `T2Y_QUEUE_BACKEND`:
+- `sqlite` (défaut): `queue.db`
+- `journal`: journal JSONL append-only + snapshot (voir `queue_journal`), un seul processus à la fois
+- `json`: ancien comportement (réécriture complète de `queue.json`)
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .config import CONFIG_DIR
+from .logger import log
+from .queue_journal import JournalLockedError
+
+QUEUE_JSON = CONFIG_DIR / 'queue.json'
+QUEUE_DB = CONFIG_DIR / 'queue.db'
+
+# Champs stockés dans des colonnes dédiées (mis à jour sans toucher au JSON `data`)
+_COLUMNS = ('status', 'd_pct', 'u_pct', 'f_pct', 'result')
+
+# Statuts qu'un worker peut prendre en bail; tout autre statut hors terminé/erreur
+# correspond à un traitement en cours (repris si son bail a expiré)
+LEASABLE_STATUSES = ('en attente', 'quota')
+_FINAL_STATUSES = ('terminé', 'erreur')
+# durée de conservation des suppressions pour `changes_since` (s)
+_TOMBSTONE_TTL = 86400.0
+
+
+class SqliteQueueStore:
+    """File d'attente persistée dans SQLite (une ligne par item, ordre via `pos`)."""
+
+    def __init__(self, path=QUEUE_DB):
+        self.path = str(path)
+        self._lock = threading.RLock()
+        CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS items ('
+            ' iid TEXT PRIMARY KEY,'
+            ' pos INTEGER NOT NULL,'
+            ' status TEXT,'
+            ' d_pct INTEGER DEFAULT 0,'
+            ' u_pct INTEGER DEFAULT 0,'
+            ' f_pct INTEGER DEFAULT 0,'
+            ' result TEXT,'
+            ' data TEXT NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS items_pos ON items(pos)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)')
+        # Baux (plusieurs processus workers sur la même base)
+        cols = {r[1] for r in self._db.execute('PRAGMA table_info(items)').fetchall()}
+        if 'lease_owner' not in cols:
+            self._db.execute('ALTER TABLE items ADD COLUMN lease_owner TEXT')
+        if 'lease_expires' not in cols:
+            self._db.execute('ALTER TABLE items ADD COLUMN lease_expires REAL')
+        # Révisions: chaque changement visible d'un item (quel que soit le processus) reçoit
+        # un numéro croissant; les lectures incrémentales (`changes_since`) partent de là.
+        # Un heartbeat (lease_expires seul) ne compte pas.
+        if 'rev' not in cols:
+            self._db.execute('ALTER TABLE items ADD COLUMN rev INTEGER DEFAULT 0')
+        self._db.execute('CREATE INDEX IF NOT EXISTS items_rev ON items(rev)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS revision (id INTEGER PRIMARY KEY CHECK (id = 1), n INTEGER NOT NULL)')
+        self._db.execute('INSERT OR IGNORE INTO revision(id, n) VALUES(1, 0)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS tombstones (iid TEXT PRIMARY KEY, rev INTEGER NOT NULL, deleted_at REAL)')
+        bump = ('UPDATE revision SET n = n + 1 WHERE id = 1;'
+                ' UPDATE items SET rev = (SELECT n FROM revision WHERE id = 1) WHERE iid = NEW.iid;')
+        self._db.execute(
+            'CREATE TRIGGER IF NOT EXISTS items_rev_ins AFTER INSERT ON items BEGIN '
+            f'{bump} DELETE FROM tombstones WHERE iid = NEW.iid; END'
+        )
+        self._db.execute(
+            'CREATE TRIGGER IF NOT EXISTS items_rev_upd'
+            ' AFTER UPDATE OF pos, status, d_pct, u_pct, f_pct, result, data, lease_owner ON items'
+            f' BEGIN {bump} END'
+        )
+        self._db.execute(
+            'CREATE TRIGGER IF NOT EXISTS items_rev_del AFTER DELETE ON items BEGIN'
+            ' UPDATE revision SET n = n + 1 WHERE id = 1;'
+            ' INSERT OR REPLACE INTO tombstones(iid, rev, deleted_at)'
+            " VALUES(OLD.iid, (SELECT n FROM revision WHERE id = 1), strftime('%s', 'now'));"
+            ' END'
+        )
+
+    # --- helpers ---
+    @staticmethod
+    def _split(item: Dict):
+        data = {k: v for k, v in item.items() if k not in _COLUMNS}
+        cols = [item.get('status') or 'en attente']
+        for k in ('d_pct', 'u_pct', 'f_pct'):
+            try:
+                cols.append(int(item.get(k) or 0))
+            except Exception:
+                cols.append(0)
+        res = item.get('result')
+        cols.append('' if res is None else str(res))
+        return cols, json.dumps(data, ensure_ascii=False)
+
+    @staticmethod
+    def _row_to_item(row) -> Dict:
+        iid, status, d_pct, u_pct, f_pct, result, data = row
+        try:
+            it = json.loads(data) or {}
+        except Exception:
+            it = {}
+        it['iid'] = iid
+        it['status'] = status or 'en attente'
+        it['d_pct'] = d_pct or 0
+        it['u_pct'] = u_pct or 0
+        if f_pct:
+            it['f_pct'] = f_pct
+        it['result'] = result or ''
+        return it
+
+    def _next_pos(self) -> int:
+        row = self._db.execute('SELECT COALESCE(MAX(pos), 0) FROM items').fetchone()
+        return int(row[0] or 0) + 1
+
+    def _meta_get(self, k: str) -> Optional[str]:
+        row = self._db.execute('SELECT v FROM meta WHERE k=?', (k,)).fetchone()
+        return row[0] if row else None
+
+    def _meta_set(self, k: str, v: str):
+        self._db.execute('INSERT OR REPLACE INTO meta(k, v) VALUES(?, ?)', (k, v))
+
+    def get_meta(self, k: str) -> Optional[str]:
+        with self._lock:
+            return self._meta_get(k)
+
+    def set_meta(self, k: str, v: str):
+        with self._lock:
+            self._meta_set(k, v)
+
+    # --- lecture ---
+    def load(self) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT iid, status, d_pct, u_pct, f_pct, result, data FROM items ORDER BY pos'
+            ).fetchall()
+        return [self._row_to_item(r) for r in rows]
+
+    def revision(self) -> int:
+        """Révision courante de la base (tous processus confondus)."""
+        with self._lock:
+            return int(self._db.execute('SELECT n FROM revision WHERE id = 1').fetchone()[0])
+
+    def get_leased(self, iid: str) -> Optional[Tuple[Dict, str, float]]:
+        """`(item, propriétaire du bail, expiration)` d'un item, ou None s'il n'existe plus."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT iid, status, d_pct, u_pct, f_pct, result, data, lease_owner, lease_expires FROM items WHERE iid=?',
+                (iid,),
+            ).fetchone()
+        if row is None:
+            return None
+        return self._row_to_item(row[:7]), row[7] or '', float(row[8] or 0)
+
+    def changes_since(self, rev: int) -> Tuple[List[Tuple[Dict, str, float]], List[str], int]:
+        """Items modifiés depuis la révision `rev` (avec leur bail), iids supprimés, nouvelle révision.
+
+        Sans changement, une seule lecture de la table `revision`.
+        """
+        with self._lock:
+            cur = int(self._db.execute('SELECT n FROM revision WHERE id = 1').fetchone()[0])
+            if cur == rev:
+                return [], [], cur
+            rows = self._db.execute(
+                'SELECT iid, status, d_pct, u_pct, f_pct, result, data, lease_owner, lease_expires'
+                ' FROM items WHERE rev > ? ORDER BY pos', (rev,)
+            ).fetchall()
+            gone = [r[0] for r in self._db.execute('SELECT iid FROM tombstones WHERE rev > ?', (rev,)).fetchall()]
+            # les lecteurs suivent à quelques secondes près: un jour de suppressions suffit
+            self._db.execute('DELETE FROM tombstones WHERE deleted_at < ?', (time.time() - _TOMBSTONE_TTL,))
+        items = [(self._row_to_item(r[:7]), r[7] or '', float(r[8] or 0)) for r in rows]
+        return items, gone, cur
+
+    # --- écriture ---
+    def replace_all(self, items: Iterable[Dict]):
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                # conserver les baux en cours (détenus par d'autres processus)
+                leases = {r[0]: (r[1], r[2]) for r in self._db.execute(
+                    "SELECT iid, lease_owner, lease_expires FROM items WHERE COALESCE(lease_owner, '') != ''").fetchall()}
+                self._db.execute('DELETE FROM items')
+                for pos, it in enumerate(items, start=1):
+                    cols, data = self._split(it)
+                    self._db.execute(
+                        'INSERT INTO items(iid, pos, status, d_pct, u_pct, f_pct, result, data, lease_owner, lease_expires) VALUES(?,?,?,?,?,?,?,?,?,?)',
+                        (it.get('iid'), pos, *cols, data, *leases.get(it.get('iid'), (None, None))),
+                    )
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def put(self, item: Dict):
+        """Insère (en fin de file) ou remplace un item en conservant sa position."""
+        cols, data = self._split(item)
+        with self._lock:
+            cur = self._db.execute(
+                'UPDATE items SET status=?, d_pct=?, u_pct=?, f_pct=?, result=?, data=? WHERE iid=?',
+                (*cols, data, item.get('iid')),
+            )
+            if cur.rowcount == 0:
+                self._db.execute(
+                    'INSERT INTO items(iid, pos, status, d_pct, u_pct, f_pct, result, data) VALUES(?,?,?,?,?,?,?,?)',
+                    (item.get('iid'), self._next_pos(), *cols, data),
+                )
+
+    def put_many(self, items: Iterable[Dict]):
+        """Ajoute un lot d'items en fin de file (une seule transaction)."""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                pos = self._next_pos()
+                rows = []
+                for it in items:
+                    cols, data = self._split(it)
+                    rows.append((it.get('iid'), pos, *cols, data))
+                    pos += 1
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO items(iid, pos, status, d_pct, u_pct, f_pct, result, data) VALUES(?,?,?,?,?,?,?,?)',
+                    rows,
+                )
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def update(self, iid: str, fields: Dict):
+        """Met à jour quelques champs d'un item (UPDATE d'une seule ligne)."""
+        if not fields:
+            return
+        col_fields = {k: v for k, v in fields.items() if k in _COLUMNS}
+        other = {k: v for k, v in fields.items() if k not in _COLUMNS and k != 'iid'}
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                if col_fields:
+                    sets = ', '.join(f'{k}=?' for k in col_fields)
+                    vals = []
+                    for k, v in col_fields.items():
+                        if k.endswith('_pct'):
+                            try:
+                                v = int(v or 0)
+                            except Exception:
+                                v = 0
+                        elif v is None:
+                            v = ''
+                        vals.append(v)
+                    self._db.execute(f'UPDATE items SET {sets} WHERE iid=?', (*vals, iid))
+                if other:
+                    row = self._db.execute('SELECT data FROM items WHERE iid=?', (iid,)).fetchone()
+                    if row:
+                        try:
+                            data = json.loads(row[0]) or {}
+                        except Exception:
+                            data = {}
+                        data.update(other)
+                        self._db.execute('UPDATE items SET data=? WHERE iid=?', (json.dumps(data, ensure_ascii=False), iid))
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def delete(self, iid: str):
+        with self._lock:
+            self._db.execute('DELETE FROM items WHERE iid=?', (iid,))
+
+    def delete_many(self, iids: Iterable[str]):
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._db.executemany('DELETE FROM items WHERE iid=?', [(i,) for i in iids])
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def swap(self, iid_a: str, iid_b: str):
+        """Échange la position de deux items (monter/descendre)."""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                ra = self._db.execute('SELECT pos FROM items WHERE iid=?', (iid_a,)).fetchone()
+                rb = self._db.execute('SELECT pos FROM items WHERE iid=?', (iid_b,)).fetchone()
+                if ra and rb:
+                    self._db.execute('UPDATE items SET pos=? WHERE iid=?', (rb[0], iid_a))
+                    self._db.execute('UPDATE items SET pos=? WHERE iid=?', (ra[0], iid_b))
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    # --- baux ---
+    def lease_next(self, owner: str, ttl: float, profile: Optional[str] = None) -> Optional[Dict]:
+        """Prend atomiquement le premier item disponible (ordre de la file) pour `owner`.
+
+        `profile` restreint aux items de ce profil YouTube (`adv.profile`, '' = défaut).
+        """
+        now = time.time()
+        sql = ("SELECT iid FROM items WHERE status IN (?, ?)"
+               " AND (COALESCE(lease_owner, '') = '' OR lease_expires < ?)")
+        args: list = [*LEASABLE_STATUSES, now]
+        if profile is not None:
+            sql += " AND COALESCE(json_extract(data, '$.adv.profile'), '') = ?"
+            args.append(profile)
+        sql += ' ORDER BY pos LIMIT 1'
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._db.execute(sql, args).fetchone()
+                if row:
+                    self._db.execute(
+                        "UPDATE items SET lease_owner=?, lease_expires=?, status='en cours' WHERE iid=?",
+                        (owner, now + ttl, row[0]),
+                    )
+                    row = self._db.execute(
+                        'SELECT iid, status, d_pct, u_pct, f_pct, result, data FROM items WHERE iid=?', (row[0],)
+                    ).fetchone()
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+        return self._row_to_item(row) if row else None
+
+    def acquire(self, iid: str, owner: str, ttl: float) -> bool:
+        """Prend le bail d'un item précis s'il est libre (ou déjà détenu par `owner`)."""
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE items SET lease_owner=?, lease_expires=? WHERE iid=? AND status NOT IN (?, ?)"
+                " AND (COALESCE(lease_owner, '') IN ('', ?) OR lease_expires < ?)",
+                (owner, now + ttl, iid, *_FINAL_STATUSES, owner, now),
+            )
+            return cur.rowcount > 0
+
+    def heartbeat(self, iids: Iterable[str], owner: str, ttl: float) -> List[str]:
+        """Prolonge les baux de `owner`; retourne les iids dont le bail a été perdu."""
+        lost = []
+        expires = time.time() + ttl
+        with self._lock:
+            for iid in iids:
+                cur = self._db.execute(
+                    'UPDATE items SET lease_expires=? WHERE iid=? AND lease_owner=?', (expires, iid, owner)
+                )
+                if cur.rowcount == 0:
+                    lost.append(iid)
+        return lost
+
+    def release(self, iid: str, owner: str):
+        with self._lock:
+            self._db.execute(
+                'UPDATE items SET lease_owner=NULL, lease_expires=NULL WHERE iid=? AND lease_owner=?', (iid, owner)
+            )
+
+    def hold(self, iid: str, until: float, owner: str = 'quota'):
+        """Réserve un item jusqu'à `until` (ex: reset du quota); il redevient disponible ensuite."""
+        with self._lock:
+            self._db.execute('UPDATE items SET lease_owner=?, lease_expires=? WHERE iid=?', (owner, until, iid))
+
+    def reclaim_expired(self) -> int:
+        """Remet en attente les items en cours dont le bail a expiré ou qui n'ont pas de bail (crash),
+        ainsi que les items retenus pour quota une fois le reset passé."""
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE items SET status='en attente', lease_owner=NULL, lease_expires=NULL"
+                " WHERE status NOT IN (?, ?, ?, 'en attente')"
+                " AND (COALESCE(lease_owner, '') = '' OR lease_expires < ?)",
+                (*_FINAL_STATUSES, 'quota', now),
+            )
+            n = cur.rowcount
+            # réservation de quota échue: quel que soit le processus qui l'a posée
+            cur = self._db.execute(
+                "UPDATE items SET status='en attente', result='', lease_owner=NULL, lease_expires=NULL"
+                " WHERE status='quota' AND (COALESCE(lease_owner, '') IN ('', 'quota')) AND COALESCE(lease_expires, 0) < ?",
+                (now,),
+            )
+            return n + cur.rowcount
+
+    # --- compat queue.json ---
+    def import_json(self, path=QUEUE_JSON) -> int:
+        """Ajoute les items d'un `queue.json` (format historique) absents de la base."""
+        with open(path, 'r', encoding='utf-8') as f:
+            items = json.load(f)
+        n = 0
+        with self._lock:
+            known = {r[0] for r in self._db.execute('SELECT iid FROM items').fetchall()}
+            for it in items or []:
+                if not isinstance(it, dict):
+                    continue
+                iid = it.get('iid') or f'item_{len(known)+1}'
+                if iid in known:
+                    continue
+                it['iid'] = iid
+                self.put(it)
+                known.add(iid)
+                n += 1
+        return n
+
+    def export_json(self, path=QUEUE_JSON) -> int:
+        """Écrit la file au format `queue.json` historique (liste d'items)."""
+        items = self.load()
+        tmp = str(path) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        return len(items)
+
+    def migrate_from_json(self, path=QUEUE_JSON):
+        """Import unique de `queue.json` au premier lancement avec le backend SQLite."""
+        with self._lock:
+            if self._meta_get('json_imported'):
+                return 0
+            n = 0
+            try:
+                if os.path.exists(path):
+                    n = self.import_json(path)
+                    log('info', f'queue: {n} item(s) importé(s) depuis {path}')
+            except Exception as e:
+                log('error', f'queue: import {path} échoué: {e}')
+            self._meta_set('json_imported', '1')
+            return n
+
+
+def open_queue_store(backend: Optional[str] = None):
+    """Retourne le store configuré, ou None pour le mode `json` historique."""
+    backend = (backend or os.environ.get('T2Y_QUEUE_BACKEND') or 'sqlite').strip().lower()
+    if backend == 'json':
+        return None
+    try:
+        if backend == 'journal':
+            from .queue_journal import JournalQueueStore
+            store = JournalQueueStore()
+        else:
+            store = SqliteQueueStore()
+        store.migrate_from_json()
+        return store
+    except JournalLockedError:
+        # pas de repli sur queue.json: ce serait une seconde file, divergente
+        log('error', 'queue: journal déjà utilisé par un autre processus — ouverture refusée')
+        raise
+    except Exception as e:
+        log('error', f'queue: backend {backend} indisponible ({e}) — repli sur queue.json')
+        return None
@@ -0,0 +1,269 @@
+"""
+Comptabilité du quota YouTube Data API, par profil et par jour (heure du Pacifique).
+
+Coûts: `videos.insert` = 1600, `videos.update` = 50, `playlistItems.insert` = 50.
+Le quota (10 000 unités/jour par défaut) se réinitialise à minuit, heure du Pacifique.
+Le registre est persisté dans `quota.json`; la limite est réglable dans settings.json:
+    "quota": {"daily_limit": 10000, "profiles": {"chaine2": 20000}}
+
+Un `quotaExceeded` renvoyé par l'API marque le profil comme épuisé jusqu'au reset:
+la file met alors les items en attente au lieu de les passer en erreur.
+
+Le registre est partagé entre processus (relu et réécrit sous verrou de fichier). Au
+lancement d'un item, la file réserve son coût estimé (`upload_cost`): les autres
+processus ne dispatchent que sur le reste. Les appels API consomment la réservation
+de l'item (`working_on`), le reliquat est rendu à la fin (`release`).
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+import json
+import os
+import threading
+import time
+
+from .config import CONFIG_DIR, SETTINGS_FILE
+from .filelock import locked
+from .logger import log
+
+QUOTA_FILE = CONFIG_DIR / 'quota.json'
+DEFAULT_DAILY_LIMIT = 10000
+COSTS = {
+    'videos.insert': 1600,
+    'videos.update': 50,
+    'playlistItems.insert': 50,
+}
+_QUOTA_REASONS = ('quotaExceeded', 'dailyLimitExceeded')
+# Une réservation non rendue (processus tué) cesse de compter après ce délai (s)
+RESERVATION_TTL = 6 * 3600.0
+
+try:
+    from zoneinfo import ZoneInfo
+    _PACIFIC = ZoneInfo('America/Los_Angeles')
+except Exception:  # tzdata absent: approximation UTC-8 (sans heure d'été)
+    _PACIFIC = timezone(timedelta(hours=-8))
+
+
+class QuotaExceededError(RuntimeError):
+    """Quota journalier épuisé pour un profil; `reset_at` = timestamp du prochain reset."""
+
+    def __init__(self, profile: str, reset_at: float, msg: str = ''):
+        self.profile = profile
+        self.reset_at = reset_at
+        super().__init__(msg or f"Quota YouTube épuisé ({profile}) — reprise après "
+                                f"{datetime.fromtimestamp(reset_at).strftime('%Y-%m-%d %H:%M')}")
+
+
+def _profile_key(profile: Optional[str]) -> str:
+    return (profile or '').strip() or 'default'
+
+
+def pacific_day(now: Optional[float] = None) -> str:
+    dt = datetime.fromtimestamp(now if now is not None else datetime.now().timestamp(), _PACIFIC)
+    return dt.strftime('%Y-%m-%d')
+
+
+def next_reset(now: Optional[float] = None) -> float:
+    """Timestamp du prochain minuit (heure du Pacifique)."""
+    dt = datetime.fromtimestamp(now if now is not None else datetime.now().timestamp(), _PACIFIC)
+    nxt = (dt + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return nxt.timestamp()
+
+
+def is_quota_error(e: Exception) -> bool:
+    """Vrai si l'erreur HTTP est un dépassement de quota (403 quotaExceeded)."""
+    code = getattr(e, 'status_code', None) or getattr(getattr(e, 'resp', None), 'status', None)
+    try:
+        code = int(code)
+    except Exception:
+        code = None
+    if code not in (403, None):
+        return False
+    text = ''
+    try:
+        content = getattr(e, 'content', b'') or b''
+        text = content.decode('utf-8', 'ignore') if isinstance(content, bytes) else str(content)
+    except Exception:
+        pass
+    text = f'{text} {e}'
+    return any(r in text for r in _QUOTA_REASONS)
+
+
+class QuotaLedger:
+    """Registre partagé par tous les processus (app Tk, webapp, workers, agents) via `quota.json`.
+
+    Chaque opération relit le fichier et le réécrit sous verrou (`quota.json.lock`): les
+    compteurs des autres processus ne sont ni écrasés ni ignorés.
+    """
+
+    def __init__(self, path=QUOTA_FILE, settings_file=SETTINGS_FILE):
+        self.path = str(path)
+        self.lock_path = self.path + '.lock'
+        self.settings_file = settings_file
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict] = {}
+        # item en cours de traitement dans ce thread (ses dépenses consomment sa réservation)
+        self._local = threading.local()
+
+    def daily_limit(self, profile: Optional[str] = None) -> int:
+        try:
+            with open(self.settings_file, 'r', encoding='utf-8') as f:
+                conf = (json.load(f) or {}).get('quota') or {}
+        except Exception:
+            conf = {}
+        try:
+            per = (conf.get('profiles') or {}).get(_profile_key(profile))
+            return int(per or conf.get('daily_limit') or DEFAULT_DAILY_LIMIT)
+        except Exception:
+            return DEFAULT_DAILY_LIMIT
+
+    @contextmanager
+    def _shared(self, write: bool = True):
+        """Section critique inter-processus: `_data` relu du fichier, réécrit à la sortie si `write`."""
+        with self._lock:
+            CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+            with locked(self.lock_path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._data = json.load(f) or {}
+                except FileNotFoundError:
+                    self._data = {}
+                except Exception as e:
+                    log('error', f'quota: registre illisible, repart de zéro: {e}')
+                    self._data = {}
+                yield
+                if write:
+                    self._save()
+
+    def _entry(self, key: str) -> Dict:
+        day = pacific_day()
+        e = self._data.get(key)
+        if not e or e.get('day') != day:
+            e = {'day': day, 'used': 0, 'calls': {}, 'exhausted': False, 'reserved': {}}
+            self._data[key] = e
+        res = e.setdefault('reserved', {})
+        # réservations de processus morts (ou jamais rendues): oubliées après RESERVATION_TTL
+        cutoff = time.time() - RESERVATION_TTL
+        for iid in [i for i, r in res.items() if float((r or {}).get('at') or 0) < cutoff]:
+            del res[iid]
+        return e
+
+    def _save(self):
+        try:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            log('error', f'quota: sauvegarde échouée: {e}')
+
+    def _remaining(self, e: Dict, limit: int, iid: Optional[str]) -> int:
+        """Reste du jour, déduction faite des réservations des autres items (celle de `iid` reste disponible)."""
+        if e.get('exhausted'):
+            return 0
+        others = sum(int(r.get('units') or 0) for i, r in e['reserved'].items() if i != iid)
+        return max(0, limit - int(e.get('used') or 0) - others)
+
+    # --- item courant du thread (uploader) ---
+    @contextmanager
+    def working_on(self, iid: Optional[str]):
+        """Les appels de ce thread (ensure/charge de l'uploader) sont imputés à la réservation de `iid`."""
+        prev = getattr(self._local, 'iid', None)
+        self._local.iid = iid
+        try:
+            yield
+        finally:
+            self._local.iid = prev
+
+    def _current(self, iid: Optional[str]) -> Optional[str]:
+        return iid if iid is not None else getattr(self._local, 'iid', None)
+
+    # --- lecture ---
+    def remaining(self, profile: Optional[str] = None, iid: Optional[str] = None) -> int:
+        key = _profile_key(profile)
+        limit = self.daily_limit(key)
+        with self._shared(write=False):
+            return self._remaining(self._entry(key), limit, self._current(iid))
+
+    def can_spend(self, profile: Optional[str], units: int, iid: Optional[str] = None) -> bool:
+        return self.remaining(profile, iid) >= int(units or 0)
+
+    def ensure(self, profile: Optional[str], op: str, n: int = 1, iid: Optional[str] = None):
+        """Lève `QuotaExceededError` si le coût de `op` dépasse le reste du jour."""
+        if not self.can_spend(profile, COSTS.get(op, 1) * n, iid):
+            raise QuotaExceededError(_profile_key(profile), next_reset())
+
+    # --- réservation au lancement, dépense à l'appel API ---
+    def reserve(self, profile: Optional[str], iid: str, units: int) -> bool:
+        """Réserve `units` pour l'item `iid` si le reste du jour (réservations comprises) les couvre.
+
+        Vérification et réservation sont atomiques entre processus: deux workers ne peuvent pas
+        lancer chacun un upload sur les mêmes unités restantes.
+        """
+        key = _profile_key(profile)
+        limit = self.daily_limit(key)
+        with self._shared():
+            e = self._entry(key)
+            if self._remaining(e, limit, iid) < int(units or 0):
+                return False
+            e['reserved'][iid] = {'units': int(units or 0), 'at': time.time()}
+            return True
+
+    def release(self, profile: Optional[str], iid: str):
+        """Rend le reste de la réservation de `iid` (item terminé, en erreur ou remis en file)."""
+        key = _profile_key(profile)
+        with self._shared():
+            self._entry(key)['reserved'].pop(iid, None)
+
+    def charge(self, profile: Optional[str], op: str, n: int = 1, iid: Optional[str] = None):
+        key = _profile_key(profile)
+        iid = self._current(iid)
+        cost = COSTS.get(op, 1) * n
+        with self._shared():
+            e = self._entry(key)
+            e['used'] = int(e.get('used') or 0) + cost
+            e['calls'][op] = int(e['calls'].get(op) or 0) + n
+            r = e['reserved'].get(iid) if iid else None
+            if r is not None:
+                # unités dépensées: elles passent de la réservation à `used`
+                r['units'] = max(0, int(r.get('units') or 0) - cost)
+
+    def mark_exhausted(self, profile: Optional[str]):
+        key = _profile_key(profile)
+        with self._shared():
+            e = self._entry(key)
+            if not e.get('exhausted'):
+                e['exhausted'] = True
+                log('error', f'quota: profil {key} épuisé jusqu\'au reset (minuit heure du Pacifique)')
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._shared(write=False):
+            entries = {key: self._entry(key) for key in list(self._data.keys())}
+        out = {}
+        for key, e in entries.items():
+            limit = self.daily_limit(key)
+            reserved = sum(int(r.get('units') or 0) for r in e['reserved'].values())
+            out[key] = {
+                'day': e['day'],
+                'used': e['used'],
+                'reserved': reserved,
+                'limit': limit,
+                'remaining': self._remaining(e, limit, None),
+                'exhausted': bool(e.get('exhausted')),
+                'calls': dict(e.get('calls') or {}),
+            }
+        return {'reset_at': next_reset(), 'profiles': out}
+
+
+def upload_cost(adv: Optional[Dict]) -> int:
+    """Coût estimé d'un item: insert + update recordingDetails + ajouts en playlists."""
+    adv = adv or {}
+    cost = COSTS['videos.insert']
+    if any(adv.get(k) for k in ('locationDescription', 'latitude', 'longitude', 'recordingDate')):
+        cost += COSTS['videos.update']
+    cost += COSTS['playlistItems.insert'] * len(adv.get('playlists') or [])
+    return cost
+
+
+ledger = QuotaLedger()
@@ -0,0 +1,187 @@
+"""
+Téléchargement segmenté: N requêtes HTTP Range en parallèle vers un fichier préalloué.
+
+Utilisé par `downloader` quand yt-dlp a résolu un format à URL directe (http/https,
+un seul fichier): le débit n'est plus borné par une seule connexion au CDN.
+
+- Sonde `Range: bytes=0-0`: sans réponse 206 avec taille totale (ou fichier plus
+  petit que `min_mb`), on rend la main (`False`) et l'appelant garde le chemin yt-dlp.
+- Chaque segment réessaie depuis son dernier octet écrit.
+- L'avancement des segments est noté à côté du fichier partiel (`.seg.part.json`,
+  distinct du `.part` de yt-dlp): un essai suivant dans le même dossier de travail
+  reprend les segments entamés.
+
+Réglages (settings.json): `"segmented": {"enabled": true, "connections": 4, "min_mb": 8}`.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional
+import json
+import os
+import threading
+import time
+
+from .config import SETTINGS_FILE
+from .logger import log
+
+CHUNK = 256 * 1024
+
+
+def load_segmented_settings(settings_file=SETTINGS_FILE) -> Dict:
+    conf: Dict = {}
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            conf = (json.load(f) or {}).get('segmented') or {}
+    except Exception:
+        conf = {}
+    try:
+        connections = max(1, min(16, int(conf.get('connections') or 4)))
+    except Exception:
+        connections = 4
+    try:
+        min_mb = max(0.0, float(conf.get('min_mb') if conf.get('min_mb') is not None else 8))
+    except Exception:
+        min_mb = 8.0
+    return {'enabled': bool(conf.get('enabled', True)), 'connections': connections, 'min_mb': min_mb}
+
+
+def _probe(session, url: str, headers: Dict, timeout: float) -> Optional[int]:
+    """Taille totale si le serveur accepte les requêtes Range, sinon None."""
+    r = session.get(url, headers={**headers, 'Range': 'bytes=0-0'}, timeout=timeout, stream=True)
+    try:
+        if r.status_code != 206:
+            return None
+        cr = r.headers.get('Content-Range') or ''
+        total = cr.rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+    finally:
+        r.close()
+
+
+def _split(total: int, n: int) -> List[List[int]]:
+    """Segments [début, fin incluse, octets déjà écrits]."""
+    size = max(1, -(-total // n))
+    return [[s, min(total, s + size) - 1, 0] for s in range(0, total, size)]
+
+
+def download_ranged(url: str, dest: str, headers: Optional[Dict] = None, cookies=None, proxy: Optional[str] = None,
+                    timeout: float = 30.0, connections: int = 4, min_bytes: int = 0, retries: int = 3,
+                    on_progress: Optional[Callable[[int], None]] = None,
+                    throttle: Optional[Callable[[int], None]] = None) -> bool:
+    """Télécharge `url` dans `dest` par segments. Retourne False si le serveur ne s'y prête pas
+    (rien n'est écrit); lève une exception si un segment échoue malgré les réessais.
+    `throttle(n)` est appelé (hors verrou) pour chaque bloc reçu et peut bloquer pour limiter le débit."""
+    try:
+        import requests  # type: ignore
+    except Exception:
+        return False
+    headers = {k: v for k, v in (headers or {}).items() if k.lower() not in ('range', 'accept-encoding')}
+    session = requests.Session()
+    if cookies is not None:
+        session.cookies = cookies if hasattr(cookies, 'set_cookie') else requests.utils.cookiejar_from_dict(cookies)
+    if proxy:
+        session.proxies = {'http': proxy, 'https': proxy}
+    try:
+        total = _probe(session, url, headers, timeout)
+    except Exception as e:
+        log('info', f'segmented: sonde échouée ({e}), téléchargement simple')
+        return False
+    if not total or total < max(1, min_bytes):
+        return False
+
+    part = dest + '.seg.part'
+    state_path = part + '.json'
+    segs = None
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            st = json.load(f) or {}
+        if st.get('total') == total and os.path.exists(part) and os.path.getsize(part) == total:
+            segs = st.get('segments')
+    except Exception:
+        segs = None
+    if not segs:
+        segs = _split(total, max(1, connections))
+        with open(part, 'wb') as f:
+            f.truncate(total)  # préallocation: chaque segment écrit à sa position
+    lock = threading.Lock()
+    errors: List[BaseException] = []
+    last_save = [time.monotonic()]
+
+    def _save_state():
+        try:
+            with open(state_path, 'w', encoding='utf-8') as f:
+                json.dump({'total': total, 'segments': segs}, f)
+        except Exception:
+            pass
+
+    def _report():
+        if on_progress:
+            done = sum(s[2] for s in segs)
+            try:
+                on_progress(int(done * 100 / total))
+            except Exception:
+                pass
+
+    def _fetch(seg):
+        attempt = 0
+        while seg[0] + seg[2] <= seg[1]:
+            start = seg[0] + seg[2]
+            written = seg[2]
+            try:
+                r = session.get(url, headers={**headers, 'Range': f'bytes={start}-{seg[1]}'},
+                                timeout=timeout, stream=True)
+                try:
+                    if r.status_code != 206:
+                        raise RuntimeError(f'HTTP {r.status_code} sur le segment {start}-{seg[1]}')
+                    with open(part, 'r+b') as f:
+                        f.seek(start)
+                        for chunk in r.iter_content(CHUNK):
+                            if not chunk:
+                                continue
+                            chunk = chunk[:seg[1] - (seg[0] + seg[2]) + 1]
+                            f.write(chunk)
+                            if throttle is not None:
+                                throttle(len(chunk))
+                            with lock:
+                                seg[2] += len(chunk)
+                                _report()
+                                if time.monotonic() - last_save[0] >= 2.0:
+                                    # état sur disque: un crash ne perd que les 2 dernières secondes
+                                    last_save[0] = time.monotonic()
+                                    _save_state()
+                            if seg[0] + seg[2] > seg[1]:
+                                break
+                finally:
+                    r.close()
+                if seg[0] + seg[2] <= seg[1]:
+                    raise RuntimeError(f'segment {start}-{seg[1]} interrompu')
+            except Exception as e:
+                # un essai qui a fait avancer le segment ne compte pas comme un échec
+                attempt = 1 if seg[2] > written else attempt + 1
+                with lock:
+                    _save_state()
+                if attempt > retries:
+                    raise
+                log('info', f'segmented: segment {seg[0]}-{seg[1]} réessai {attempt}/{retries}: {e}')
+
+    def _run(seg):
+        try:
+            _fetch(seg)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_run, args=(s,), daemon=True) for s in segs if s[0] + s[2] <= s[1]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    session.close()
+    if errors:
+        raise RuntimeError(f'Téléchargement segmenté échoué: {errors[0]}')
+    os.replace(part, dest)
+    try:
+        os.remove(state_path)
+    except OSError:
+        pass
+    if on_progress:
+        on_progress(100)
+    return True
@@ -0,0 +1,205 @@
+"""
+Cache disque des vidéos sources, adressé par id de vidéo TikTok.
+
+Une reprise après erreur d'upload, un ré-upload vers un autre profil ou un
+nouveau pré-traitement ffmpeg réutilisent les octets déjà téléchargés au lieu
+de retourner chez TikTok.
+
+- Entrées: `<id>.<ext>` + `<id>.json` (durée, taille, format: codecs, dimensions, politique).
+  Une seule copie par vidéo: l'appelant dit si le format en cache convient à son plan
+  (`accept`); sinon il retélécharge et l'entrée est remplacée.
+- Le worker reçoit un lien physique (copie à défaut) dans son dossier temporaire:
+  il peut le supprimer ou le remplacer sans toucher au cache, et une éviction
+  pendant un traitement n'affecte pas le fichier en cours d'utilisation.
+- Taille bornée, éviction LRU (date de modification = dernier usage).
+
+Réglages (settings.json): `"source_cache": {"enabled": true, "max_gb": 5}` (`max_gb: 0` = désactivé).
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+from .config import CONFIG_DIR, SETTINGS_FILE
+from .logger import log
+
+CACHE_DIR = CONFIG_DIR / 'cache' / 'sources'
+_VIDEO_ID_RE = re.compile(r'/video/(\d+)')
+
+
+def load_source_cache_settings(settings_file=SETTINGS_FILE) -> Dict:
+    conf: Dict = {}
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            conf = (json.load(f) or {}).get('source_cache') or {}
+    except Exception:
+        conf = {}
+    try:
+        max_gb = max(0.0, float(conf.get('max_gb') if conf.get('max_gb') is not None else 5))
+    except Exception:
+        max_gb = 5.0
+    # 0 Go: aucune place, donc pas de cache (et non « illimité »)
+    return {'enabled': bool(conf.get('enabled', True)) and max_gb > 0, 'max_gb': max_gb}
+
+
+def video_id_from_url(url: str) -> Optional[str]:
+    m = _VIDEO_ID_RE.search(url or '')
+    return m.group(1) if m else None
+
+
+def _safe(s: str) -> str:
+    return re.sub(r'[^A-Za-z0-9]+', '-', str(s or '')).strip('-') or 'default'
+
+
+def link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except Exception:
+        shutil.copy2(src, dst)
+
+
+class SourceCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes: int = 5 * 1024 ** 3):
+        self.dir = str(directory)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        # clé -> (chemin, taille), du moins au plus récemment utilisé
+        self._index: 'OrderedDict[str, Tuple[str, int]]' = OrderedDict()
+        self._bytes = 0
+        os.makedirs(self.dir, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        entries = []
+        for name in os.listdir(self.dir):
+            if name.endswith('.json') or name.endswith('.part'):
+                continue
+            p = os.path.join(self.dir, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, os.path.splitext(name)[0], p, st.st_size))
+        for _, key, p, size in sorted(entries):
+            self._index[key] = (p, size)
+            self._bytes += size
+
+    @staticmethod
+    def key(video_id: str) -> str:
+        return _safe(video_id)
+
+    def get(self, video_id: str, accept: Optional[Callable[[Dict], bool]] = None) -> Optional[Tuple[str, Dict]]:
+        """(chemin en cache, méta) ou None; marque l'entrée comme récemment utilisée.
+
+        `accept(méta)` écarte une entrée dont le format ne convient pas à l'appelant.
+        """
+        k = self.key(video_id)
+        with self._lock:
+            ent = self._index.get(k)
+            if ent is None:
+                return None
+            path, _ = ent
+            if not os.path.exists(path):
+                self._drop(k)
+                return None
+            self._index.move_to_end(k)
+        meta: Dict = {}
+        try:
+            with open(os.path.join(self.dir, k + '.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f) or {}
+        except Exception:
+            meta = {}
+        if accept is not None and not accept(meta):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path, meta
+
+    def put(self, video_id: str, src: str, meta: Optional[Dict] = None) -> Optional[str]:
+        """Ajoute `src` au cache (lien physique, copie à défaut) puis évince au-delà de la taille max.
+        Remplace l'entrée existante de la vidéo (autre format)."""
+        k = self.key(video_id)
+        ext = os.path.splitext(src)[1] or '.mp4'
+        dst = os.path.join(self.dir, k + ext)
+        try:
+            with self._lock:
+                old = self._index.get(k)
+            if old is not None and old[0] != dst and os.path.exists(old[0]):
+                os.remove(old[0])  # ancienne copie d'une autre extension
+            size = os.path.getsize(src)
+            if self.max_bytes and size > self.max_bytes:
+                return None
+            tmp = dst + '.part'
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            link_or_copy(src, tmp)
+            os.replace(tmp, dst)
+            with open(os.path.join(self.dir, k + '.json'), 'w', encoding='utf-8') as f:
+                json.dump({**(meta or {}), 'size': size, 'cached_at': time.time()}, f)
+        except Exception as e:
+            log('error', f'source_cache: ajout {k} échoué: {e}')
+            return None
+        with self._lock:
+            old = self._index.pop(k, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._index[k] = (dst, size)
+            self._bytes += size
+            self._evict()
+        return dst
+
+    def checkout(self, path: str, dest_dir: str) -> str:
+        """Copie de travail (lien physique) d'une entrée dans `dest_dir`."""
+        dst = os.path.join(dest_dir, os.path.basename(path))
+        if os.path.exists(dst):
+            os.remove(dst)  # reste d'un essai précédent (dossier de travail stable)
+        link_or_copy(path, dst)
+        return dst
+
+    def _drop(self, k: str):
+        ent = self._index.pop(k, None)
+        if ent is None:
+            return
+        self._bytes -= ent[1]
+        for p in (ent[0], os.path.join(self.dir, k + '.json')):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    def _evict(self):
+        while self.max_bytes and self._bytes > self.max_bytes and self._index:
+            k = next(iter(self._index))
+            self._drop(k)
+            log('info', f'source_cache: éviction {k}')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._index), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+
+_cache: Optional[SourceCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[SourceCache]:
+    """Cache partagé du processus (None si désactivé dans les réglages)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            conf = load_source_cache_settings()
+            if not conf['enabled']:
+                return None
+            try:
+                _cache = SourceCache(max_bytes=int(conf['max_gb'] * 1024 ** 3))
+            except Exception as e:
+                log('error', f'source_cache: initialisation échouée: {e}')
+                return None
+        return _cache
@@ -9,6 +9,7 @@ import time
 import json
 import mimetypes
 from .tiktok_auth import get_token, is_configured
+from .bandwidth import ThrottledFile
 
 def post_to_tiktok(video_path: str, caption: str = '', *, on_progress: Optional[Callable[[int], None]] = None, advanced: Optional[dict] = None) -> str:
     """
@@ -56,17 +57,17 @@ def post_to_tiktok(video_path: str, caption: str = '', *, on_progress: Optional[
     try:
         size = os.path.getsize(video_path)
         mime = mimetypes.guess_type(video_path)[0] or 'video/mp4'
-        with open(video_path, 'rb') as f:
-            data = f.read()
-        up_resp = requests.put(
-            upload_url,
-            data=data,
-            headers={
-                'Content-Type': mime,
-                'Content-Length': str(size),
-            },
-            timeout=60
-        )
+        # Corps lu par blocs et prélevé sur le budget montant partagé (au lieu du fichier entier en mémoire)
+        with ThrottledFile(video_path, 'tiktok') as data:
+            up_resp = requests.put(
+                upload_url,
+                data=data,
+                headers={
+                    'Content-Type': mime,
+                    'Content-Length': str(size),
+                },
+                timeout=60
+            )
         up_resp.raise_for_status()
         if on_progress:
             on_progress(80)
@@ -20,6 +20,8 @@ from googleapiclient.errors import HttpError
 from .auth import get_credentials, delete_token
 from .constants import DEFAULT_CATEGORY_ID
 from .logger import log
+from .quota import ledger as quota_ledger, is_quota_error, QuotaExceededError, next_reset
+from .bandwidth import manager as bandwidth
 
 
 def upload_to_youtube(video_path, title, description, privacy, on_progress=None, advanced=None):
@@ -96,6 +98,8 @@ def upload_to_youtube(video_path, title, description, privacy, on_progress=None,
     base = 256 * 1024
     if chunk_size % base != 0:
         chunk_size = max(base, (chunk_size // base) * base)
+    # Refuser avant d'envoyer le fichier si le quota du jour ne couvre pas l'insert
+    quota_ledger.ensure(profile, 'videos.insert')
     media_body = MediaFileUpload(video_path, chunksize=chunk_size, resumable=True)
 
     request = youtube.videos().insert(part=",".join(body.keys()), body=body, media_body=media_body)
@@ -108,14 +112,25 @@ def upload_to_youtube(video_path, title, description, privacy, on_progress=None,
     attempt = 0
     response = None
     force_reauth_done = False
+    try:
+        total_size = int(media_body.size() or 0)
+    except Exception:
+        total_size = 0
     while response is None:
         try:
+            # Payer le chunk sur le budget montant partagé avant de l'envoyer (un renvoi après erreur compte aussi)
+            sent = getattr(request, 'resumable_progress', 0) or 0
+            bandwidth.consume('youtube', min(chunk_size, max(0, total_size - sent)) if total_size else chunk_size)
             # Utiliser l'HTTP autorisé interne du client (avec credentials)
             status, response = request.next_chunk()
             if status and on_progress:
                 on_progress(status.progress() * 100.0)
         except HttpError as e:
             code = getattr(e, 'status_code', None) or getattr(getattr(e, 'resp', None), 'status', None)
+            # Quota épuisé: inutile de réessayer avant le reset (minuit, heure du Pacifique)
+            if is_quota_error(e):
+                quota_ledger.mark_exhausted(profile)
+                raise QuotaExceededError(profile or 'default', next_reset())
             # Si non authentifié (401), on supprime le token et on relance une seule fois l'OAuth
             if code == 401 and not force_reauth_done:
                 try:
@@ -149,6 +164,7 @@ def upload_to_youtube(video_path, title, description, privacy, on_progress=None,
                 continue
             raise
     video_id = response.get("id")
+    quota_ledger.charge(profile, 'videos.insert')
     log('info', f"Upload terminé. Video ID: {video_id}")
     return video_id
 
@@ -157,6 +173,7 @@ def apply_post_upload_settings(youtube, video_id, advanced):
     if not advanced:
         return
     log('info', 'Application des paramètres avancés (recordingDetails / playlists)')
+    profile = advanced.get('profile') or None
 
     loc_desc = advanced.get("locationDescription")
     lat = advanced.get("latitude")
@@ -176,8 +193,11 @@ def apply_post_upload_settings(youtube, video_id, advanced):
             body["recordingDetails"]["recordingDate"] = rec_date
         try:
             youtube.videos().update(part="recordingDetails", body=body).execute()
+            quota_ledger.charge(profile, 'videos.update')
             log('info', 'recordingDetails mis à jour')
         except Exception as e:
+            if is_quota_error(e):
+                quota_ledger.mark_exhausted(profile)
             log('error', f"Échec update recordingDetails: {e}")
 
     playlists = advanced.get("playlists") or []
@@ -189,6 +209,9 @@ def apply_post_upload_settings(youtube, video_id, advanced):
                     "resourceId": {"kind": "youtube#video", "videoId": video_id}
                 }
             }).execute()
+            quota_ledger.charge(profile, 'playlistItems.insert')
             log('info', f"Ajouté à la playlist {pid}")
         except Exception as e:
+            if is_quota_error(e):
+                quota_ledger.mark_exhausted(profile)
             log('error', f"Échec ajout playlist {pid}: {e}")
@@ -5,3 +5,25 @@ def parse_rfc3339(s: str):
         return datetime.fromisoformat(s.replace('Z','+00:00'))
     except Exception:
         return None
+
+def sanitize_tags_500(tags_list):
+    """Tags sans '#', dédupliqués (casse ignorée), 500 caractères cumulés au plus (limite YouTube)."""
+    try:
+        if not tags_list:
+            return []
+        cleaned, seen, total = [], set(), 0
+        for t in tags_list:
+            s = (t or '').strip().lstrip('#')
+            if not s:
+                continue
+            k = s.lower()
+            if k in seen:
+                continue
+            if total + len(s) > 500:
+                continue
+            cleaned.append(s)
+            seen.add(k)
+            total += len(s)
+        return cleaned
+    except Exception:
+        return list(tags_list or [])
@@ -0,0 +1,325 @@
+"""
+Dossiers de travail stables par item de file, sous une racine gérée.
+
+Le téléchargement d'un item se fait toujours dans `<racine>/<iid>/`: après un crash,
+un timeout ou un redémarrage, yt-dlp reprend le fichier `.part` au lieu de
+repartir de zéro. Le dossier disparaît quand l'item a été traité (fichiers
+supprimés par le worker); les dossiers abandonnés sont ramassés par âge, et les
+orphelins (items qui ne sont plus dans la file) au démarrage.
+
+- Racine configurable (`root`, défaut `~/.config/.../work`); option tmpfs (`tmpfs_root`,
+  ex. `/dev/shm/t2y`) pour les items dont la taille attendue tient sous `tmpfs_max_mb`.
+- Réservations: chaque item en cours réserve `taille attendue × reserve_factor`
+  (source + sorties ffmpeg `.proc/.fast/.enc.mp4`), diminuée de ce qu'il occupe déjà.
+- Admission: un item n'est lancé que si l'espace libre moins les réservations reste
+  au-dessus de `min_free_gb`; sinon il attend qu'un autre item libère de la place.
+
+Réglages (settings.json): `"workdir": {"root": "", "tmpfs_root": "", "tmpfs_max_mb": 64,
+"min_free_gb": 2, "reserve_factor": 3, "default_mb": 50, "gc_after_h": 48}`.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, Iterable, Optional
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from .config import CONFIG_DIR, SETTINGS_FILE
+from .logger import log
+
+WORK_DIR = CONFIG_DIR / 'work'
+# sorties ffmpeg intermédiaires (toujours régénérées avec -y): inutiles après un crash
+_FFMPEG_SUFFIXES = ('.proc.mp4', '.fast.mp4', '.enc.mp4')
+# dossiers temporaires hors file (téléchargements sans item)
+SCRATCH_PREFIX = 't2y_'
+
+
+def load_workdir_settings(settings_file=SETTINGS_FILE) -> Dict:
+    conf: Dict = {}
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            conf = (json.load(f) or {}).get('workdir') or {}
+    except Exception:
+        conf = {}
+
+    def _float(k, default):
+        try:
+            return max(0.0, float(conf.get(k) if conf.get(k) is not None else default))
+        except Exception:
+            return default
+    return {
+        'root': str(conf.get('root') or '').strip() or str(WORK_DIR),
+        'tmpfs_root': str(conf.get('tmpfs_root') or '').strip(),
+        'tmpfs_max_mb': _float('tmpfs_max_mb', 64.0),
+        'min_free_gb': _float('min_free_gb', 2.0),
+        'reserve_factor': max(1.0, _float('reserve_factor', 3.0)),
+        'default_mb': _float('default_mb', 50.0) or 50.0,
+        'gc_after_h': _float('gc_after_h', 48.0),
+    }
+
+
+def expected_size(info: Optional[Dict], default: int = 0) -> int:
+    """Taille attendue (octets) d'après une extraction compacte: filesize, sinon débit × durée."""
+    if not isinstance(info, dict):
+        return default
+    sizes = []
+    for f in info.get('formats') or []:
+        s = f.get('filesize') or f.get('filesize_approx')
+        if not s and f.get('tbr') and info.get('duration'):
+            s = float(f['tbr']) * 125.0 * float(info['duration'])  # kbit/s -> octets
+        if s:
+            sizes.append(int(s))
+    return max(sizes) if sizes else default
+
+
+def _safe_name(iid: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(iid or '')).strip('.') or 'item'
+
+
+def _dir_bytes(path: str) -> int:
+    total = 0
+    try:
+        for entry in os.scandir(path):
+            try:
+                if entry.is_file(follow_symlinks=False):
+                    total += entry.stat().st_size
+            except OSError:
+                continue
+    except OSError:
+        pass
+    return total
+
+
+def _free_bytes(path: str) -> Optional[int]:
+    try:
+        os.makedirs(path, exist_ok=True)
+        return shutil.disk_usage(path).free
+    except Exception:
+        return None
+
+
+class WorkdirManager:
+    def __init__(self, conf: Optional[Dict] = None):
+        self._cv = threading.Condition()
+        # iid -> (dossier, octets réservés)
+        self._reserved: Dict[str, tuple] = {}
+        self.blocked = False
+        self.configure(conf or load_workdir_settings())
+
+    def configure(self, conf: Dict):
+        with self._cv:
+            self.conf = dict(conf)
+            self.root = self.conf['root']
+            self.tmpfs_root = self.conf.get('tmpfs_root') or ''
+            self._cv.notify_all()
+
+    # --- dossiers ---
+    def _roots(self):
+        return [r for r in (self.tmpfs_root, self.root) if r]
+
+    def item_workdir(self, iid: str, create: bool = True, expected_bytes: Optional[int] = None) -> str:
+        """Dossier stable de l'item: celui qui existe déjà (reprise), sinon tmpfs pour un petit fichier."""
+        name = _safe_name(iid)
+        for r in self._roots():
+            p = os.path.join(r, name)
+            if os.path.isdir(p):
+                return p
+        root = self.root
+        if self.tmpfs_root and expected_bytes and self._fits_tmpfs(expected_bytes):
+            root = self.tmpfs_root
+        path = os.path.join(root, name)
+        if create:
+            os.makedirs(path, exist_ok=True)
+        return path
+
+    def _fits_tmpfs(self, expected_bytes: int) -> bool:
+        need = expected_bytes * self.conf['reserve_factor']
+        if need > self.conf['tmpfs_max_mb'] * 1024 ** 2:
+            return False
+        free = _free_bytes(self.tmpfs_root)
+        return free is not None and free - self._pending(self.tmpfs_root) >= need
+
+    def scratch_dir(self) -> str:
+        """Dossier temporaire hors file, sous la racine (ramassé par `cleanup_orphans`)."""
+        os.makedirs(self.root, exist_ok=True)
+        return tempfile.mkdtemp(prefix=SCRATCH_PREFIX, dir=self.root)
+
+    def remove(self, iid: str):
+        name = _safe_name(iid)
+        for r in self._roots():
+            try:
+                p = os.path.join(r, name)
+                if os.path.isdir(p):
+                    shutil.rmtree(p, ignore_errors=True)
+            except Exception:
+                pass
+
+    # --- réservations / admission ---
+    def _pending(self, root: str) -> int:
+        """Octets réservés et pas encore écrits sur le système de fichiers de `root` (verrou tenu)."""
+        total = 0
+        for path, nbytes in list(self._reserved.values()):
+            if os.path.dirname(path) == root:
+                total += max(0, nbytes - _dir_bytes(path))
+        return total
+
+    def _has_room(self, root: str, need: int) -> bool:
+        free = _free_bytes(root)
+        if free is None:
+            return True  # espace inconnu: ne pas bloquer la file
+        # la marge protège le disque (file, logs, base); le tmpfs n'a besoin que de la réservation
+        margin = 0 if root == self.tmpfs_root else self.conf['min_free_gb'] * 1024 ** 3
+        return free - self._pending(root) - need >= margin
+
+    def acquire(self, iid: str, expected_bytes: int = 0,
+                should_continue: Callable[[], bool] = lambda: True, poll: float = 30.0,
+                on_wait: Optional[Callable[[], None]] = None) -> Optional[str]:
+        """Réserve la place d'un item et retourne son dossier de travail.
+
+        Bloque tant que l'espace libre (moins les réservations en cours) ne couvre pas
+        la réservation plus la marge `min_free_gb`; réévalue toutes les `poll` secondes
+        (place libérée hors du processus). Retourne None si `should_continue()` devient faux.
+        `on_wait` est appelé une fois quand l'item commence à attendre.
+        """
+        expected = int(expected_bytes or 0) or int(self.conf['default_mb'] * 1024 ** 2)
+        need = int(expected * self.conf['reserve_factor'])
+        warned = False
+        with self._cv:
+            while True:
+                path = self.item_workdir(iid, expected_bytes=expected)
+                root = os.path.dirname(path)
+                # place déjà occupée par un essai précédent (reprise): elle compte dans la réservation
+                if self._has_room(root, max(0, need - _dir_bytes(path))):
+                    break
+                if root == self.tmpfs_root and not os.listdir(path):
+                    # tmpfs rempli entre-temps: l'item part sur disque
+                    os.rmdir(path)
+                    path = os.path.join(self.root, _safe_name(iid))
+                    os.makedirs(path, exist_ok=True)
+                    root = self.root
+                    if self._has_room(root, need):
+                        break
+                if not should_continue():
+                    return None
+                if not warned:
+                    warned = True
+                    self.blocked = True
+                    log('error', f'workdir: espace disque insuffisant dans {root}, item {iid} en attente')
+                    if on_wait is not None:
+                        try:
+                            on_wait()
+                        except Exception:
+                            pass
+                self._cv.wait(poll)
+            self._reserved[iid] = (path, need)
+            self.blocked = False
+        return path
+
+    def release(self, iid: str):
+        with self._cv:
+            self._reserved.pop(iid, None)
+            self._cv.notify_all()
+
+    def wake(self):
+        with self._cv:
+            self._cv.notify_all()
+
+    # --- nettoyage ---
+    def cleanup_orphans(self, keep: Iterable[str] = (), min_age_s: float = 600.0) -> int:
+        """Supprime les dossiers d'items absents de `keep` (et les dossiers temporaires `t2y_*`)
+        inactifs depuis `min_age_s`, ainsi que les sorties ffmpeg partielles des items gardés
+        plus anciennes que `min_age_s`."""
+        keep_dirs = {_safe_name(i) for i in keep}
+        with self._cv:
+            active = {os.path.basename(p) for p, _ in self._reserved.values()}
+        cutoff = time.time() - min_age_s
+        removed = 0
+        for root in self._roots():
+            try:
+                entries = list(os.scandir(root))
+            except OSError:
+                continue
+            for entry in entries:
+                if not entry.is_dir(follow_symlinks=False) or entry.name in active:
+                    continue
+                try:
+                    if entry.name in keep_dirs:
+                        # même délai: une sortie récente peut appartenir à un autre processus en cours
+                        for f in os.scandir(entry.path):
+                            if f.name.endswith(_FFMPEG_SUFFIXES) and f.stat().st_mtime < cutoff:
+                                os.remove(f.path)
+                        continue
+                    newest = entry.stat().st_mtime
+                    for f in os.scandir(entry.path):
+                        newest = max(newest, f.stat().st_mtime)
+                    if newest < cutoff:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                        removed += 1
+                except Exception:
+                    continue
+        if removed:
+            log('info', f'workdir: {removed} dossier(s) orphelin(s) supprimé(s)')
+        return removed
+
+    def snapshot(self) -> Dict:
+        with self._cv:
+            reserved = sum(n for _, n in self._reserved.values())
+            out = {'root': self.root, 'tmpfs_root': self.tmpfs_root or None, 'items': len(self._reserved),
+                   'reserved_bytes': reserved, 'pending_bytes': self._pending(self.root),
+                   'min_free_bytes': int(self.conf['min_free_gb'] * 1024 ** 3), 'blocked': self.blocked}
+        out['free_bytes'] = _free_bytes(self.root)
+        if self.tmpfs_root:
+            out['tmpfs_free_bytes'] = _free_bytes(self.tmpfs_root)
+        return out
+
+
+manager = WorkdirManager()
+
+
+def item_workdir(iid: str, create: bool = True, expected_bytes: Optional[int] = None) -> str:
+    """Dossier de travail stable de l'item `iid`."""
+    return manager.item_workdir(iid, create=create, expected_bytes=expected_bytes)
+
+
+def scratch_dir() -> str:
+    return manager.scratch_dir()
+
+
+def remove_workdir(iid: str):
+    manager.remove(iid)
+
+
+def gc_workdirs(max_age_h: Optional[float] = None, keep: Iterable[str] = ()) -> int:
+    """Supprime les dossiers de travail inactifs depuis plus de `max_age_h` heures (sauf `keep`)."""
+    if max_age_h is None:
+        max_age_h = manager.conf['gc_after_h']
+    if not max_age_h:
+        return 0
+    cutoff = time.time() - max_age_h * 3600.0
+    keep_dirs = {_safe_name(i) for i in keep}
+    removed = 0
+    for root in manager._roots():
+        try:
+            names = os.listdir(root)
+        except FileNotFoundError:
+            continue
+        for name in names:
+            if name in keep_dirs:
+                continue
+            path = os.path.join(root, name)
+            try:
+                # dernier usage = fichier le plus récent du dossier (un .part qui grossit le rafraîchit)
+                newest = os.path.getmtime(path)
+                for entry in os.scandir(path):
+                    newest = max(newest, entry.stat().st_mtime)
+                if newest < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except Exception:
+                continue
+    if removed:
+        log('info', f'workdir: {removed} dossier(s) de travail abandonné(s) supprimé(s)')
+    return removed
@@ -0,0 +1,138 @@
+"""
+Pool d'instances `yt_dlp.YoutubeDL` réutilisables, par profil d'options.
+
+Créer un YoutubeDL par URL coûte l'initialisation des extracteurs, l'analyse des
+options et une nouvelle session HTTP. Le pool garde quelques instances inactives
+par profil (proxy, timeout, format...) et les prête à un seul thread à la fois:
+cookies et connexions sont conservés d'un appel à l'autre.
+
+- `outtmpl` et le hook de progression sont propres à chaque appel: ils sont
+  posés à chaque prise (un seul hook répartiteur par instance, vidé au retour).
+- Une instance est recyclée après `max_uses` utilisations (croissance mémoire
+  des caches d'extracteurs); au-delà de `max_idle` instances inactives par
+  profil, les instances rendues sont fermées.
+
+Réglages (settings.json): `"ydl_pool": {"max_uses": 50, "max_idle": 4}`.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+import json
+import threading
+
+try:
+    import yt_dlp  # type: ignore
+except Exception:
+    yt_dlp = None
+
+from .config import SETTINGS_FILE
+from .logger import log
+
+# Options propres à un appel: exclues de la clé de profil
+_PER_CALL = ('outtmpl', 'progress_hooks')
+
+
+def load_pool_settings(settings_file=SETTINGS_FILE) -> Dict[str, int]:
+    conf: Dict = {}
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            conf = (json.load(f) or {}).get('ydl_pool') or {}
+    except Exception:
+        conf = {}
+
+    def _int(k, default):
+        try:
+            return max(1, int(conf.get(k) or default))
+        except Exception:
+            return default
+    return {'max_uses': _int('max_uses', 50), 'max_idle': _int('max_idle', 4)}
+
+
+def available() -> bool:
+    return yt_dlp is not None
+
+
+def profile_key(opts: Dict) -> str:
+    return json.dumps({k: v for k, v in opts.items() if k not in _PER_CALL}, sort_keys=True, default=str)
+
+
+class _Pooled:
+    def __init__(self, opts: Dict):
+        self.hook: Optional[Callable[[Dict], None]] = None
+        self.uses = 0
+        params = {k: v for k, v in opts.items() if k not in _PER_CALL}
+        params['progress_hooks'] = [self._dispatch]
+        self.ydl = yt_dlp.YoutubeDL(params)
+
+    def _dispatch(self, d: Dict):
+        hook = self.hook
+        if hook is not None:
+            hook(d)
+
+    def close(self):
+        try:
+            close = getattr(self.ydl, 'close', None)
+            if close is not None:
+                close()
+            else:
+                self.ydl.__exit__(None, None, None)
+        except Exception:
+            pass
+
+
+class YDLPool:
+    def __init__(self, max_uses: int = 50, max_idle: int = 4):
+        self.max_uses = int(max_uses)
+        self.max_idle = int(max_idle)
+        self._lock = threading.Lock()
+        self._idle: Dict[str, List[_Pooled]] = {}
+        self.stats = {'created': 0, 'reused': 0, 'recycled': 0}
+
+    @contextmanager
+    def get(self, opts: Dict, outtmpl: Optional[str] = None,
+            hook: Optional[Callable[[Dict], None]] = None) -> Iterator:
+        """Prête une instance YoutubeDL pour `opts` (usage exclusif jusqu'à la sortie du bloc)."""
+        if yt_dlp is None:
+            raise RuntimeError('yt_dlp non disponible')
+        key = profile_key(opts)
+        with self._lock:
+            idle = self._idle.get(key) or []
+            inst = idle.pop() if idle else None
+            self.stats['reused' if inst is not None else 'created'] += 1
+        if inst is None:
+            inst = _Pooled(opts)
+        inst.hook = hook
+        if outtmpl:
+            inst.ydl.params['outtmpl'] = {'default': outtmpl}
+        try:
+            yield inst.ydl
+        finally:
+            inst.hook = None
+            inst.uses += 1
+            self._give_back(key, inst)
+
+    def _give_back(self, key: str, inst: _Pooled):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if inst.uses < self.max_uses and len(idle) < self.max_idle:
+                idle.append(inst)
+                return
+            if inst.uses >= self.max_uses:
+                self.stats['recycled'] += 1
+        inst.close()
+
+    def clear(self):
+        with self._lock:
+            insts = [i for idle in self._idle.values() for i in idle]
+            self._idle.clear()
+        for inst in insts:
+            inst.close()
+        if insts:
+            log('info', f'ydl_pool: {len(insts)} instance(s) fermée(s)')
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {**self.stats, 'idle': sum(len(v) for v in self._idle.values()), 'profiles': len(self._idle)}
+
+
+pool = YDLPool(**load_pool_settings())
@@ -0,0 +1,15 @@
+"""
+Configuration commune des tests du paquet t2y.
+
+`t2y.config` crée le dossier de configuration sous `Path.home()` dès l'import:
+HOME pointe donc vers un dossier temporaire avant tout import de t2y.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+os.environ['HOME'] = tempfile.mkdtemp(prefix='t2y-tests-')
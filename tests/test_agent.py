@@ -0,0 +1,52 @@
+"""
+Tests des baux de l'agent distant (webapp.agent): heartbeat refusé par le coordinateur.
+"""
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('yt_dlp')
+pytest.importorskip('googleapiclient')
+
+from webapp.agent import _RemoteLeases  # noqa: E402
+
+
+class _Client:
+    def __init__(self, answers):
+        self.answers = answers
+        self.beats = []
+
+    def heartbeat(self, iid):
+        self.beats.append(iid)
+        ans = self.answers.get(iid, True)
+        if isinstance(ans, Exception):
+            raise ans
+        return ans
+
+
+def test_refused_heartbeat_marks_item_lost():
+    client = _Client({'item_1': False})
+    leases = _RemoteLeases(client, threading.Event())
+    leases.add('item_1', 30.0)
+    leases.add('item_2', 30.0)
+    leases.beat(now=0.0)
+    assert client.beats == []  # moins d'un tiers du bail écoulé
+    leases.beat(now=time.time() + 11.0)
+    assert sorted(client.beats) == ['item_1', 'item_2']
+    assert leases.lost('item_1')
+    assert not leases.lost('item_2')
+    # l'item perdu n'est plus prolongé
+    leases.beat(now=time.time() + 30.0)
+    assert client.beats.count('item_1') == 1
+    leases.release('item_1')
+    assert not leases.lost('item_1')
+
+
+def test_unreachable_coordinator_keeps_lease():
+    client = _Client({'item_1': OSError('injoignable')})
+    leases = _RemoteLeases(client, threading.Event())
+    leases.add('item_1', 30.0)
+    leases.beat(now=time.time() + 11.0)
+    assert not leases.lost('item_1')
@@ -0,0 +1,97 @@
+"""
+Tests du gestionnaire de bande passante (seaux à jetons) sur une horloge simulée.
+"""
+import json
+
+import pytest
+
+from t2y import bandwidth as bw
+from t2y.bandwidth import BandwidthManager, ThrottledFile, TokenBucket, load_bandwidth_settings
+
+MB = 1000 * 1000
+
+
+class _Clock:
+    """`time.monotonic`/`time.sleep` simulés: dormir fait avancer l'horloge."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, s):
+        self.slept += s
+        self.now += s
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(bw, 'time', c)
+    return c
+
+
+def _transfer(manager, stage, total, chunk=50 * 1000):
+    for _ in range(total // chunk):
+        manager.consume(stage, chunk)
+
+
+def test_bucket_burst_then_rate(clock):
+    b = TokenBucket(rate=1 * MB)
+    assert b.reserve(MB) == 0.0  # ~1 s d'avance
+    assert b.reserve(MB // 2) == pytest.approx(0.5)
+    clock.now += 0.5  # dette résorbée
+    assert b.reserve(MB // 4) == pytest.approx(0.25)
+    clock.now += 60  # le seau ne dépasse pas son volume
+    assert b.reserve(MB) == 0.0
+    assert b.total == MB * 11 // 4
+
+
+def test_stage_share_caps_rate(clock):
+    m = BandwidthManager(up_mbps=8, shares={'youtube': 0.5})  # 1 Mo/s montant, YouTube à 0,5 Mo/s
+    _transfer(m, 'youtube', 4 * MB)
+    # 4 Mo à 0,5 Mo/s, moins le volume initial du seau (0,5 Mo)
+    assert clock.slept == pytest.approx(7.0, rel=0.02)
+    assert m.snapshot()['bytes']['youtube'] == 4 * MB
+
+
+def test_global_budget_is_shared_between_stages(clock):
+    m = BandwidthManager(up_mbps=8, shares={'youtube': 1.0, 'tiktok': 1.0})
+    for _ in range(50):
+        m.consume('youtube', 40 * 1000)
+        m.consume('tiktok', 40 * 1000)
+    # 4 Mo au total sur un budget de 1 Mo/s (1 Mo d'avance)
+    assert clock.slept == pytest.approx(3.0, rel=0.02)
+
+
+def test_directions_are_independent_and_unlimited_by_default(clock):
+    m = BandwidthManager(down_mbps=8)
+    assert m.limited('download') and not m.limited('youtube') and not m.limited('inconnu')
+    _transfer(m, 'youtube', 10 * MB)
+    assert clock.slept == 0.0
+    _transfer(m, 'download', 3 * MB)
+    assert clock.slept == pytest.approx(2.0, rel=0.02)
+
+
+def test_throttled_file_pays_what_it_reads(clock, tmp_path):
+    p = tmp_path / 'v.mp4'
+    p.write_bytes(b'x' * (3 * MB))
+    m = BandwidthManager(up_mbps=8)
+    with ThrottledFile(str(p), 'youtube', m) as f:
+        assert len(f) == 3 * MB
+        while f.read(256 * 1000):
+            pass
+    assert m.snapshot()['bytes']['youtube'] == 3 * MB
+    # part YouTube par défaut: 0,7 Mo/s (0,7 Mo d'avance)
+    assert clock.slept == pytest.approx((3 - 0.7) / 0.7, rel=0.02)
+
+
+def test_settings(tmp_path):
+    f = tmp_path / 'settings.json'
+    f.write_text(json.dumps({'bandwidth': {'down_mbps': '20', 'up_mbps': -3,
+                                           'shares': {'youtube': 0, 'tiktok': 2, 'autre': 0.1}}}), encoding='utf-8')
+    conf = load_bandwidth_settings(f)
+    assert conf['down_mbps'] == 20.0 and conf['up_mbps'] == 0.0
+    assert conf['shares'] == {'download': 1.0, 'youtube': 1.0, 'tiktok': 1.0}
@@ -0,0 +1,61 @@
+"""
+Tests de l'import en masse (TXT / CSV / JSONL) et de la déduplication.
+"""
+from t2y.bulk_import import batched, dedupe, detect_format, iter_entries, normalize_url, open_lines
+
+V1 = 'https://www.tiktok.com/@u/video/1'
+V2 = 'https://www.tiktok.com/@u/video/2'
+
+
+def _parse(text, fmt):
+    stats = {}
+    return list(iter_entries(text.splitlines(keepends=True), fmt, stats)), stats
+
+
+def test_detect_format():
+    assert detect_format('liste.CSV') == 'csv'
+    assert detect_format('export.json') == 'jsonl'
+    assert detect_format('', '{"url": "x"}') == 'jsonl'
+    assert detect_format('urls', V1) == 'txt'
+
+
+def test_txt_lines_and_comments():
+    entries, stats = _parse(f'# commentaire\n\n{V1}\n  {V2}, Mon titre \n,sans url\n', 'txt')
+    assert [(e['url'], e['title']) for e in entries] == [(V1, ''), (V2, 'Mon titre')]
+    assert stats == {'skipped': 1}
+
+
+def test_csv_with_header_and_positional():
+    text = f'url,title,tags,privacy,priority\n{V1},Titre,"a|#b",private,URGENT\n,vide,,,\n'
+    entries, stats = _parse(text, 'csv')
+    assert entries == [{'url': V1, 'title': 'Titre', 'description': '', 'tags': ['a', 'b'],
+                        'privacy': 'private', 'priority': 'urgent'}]
+    assert stats == {'skipped': 1}
+    entries, _ = _parse(f'{V1},Un\n{V2}\n', 'csv')
+    assert [(e['url'], e['title']) for e in entries] == [(V1, 'Un'), (V2, '')]
+
+
+def test_jsonl_objects_strings_and_garbage():
+    text = f'{{"url": "{V1}", "tags": ["x"]}}\n"{V2}"\n{{pas du json\n[1, 2]\n{{"title": "sans url"}}\n'
+    entries, stats = _parse(text, 'jsonl')
+    assert [(e['url'], e['tags']) for e in entries] == [(V1, ['x']), (V2, [])]
+    assert stats == {'skipped': 3}
+
+
+def test_dedupe_normalizes_urls():
+    assert normalize_url(f'  {V1}/#top ') == V1
+    seen = {V2}
+    stats = {}
+    entries = [{'url': V1}, {'url': V1 + '/'}, {'url': V2 + '#x'}, {'url': 'https://vm.tiktok.com/ZM1'}]
+    kept = [e['url'] for e in dedupe(entries, seen, stats)]
+    assert kept == [V1, 'https://vm.tiktok.com/ZM1']
+    assert stats == {'duplicates': 2}
+    assert V1 in seen
+
+
+def test_batched_and_open_lines(tmp_path):
+    assert [len(b) for b in batched(({'url': str(i)} for i in range(5)), size=2)] == [2, 2, 1]
+    p = tmp_path / 'urls.txt'
+    p.write_bytes(('\ufeff' + f'{V1}\n{V2}\n').encode('utf-8'))
+    entries = list(iter_entries(open_lines(str(p)), 'txt'))
+    assert [e['url'] for e in entries] == [V1, V2]
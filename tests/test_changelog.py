@@ -0,0 +1,50 @@
+"""
+Tests du journal de versions servi aux clients (deltas de la file).
+"""
+from t2y.changelog import ChangeLog
+
+
+def test_since_returns_latest_snapshot_once():
+    log = ChangeLog(epoch=1000)
+    v0 = log.version
+    log.touch('item_1', {'iid': 'item_1', 'd_pct': 10})
+    log.touch('item_2', {'iid': 'item_2'})
+    v = log.touch('item_1', {'iid': 'item_1', 'd_pct': 50})
+    d = log.since(v0)
+    assert d['reset'] is False
+    assert d['version'] == v
+    assert d['epoch'] == 1000
+    assert d['items'] == [{'iid': 'item_2'}, {'iid': 'item_1', 'd_pct': 50}]
+    assert d['removed'] == []
+    assert log.since(v)['items'] == []
+
+
+def test_removals_and_paging():
+    log = ChangeLog(epoch=0)
+    log.touch('item_1', {'iid': 'item_1'})
+    v1 = log.touch('item_2', {'iid': 'item_2'})
+    log.remove('item_1')
+    log.touch('item_3', {'iid': 'item_3'})
+    d = log.since(v1)
+    assert d['removed'] == ['item_1']
+    assert d['items'] == [{'iid': 'item_3'}]
+    page = log.since(0, limit=2)
+    assert [it['iid'] for it in page['items']] == ['item_2']
+    assert page['removed'] == ['item_1']
+    assert log.since(page['version'])['items'] == [{'iid': 'item_3'}]
+
+
+def test_foreign_or_pruned_version_resets():
+    old = ChangeLog()
+    old.touch('item_1', {'iid': 'item_1'})
+    log = ChangeLog(epoch=old.epoch + 10_000)
+    # version d'un processus précédent (époque plus ancienne) ou venue du futur
+    assert log.since(old.version)['reset'] is True
+    assert log.since(log.version + 1)['reset'] is True
+    small = ChangeLog(max_tombstones=2, epoch=0)
+    for i in range(4):
+        small.touch(f'item_{i}', {'iid': f'item_{i}'})
+    for i in range(4):
+        small.remove(f'item_{i}')
+    assert small.since(0)['reset'] is True
+    assert small.since(small.version)['reset'] is False
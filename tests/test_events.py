@@ -0,0 +1,69 @@
+"""
+Tests du bus SSE: débit limité par item, changement de statut immédiat, abonné en retard.
+"""
+import asyncio
+
+from t2y.events import EventBus
+
+
+async def _drain(sub, wait=0.0):
+    await asyncio.sleep(wait)
+    out = []
+    while not sub.queue.empty():
+        out.append(sub.queue.get_nowait())
+    return out
+
+
+def test_item_updates_are_coalesced_but_status_changes_are_not():
+    async def _main():
+        bus = EventBus(min_interval=0.05)
+        sub = bus.subscribe()
+        bus.item('item_1', {'iid': 'item_1', 'status': 'téléchargement', 'd_pct': 1}, 1)
+        bus.item('item_1', {'iid': 'item_1', 'status': 'téléchargement', 'd_pct': 20}, 2)
+        bus.item('item_1', {'iid': 'item_1', 'status': 'téléchargement', 'd_pct': 40}, 3)
+        first = await _drain(sub, 0.01)
+        assert [e['id'] for e in first] == [1]
+        # les pourcentages intermédiaires partent fusionnés au tour suivant de la purge
+        later = await _drain(sub, 0.2)
+        assert [(e['event'], e['id'], e['data']['d_pct']) for e in later] == [('item', 3, 40)]
+        bus.item('item_1', {'iid': 'item_1', 'status': 'upload'}, 4)
+        now = await _drain(sub, 0.01)
+        assert [e['id'] for e in now] == [4]
+        bus.unsubscribe(sub)
+    asyncio.run(_main())
+
+
+def test_lagging_subscriber_gets_resync():
+    async def _main():
+        bus = EventBus(maxsize=3)
+        sub = bus.subscribe()
+        for i in range(5):
+            bus.publish('log', f'ligne {i}')
+        events = await _drain(sub, 0.01)
+        assert [e['event'] for e in events] == ['resync']
+        # resync consommé: le flux reprend
+        bus.publish('log', 'suite')
+        assert [e['data'] for e in await _drain(sub, 0.01)] == ['suite']
+        bus.unsubscribe(sub)
+    asyncio.run(_main())
+
+
+def test_removed_drops_pending_update():
+    async def _main():
+        bus = EventBus(min_interval=0.05)
+        sub = bus.subscribe()
+        bus.item('item_1', {'iid': 'item_1', 'status': 'upload', 'u_pct': 1}, 1)
+        bus.item('item_1', {'iid': 'item_1', 'status': 'upload', 'u_pct': 50}, 2)
+        bus.removed('item_1', 3)
+        events = await _drain(sub, 0.2)
+        assert [(e['event'], e['id']) for e in events] == [('item', 1), ('removed', 3)]
+        bus.unsubscribe(sub)
+    asyncio.run(_main())
+
+
+def test_publish_without_subscribers_is_a_noop():
+    bus = EventBus()
+    bus.publish('log', 'personne')
+    bus.item('item_1', {'iid': 'item_1', 'status': 'en cours'}, 1)
+    assert not bus.has_subscribers()
+    assert bus._flusher is None
@@ -0,0 +1,73 @@
+"""
+Tests du choix de format source (`copy` / `encode`) et de la réutilisation du cache.
+"""
+from t2y.formats import FormatPolicy, format_policy, processing_plan
+
+
+def _fmt(fid, vcodec='avc1.64001F', acodec='mp4a.40.2', w=1080, h=1920, size=10_000_000, ext='mp4', **kw):
+    return {'format_id': fid, 'vcodec': vcodec, 'acodec': acodec, 'width': w, 'height': h,
+            'filesize': size, 'ext': ext, **kw}
+
+
+FORMATS = [
+    _fmt('hevc_1080', vcodec='hev1', size=6_000_000),
+    _fmt('h264_1080', size=12_000_000),
+    _fmt('h264_720', w=720, h=1280, size=5_000_000),
+    _fmt('h264_1440', w=1440, h=2560, size=20_000_000),
+    _fmt('video_only', acodec='none', size=1_000),
+]
+
+
+def _ids(policy, formats=FORMATS):
+    return [f['format_id'] for f in policy.rank(formats)]
+
+
+def test_processing_plan():
+    assert processing_plan(None) == 'copy'
+    assert processing_plan({'ff_trim_start': '00:01', 'ff_remux': True}) == 'copy'
+    assert processing_plan({'ff_trim_start': '00:01'}) == 'encode'
+    assert processing_plan({'ff_mode': 'crop'}) == 'encode'
+    assert processing_plan({'ff_normalize': True}) == 'encode'
+
+
+def test_copy_prefers_h264_that_fits_target():
+    assert _ids(FormatPolicy('copy')) == ['h264_1080', 'h264_720', 'h264_1440', 'hevc_1080']
+
+
+def test_encode_prefers_smallest_without_upscale():
+    assert _ids(FormatPolicy('encode')) == ['hevc_1080', 'h264_1080', 'h264_1440', 'h264_720']
+
+
+def test_unknown_sizes_rank_by_bitrate():
+    formats = [_fmt('lourd', size=None, tbr=3000), _fmt('leger', vcodec='hev1', size=None, tbr=1200)]
+    assert _ids(FormatPolicy('encode'), formats) == ['leger', 'lourd']
+
+
+def test_selector_falls_back_to_best_format():
+    policy = FormatPolicy('copy')
+    assert [f['format_id'] for f in policy({'formats': FORMATS})] == ['h264_1080']
+    only_video = [_fmt('v1', acodec='none'), _fmt('v2', acodec='none')]
+    assert [f['format_id'] for f in policy({'formats': only_video})] == ['v2']
+    assert list(policy({'formats': []})) == []
+
+
+def test_policy_key_and_sharing():
+    p = format_policy({'ff_target_w': 720, 'ff_target_h': 1280})
+    assert p.key == 'copy-720x1280'
+    assert repr(p) == 'FormatPolicy(copy-720x1280)'
+    assert format_policy({'ff_target_w': '720', 'ff_target_h': 1280}) is p
+    assert format_policy({'ff_target_w': 'abc'}).key == 'copy-1080x1920'
+
+
+def test_accepts_cached_source():
+    copy, encode = FormatPolicy('copy'), FormatPolicy('encode')
+    hevc = {'policy': encode.key, 'vcodec': 'hev1', 'acodec': 'mp4a', 'width': 1080, 'height': 1920, 'ext': 'mp4'}
+    h264 = {'policy': encode.key, 'vcodec': 'avc1', 'acodec': 'mp4a', 'width': 720, 'height': 1280, 'ext': 'mp4'}
+    assert encode.accepts(hevc)
+    assert not copy.accepts(hevc)
+    assert copy.accepts(h264)
+    assert not copy.accepts({**h264, 'dynamic_range': 'HDR10'})
+    assert not copy.accepts({**h264, 'width': 1440, 'height': 2560})
+    # format inconnu: seulement s'il vient de la même politique
+    assert copy.accepts({'policy': copy.key})
+    assert not copy.accepts({'policy': encode.key})
@@ -0,0 +1,100 @@
+"""
+Tests de la réutilisation de l'extraction du watcher au téléchargement (`ie_info`).
+
+`yt_dlp.YoutubeDL` est remplacé par une classe minimale qui écrit un fichier factice:
+seul le choix entre `process_ie_result` (info réutilisée) et `extract_info` est testé.
+"""
+import time
+import types
+
+import pytest
+
+from t2y import downloader, ydl_pool as pool_mod
+from t2y.metadata import INFO_TTL, compact_info, info_expired
+
+
+class _FakeYDL:
+    calls = []
+
+    def __init__(self, params):
+        self.params = dict(params)
+
+    def _write(self, ie):
+        path = self.params['outtmpl']['default'] % {'id': ie['id'], 'ext': ie.get('ext') or 'mp4'}
+        with open(path, 'wb') as f:
+            f.write(b'video')
+        return {**ie, 'requested_downloads': [{'filepath': path}]}
+
+    def process_ie_result(self, ie, download=True):
+        _FakeYDL.calls.append('process')
+        if ie.get('refuse'):
+            raise RuntimeError('403')
+        return self._write(ie)
+
+    def extract_info(self, url, download=True):
+        _FakeYDL.calls.append('extract')
+        return self._write({'id': '123', 'ext': 'mp4', 'duration': 12})
+
+
+@pytest.fixture(autouse=True)
+def fake_yt_dlp(monkeypatch):
+    fake = types.SimpleNamespace(YoutubeDL=_FakeYDL)
+    monkeypatch.setattr(pool_mod, 'yt_dlp', fake)
+    monkeypatch.setattr(downloader, 'yt_dlp', fake)
+    monkeypatch.setattr(downloader, 'get_cache', lambda: None)
+    monkeypatch.setattr(downloader, 'load_segmented_settings', lambda: {'enabled': False})
+    _FakeYDL.calls = []
+    yield
+    pool_mod.pool.clear()
+
+
+def _info(**kw):
+    return compact_info({'id': '123', 'ext': 'mp4', 'duration': 12,
+                         'formats': [{'format_id': 'h264', 'url': 'https://cdn/v.mp4', 'ext': 'mp4'}], **kw})
+
+
+URL = 'https://www.tiktok.com/@u/video/123'
+
+
+def test_fresh_info_skips_extraction(tmp_path):
+    path, meta = downloader.download_tiktok_with_info(URL, info=_info(), workdir=str(tmp_path))
+    assert _FakeYDL.calls == ['process']
+    assert path == str(tmp_path / '123.mp4')
+    assert meta == {'duration': 12}
+
+
+def test_expired_info_is_extracted_again(tmp_path):
+    info = _info()
+    info['_t2y_expires'] = time.time() - 1
+    downloader.download_tiktok_with_info(URL, info=info, workdir=str(tmp_path))
+    assert _FakeYDL.calls == ['extract']
+
+
+def test_refused_info_falls_back_to_extraction(tmp_path):
+    info = _info()
+    info['refuse'] = True  # champ inconnu de compact_info: ajouté après coup pour le faux YoutubeDL
+    downloader.download_tiktok_with_info(URL, info=info, workdir=str(tmp_path))
+    assert _FakeYDL.calls == ['process', 'extract']
+
+
+def test_compact_info_keeps_formats_and_url_expiry():
+    raw = {'id': '1', 'title': 't', 'thumbnails': [{'url': 'x'}] * 50, 'formats': [
+        {'format_id': 'a', 'url': 'https://cdn/a?expire=2000000000', 'fragments': ['…']},
+        {'format_id': 'b', 'url': 'https://cdn/b?x-expires=1900000000'},
+        {'format_id': 'c'},  # sans URL: inutilisable
+    ]}
+    out = compact_info(raw)
+    assert 'thumbnails' not in out
+    assert [f['format_id'] for f in out['formats']] == ['a', 'b']
+    assert 'fragments' not in out['formats'][0]
+    assert out['_t2y_expires'] == 1900000000.0
+
+
+def test_compact_info_without_expiry_uses_ttl():
+    out = _info()
+    assert abs(out['_t2y_expires'] - (out['_t2y_extracted_at'] + INFO_TTL)) < 1
+    assert not info_expired(out)
+    assert info_expired(out, margin=INFO_TTL + 1)
+    assert info_expired(None)
+    assert compact_info({'_type': 'playlist', 'formats': [{'url': 'x'}]}) is None
+    assert compact_info({'id': '1', 'formats': []}) is None
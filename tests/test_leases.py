@@ -0,0 +1,76 @@
+"""
+Tests des baux (LeaseKeeper sur le backend SQLite): heartbeat, bail perdu, reprise.
+"""
+import pytest
+
+from t2y.leases import LeaseKeeper
+from t2y.queue_store import SqliteQueueStore
+
+
+def _item(iid, **kw):
+    return {'iid': iid, 'url': f'https://www.tiktok.com/@u/video/{iid[5:]}', 'status': 'en attente', **kw}
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = SqliteQueueStore(tmp_path / 'queue.db')
+    s.put_many([_item('item_1'), _item('item_2')])
+    return s
+
+
+@pytest.fixture
+def keeper(store):
+    # ttl long: le thread de heartbeat ne tourne pas pendant le test, `beat()` est appelé à la main
+    k = LeaseKeeper(store, 'A', ttl=600.0)
+    yield k
+    k.close()
+
+
+def _expire(store, iid, owner):
+    # bail échu (processus figé): un heartbeat de durée négative le met dans le passé
+    store.heartbeat([iid], owner, -1.0)
+
+
+def test_beat_extends_held_leases(store, keeper):
+    assert keeper.acquire('item_1')
+    _expire(store, 'item_1', 'A')
+    keeper.beat()
+    _, owner, expires = store.get_leased('item_1')
+    assert owner == 'A'
+    assert expires > store.get_leased('item_2')[2]
+    assert keeper.held() == ['item_1']
+    assert not keeper.lost('item_1')
+
+
+def test_expired_lease_taken_over_is_lost(store, keeper):
+    assert keeper.acquire('item_1')
+    assert not store.acquire('item_1', 'B', 600.0)  # bail valide: refusé
+    _expire(store, 'item_1', 'A')
+    assert store.acquire('item_1', 'B', 600.0)
+    keeper.beat()
+    assert keeper.lost('item_1')
+    assert keeper.held() == []
+    # la libération locale ne touche pas au bail du nouveau détenteur
+    keeper.release('item_1')
+    assert not keeper.lost('item_1')
+    assert store.get_leased('item_1')[1] == 'B'
+
+
+def test_lost_flag_cleared_when_lease_is_taken_again(store, keeper):
+    assert keeper.acquire('item_1')
+    _expire(store, 'item_1', 'A')
+    assert store.acquire('item_1', 'B', 600.0)
+    keeper.beat()
+    assert keeper.lost('item_1')
+    _expire(store, 'item_1', 'B')
+    assert keeper.acquire('item_1')
+    assert not keeper.lost('item_1')
+
+
+def test_close_releases_held_leases(store):
+    k = LeaseKeeper(store, 'A', ttl=600.0)
+    it = k.lease_next()
+    assert it['iid'] == 'item_1'
+    k.close()
+    assert store.get_leased('item_1')[1] == ''
+    assert store.acquire('item_1', 'B', 600.0)
@@ -0,0 +1,123 @@
+"""
+Tests du cache persistant des métadonnées TikTok: TTL, extraction unique par clé, éviction LRU.
+"""
+import threading
+import types
+
+import pytest
+
+from t2y import meta_cache as mc
+from t2y.meta_cache import MetaCache, cache_key
+
+URL = 'https://www.tiktok.com/@u/video/123'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = types.SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(mc, 'time', types.SimpleNamespace(time=lambda: c.now))
+    return c
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return MetaCache(tmp_path / 'meta.db', ttl_h=1, max_entries=100)
+
+
+def _loader(calls, meta=None):
+    def _load():
+        calls.append(1)
+        return meta if meta is not None else {'title': f'titre {len(calls)}'}
+    return _load
+
+
+def test_second_fetch_is_served_from_cache(cache, tmp_path):
+    calls = []
+    assert cache.fetch(URL, _loader(calls)) == {'title': 'titre 1'}
+    assert cache.fetch(URL + '?lang=fr', _loader(calls)) == {'title': 'titre 1'}
+    assert len(calls) == 1
+    assert cache.snapshot()['hits'] == 1 and cache.snapshot()['misses'] == 1
+    # persistant: un autre processus (nouvelle connexion) le retrouve
+    assert MetaCache(tmp_path / 'meta.db').get('id:123') == {'title': 'titre 1'}
+
+
+def test_entries_expire_after_ttl(cache, clock):
+    calls = []
+    cache.fetch(URL, _loader(calls))
+    clock.now += 3599
+    cache.fetch(URL, _loader(calls))
+    assert len(calls) == 1
+    clock.now += 2
+    assert cache.get('id:123') is None
+    assert cache.fetch(URL, _loader(calls)) == {'title': 'titre 2'}
+    assert cache.snapshot()['entries'] == 1
+
+
+def test_concurrent_fetches_extract_once(cache):
+    release = threading.Event()
+    calls = []
+
+    def _slow():
+        calls.append(1)
+        release.wait(2.0)
+        return {'title': 'unique'}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.fetch(URL, _slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while cache.stats['shared'] < 4:
+        threading.Event().wait(0.005)
+    release.set()
+    for t in threads:
+        t.join(2.0)
+    assert len(calls) == 1
+    assert results == [{'title': 'unique'}] * 5
+
+
+def test_short_link_is_also_stored_under_video_id(cache):
+    calls = []
+    short = 'https://vm.tiktok.com/ZM1abc/'
+    cache.fetch(short, _loader(calls, {'title': 't', 'info': {'id': '456'}}))
+    assert cache.fetch('https://www.tiktok.com/@u/video/456', _loader(calls)) == {'title': 't', 'info': {'id': '456'}}
+    assert len(calls) == 1
+
+
+def test_failures_are_not_cached(cache):
+    calls = []
+
+    def _fail():
+        calls.append(1)
+        return None
+
+    assert cache.fetch(URL, _fail) is None
+    assert cache.fetch(URL, _fail) is None
+    assert len(calls) == 2
+
+
+def test_lru_eviction(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(mc, '_EVICT_EVERY', 1)
+    cache = MetaCache(tmp_path / 'meta.db', max_entries=2)
+    for vid in ('1', '2'):
+        clock.now += 1
+        cache.put([f'id:{vid}'], {'v': vid})
+    clock.now += 1
+    assert cache.get('id:1') == {'v': '1'}  # 1 redevient récent
+    clock.now += 1
+    cache.put(['id:3'], {'v': '3'})
+    assert cache.get('id:2') is None
+    assert cache.get('id:1') is not None and cache.get('id:3') is not None
+
+
+def test_cache_key():
+    assert cache_key(URL) == 'id:123'
+    assert cache_key('https://vm.tiktok.com/ZM1abc/').startswith('url:')
+    assert cache_key('') is None
+
+
+def test_invalidate(cache):
+    calls = []
+    cache.fetch(URL, _loader(calls))
+    cache.invalidate(URL)
+    cache.fetch(URL, _loader(calls))
+    assert len(calls) == 2
@@ -0,0 +1,143 @@
+"""
+Tests de la concurrence par étape (StageLimiter) et de la borne disque du mode pipeline (PrefetchGate).
+"""
+import json
+import threading
+import time
+
+from t2y.pipeline import PrefetchGate, StageLimiter, load_concurrency, load_pipeline
+
+
+def _run_stage(limiter, stage, n, hold=0.05):
+    """Lance `n` threads qui tiennent un slot `hold` s; retourne le pic de slots simultanés."""
+    lock = threading.Lock()
+    state = {'cur': 0, 'peak': 0}
+
+    def _work():
+        with limiter.slot(stage):
+            with lock:
+                state['cur'] += 1
+                state['peak'] = max(state['peak'], state['cur'])
+            time.sleep(hold)
+            with lock:
+                state['cur'] -= 1
+
+    threads = [threading.Thread(target=_work) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5.0)
+    return state['peak']
+
+
+def test_stage_limiter_bounds_each_stage():
+    limiter = StageLimiter({'download': 3, 'upload': 1})
+    assert _run_stage(limiter, 'download', 6) == 3
+    assert _run_stage(limiter, 'upload', 3) == 1
+    snap = limiter.snapshot()
+    assert snap['download'] == {'active': 0, 'limit': 3, 'waiting': 0}
+
+
+def test_stage_limiter_is_fifo():
+    limiter = StageLimiter({'ffmpeg': 1})
+    order = []
+
+    def _work(i):
+        with limiter.slot('ffmpeg'):
+            order.append(i)
+
+    with limiter.slot('ffmpeg'):
+        threads = []
+        for i in range(4):
+            t = threading.Thread(target=_work, args=(i,))
+            t.start()
+            threads.append(t)
+            # le suivant n'arrive qu'une fois celui-ci en file
+            while limiter.snapshot()['ffmpeg']['waiting'] < i + 1:
+                time.sleep(0.001)
+    for t in threads:
+        t.join(2.0)
+    assert order == [0, 1, 2, 3]
+
+
+def test_stage_limiter_resize_releases_waiters():
+    limiter = StageLimiter({'upload': 1})
+    first = limiter.slot('upload')
+    first.__enter__()
+    entered = threading.Event()
+
+    def _second():
+        with limiter.slot('upload'):
+            entered.set()
+
+    t = threading.Thread(target=_second)
+    t.start()
+    assert not entered.wait(0.05)
+    limiter.resize({'upload': 2})
+    assert entered.wait(2.0)
+    first.__exit__(None, None, None)
+    t.join(2.0)
+
+
+def test_prefetch_gate_bounds_pending_bytes():
+    gate = PrefetchGate(max_bytes=100)
+    assert gate.enter('item_1')
+    gate.set_bytes('item_1', 60)
+    assert gate.enter('item_2')  # 60 < 100: place libre
+    gate.set_bytes('item_2', 50)
+    entered = threading.Event()
+    t = threading.Thread(target=lambda: gate.enter('item_3') and entered.set())
+    t.start()
+    assert not entered.wait(0.05)
+    gate.leave('item_1')
+    assert entered.wait(2.0)
+    t.join(2.0)
+    assert gate.snapshot() == {'items': 2, 'bytes': 50, 'max_bytes': 100}
+
+
+def test_prefetch_gate_first_item_always_enters():
+    gate = PrefetchGate(max_bytes=10)
+    assert gate.enter('item_1')
+    gate.set_bytes('item_1', 10 ** 9)
+    gate.leave('item_1')
+    assert gate.enter('item_2')
+    gate.set_bytes('item_404', 5)  # item jamais entré: ignoré
+    assert gate.snapshot()['bytes'] == 0
+
+
+def test_load_concurrency_and_pipeline(tmp_path):
+    settings = tmp_path / 'settings.json'
+    desktop = tmp_path / 'desktop.json'
+    settings.write_text(json.dumps({
+        'concurrency': {'download': 4, 'ffmpeg': 'auto', 'upload': 0},
+        'pipeline': {'enabled': True, 'lookahead': 3, 'max_temp_gb': 'x'},
+    }), encoding='utf-8')
+    desktop.write_text(json.dumps({'processing': {'concurrent_uploads': 2}}), encoding='utf-8')
+    limits = load_concurrency(settings, desktop)
+    assert limits['download'] == 4
+    assert limits['ffmpeg'] >= 1
+    assert limits['upload'] == 2  # 0 invalide: limite de l'app desktop
+    assert limits['workers'] == max(limits['download'], limits['ffmpeg'], limits['upload'])
+    assert load_pipeline(settings) == {'enabled': True, 'lookahead': 3, 'max_temp_gb': 4.0}
+    assert load_concurrency(tmp_path / 'absent.json', tmp_path / 'absent2.json') == {
+        'download': 1, 'ffmpeg': 1, 'upload': 1, 'workers': 1}
+
+
+def test_prefetch_gate_wake_aborts_waiter_without_polling():
+    gate = PrefetchGate(max_bytes=10)
+    gate.enter('item_1')
+    gate.set_bytes('item_1', 10)
+    running = threading.Event()
+    running.set()
+    result = []
+    t = threading.Thread(target=lambda: result.append(gate.enter('item_2', running.is_set)))
+    t.start()
+    time.sleep(0.05)
+    assert result == []  # attente sans délai: seul un réveil la fait avancer
+    running.clear()
+    started = time.monotonic()
+    gate.wake()
+    t.join(2.0)
+    assert result == [False]
+    assert time.monotonic() - started < 0.5
+    assert gate.snapshot()['items'] == 1
@@ -0,0 +1,39 @@
+"""
+Tests du registre de progression volatile (pourcentages hors de la file persistée).
+"""
+from t2y.progress import ProgressRegistry
+
+
+def test_set_clamps_and_reports_changes():
+    seen = []
+    reg = ProgressRegistry(on_change=seen.append)
+    assert reg.set('item_1', d_pct=42.7, u_pct=150, f_pct=-3)
+    assert reg.get('item_1') == {'d_pct': 42, 'u_pct': 100, 'f_pct': 0}
+    assert not reg.set('item_1', d_pct=42)  # inchangé: pas de notification
+    assert not reg.set('item_1', d_pct=None, foo=10, u_pct='x')
+    assert seen == ['item_1']
+
+
+def test_merged_prefers_registry_over_persisted_values():
+    reg = ProgressRegistry()
+    it = {'iid': 'item_1', 'status': 'en cours', 'd_pct': 10, 'u_pct': 0}
+    assert reg.merged(it) == {'d_pct': 10, 'u_pct': 0, 'f_pct': 0}
+    reg.set('item_1', d_pct=80)
+    assert reg.merged(it) == {'d_pct': 80, 'u_pct': 0, 'f_pct': 0}
+    reg.clear('item_1')
+    assert reg.merged(it)['d_pct'] == 10
+
+
+def test_merged_done_item_without_progress_shows_full():
+    reg = ProgressRegistry()
+    it = {'iid': 'item_2', 'status': 'terminé'}
+    # ffmpeg facultatif: pas de 100 % inventé pour f_pct
+    assert reg.merged(it) == {'d_pct': 100, 'u_pct': 100, 'f_pct': 0}
+
+
+def test_snapshot_is_a_copy():
+    reg = ProgressRegistry()
+    reg.set('item_1', u_pct=5)
+    snap = reg.snapshot()
+    snap['item_1']['u_pct'] = 99
+    assert reg.get('item_1') == {'u_pct': 5}
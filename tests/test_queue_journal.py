@@ -0,0 +1,112 @@
+"""
+Tests du backend journal (snapshot + JSONL): relecture, fin tronquée, compaction.
+"""
+import json
+import os
+
+import pytest
+
+from t2y.queue_journal import JournalLockedError, JournalQueueStore
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / 'queue.snapshot.json'), str(tmp_path / 'queue.journal.jsonl')
+
+
+def _open(paths):
+    snap, journal = paths
+    return JournalQueueStore(snap, journal, compact_every=3600)
+
+
+def _crash(store):
+    """Fin brutale du processus: ni compaction ni fermeture propre (le système libère le verrou)."""
+    store._stop.set()
+    store._fp.close()
+    store._unlock()
+
+
+def _fill(store):
+    store.put({'iid': 'item_1', 'status': 'en attente'})
+    store.put({'iid': 'item_2', 'status': 'en attente'})
+    store.put({'iid': 'item_3', 'status': 'en attente'})
+    store.update('item_1', {'status': 'terminé', 'u_pct': 100})
+    store.swap('item_2', 'item_3')
+    store.delete('item_2')
+
+
+def _state(store):
+    return [(it['iid'], it['status']) for it in store.load()]
+
+
+def test_replay_without_compaction(paths):
+    s = _open(paths)
+    _fill(s)
+    _crash(s)  # pas de compaction: tout vient du journal
+    assert _state(_open(paths)) == [('item_1', 'terminé'), ('item_3', 'en attente')]
+
+
+def test_torn_tail_is_cut(paths):
+    s = _open(paths)
+    _fill(s)
+    s._fp.write('{"op": "put", "item": {"iid": "item_9"')  # crash pendant l'écriture
+    _crash(s)
+    s = _open(paths)
+    assert _state(s) == [('item_1', 'terminé'), ('item_3', 'en attente')]
+    # la fin tronquée est coupée: l'ajout suivant reste relisible
+    s.put({'iid': 'item_4', 'status': 'en attente'})
+    _crash(s)
+    assert [iid for iid, _ in _state(_open(paths))] == ['item_1', 'item_3', 'item_4']
+
+
+def test_corrupt_middle_line_is_skipped(paths):
+    s = _open(paths)
+    s.put({'iid': 'item_1', 'status': 'en attente'})
+    s._fp.write('pas du json\n')
+    s.put({'iid': 'item_2', 'status': 'en attente'})
+    _crash(s)
+    size = os.path.getsize(paths[1])
+    assert [iid for iid, _ in _state(_open(paths))] == ['item_1', 'item_2']
+    assert os.path.getsize(paths[1]) == size  # seule une fin illisible est coupée
+
+
+def test_compaction_folds_journal_into_snapshot(paths):
+    s = _open(paths)
+    _fill(s)
+    s.set_meta('next_id', '3')
+    s.compact()
+    assert os.path.getsize(paths[1]) == 0
+    assert not os.path.exists(paths[1] + '.old')
+    with open(paths[0], 'r', encoding='utf-8') as f:
+        snap = json.load(f)
+    assert [it['iid'] for it in snap['items']] == ['item_1', 'item_3']
+    s.update('item_3', {'status': 'erreur'})
+    s.close()
+    s = _open(paths)
+    assert _state(s) == [('item_1', 'terminé'), ('item_3', 'erreur')]
+    assert s.get_meta('next_id') == '3'
+
+
+def test_crash_after_rotation_replays_old_journal(paths):
+    s = _open(paths)
+    _fill(s)
+    with s._lock:
+        s._rotate()  # journal mis de côté, snapshot jamais écrit (crash)
+    s.put({'iid': 'item_5', 'status': 'en attente'})
+    _crash(s)
+    assert os.path.exists(paths[1] + '.old')
+    s = _open(paths)
+    assert _state(s) == [('item_1', 'terminé'), ('item_3', 'en attente'), ('item_5', 'en attente')]
+    s.compact()
+    assert not os.path.exists(paths[1] + '.old')
+    s.close()
+    assert [iid for iid, _ in _state(_open(paths))] == ['item_1', 'item_3', 'item_5']
+
+
+def test_second_opener_is_refused(paths):
+    s = _open(paths)
+    s.put({'iid': 'item_1', 'status': 'en attente'})
+    with pytest.raises(JournalLockedError):
+        _open(paths)
+    s.close()
+    assert [iid for iid, _ in _state(_open(paths))] == ['item_1']
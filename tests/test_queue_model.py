@@ -0,0 +1,136 @@
+"""
+Tests de la file indexée: dépilage fifo/deadline, déplacement, identifiants.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+from t2y.queue_model import IndexedQueue, load_scheduler
+
+
+def _at(hours: float) -> str:
+    return (datetime.now(timezone.utc) + timedelta(hours=hours)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _item(iid, status='en attente', priority=None, publish_in=None):
+    it = {'iid': iid, 'status': status}
+    if priority:
+        it['priority'] = priority
+    if publish_in is not None:
+        it['adv'] = {'publishAt': _at(publish_in)}
+    return it
+
+
+def _drain(q, match=None):
+    out = []
+    while True:
+        it = q.pop_ready(match)
+        if it is None:
+            return out
+        out.append(it['iid'])
+
+
+def test_fifo_pop_skips_idle_and_removed():
+    q = IndexedQueue([_item('item_1'), _item('item_2', 'terminé'), _item('item_3'), _item('item_4')])
+    q.remove('item_3')
+    q.get('item_4')['status'] = 'erreur'  # passé en erreur après sa mise en file
+    assert _drain(q) == ['item_1']
+    assert q.ready_count() == 0
+
+
+def test_pop_with_match_keeps_others_in_place():
+    q = IndexedQueue([_item('item_1'), _item('item_2'), _item('item_3')])
+    assert q.pop_ready(lambda it: it['iid'] == 'item_2')['iid'] == 'item_2'
+    assert q.pop_ready(lambda it: False) is None
+    assert _drain(q) == ['item_1', 'item_3']
+
+
+def test_move_reorders_list_and_dispatch():
+    q = IndexedQueue([_item('item_1'), _item('item_2'), _item('item_3')])
+    assert q.move('item_3', 'up') == 'item_2'
+    assert q.move('item_1', 'up') is None
+    assert q.move('item_404', 'down') is None
+    assert [it['iid'] for it in q] == ['item_1', 'item_3', 'item_2']
+    assert _drain(q) == ['item_1', 'item_3', 'item_2']
+
+
+def test_mark_ready_and_discard_ready():
+    q = IndexedQueue([_item('item_1'), _item('item_2')])
+    q.discard_ready('item_1')  # pris par un autre processus
+    assert _drain(q) == ['item_2']
+    q.get('item_1')['status'] = 'en attente'
+    q.mark_ready(q.get('item_1'))
+    assert _drain(q) == ['item_1']
+
+
+def test_deadline_orders_by_due_date_then_priority():
+    q = IndexedQueue([
+        _item('item_1', priority='bulk'),
+        _item('item_2'),
+        _item('item_3', priority='urgent'),
+        _item('item_4', publish_in=48),  # hors horizon: classe normal, avant les items sans date
+        _item('item_5', priority='bulk', publish_in=2),
+        _item('item_6', publish_in=1),
+    ], mode='deadline', horizon_h=12)
+    assert _drain(q) == ['item_6', 'item_5', 'item_3', 'item_4', 'item_2', 'item_1']
+
+
+def test_deadline_overdue_item_goes_first():
+    q = IndexedQueue([
+        _item('item_1', priority='urgent'),
+        _item('item_2', priority='bulk', publish_in=-3),  # échéance dépassée
+        _item('item_3', publish_in=5),
+    ], mode='deadline', horizon_h=12)
+    assert _drain(q) == ['item_2', 'item_3', 'item_1']
+
+
+def test_deadline_horizon_change_reorders_ready_items():
+    q = IndexedQueue([
+        _item('item_1', priority='urgent'),
+        _item('item_2', priority='bulk', publish_in=24),
+    ], mode='deadline', horizon_h=12)
+    q.set_mode('deadline', horizon_h=48)
+    assert _drain(q) == ['item_2', 'item_1']
+
+
+def test_deadline_requeued_item_keeps_its_rank():
+    q = IndexedQueue([_item('item_1', publish_in=2), _item('item_2'), _item('item_3', priority='bulk')],
+                     mode='deadline', horizon_h=12)
+    first = q.pop_ready()
+    assert first['iid'] == 'item_1'
+    q.mark_ready(first)  # arrêt de la file avant lancement
+    assert _drain(q) == ['item_1', 'item_2', 'item_3']
+
+
+def test_deadline_match_keeps_skipped_items_in_order():
+    q = IndexedQueue([
+        _item('item_1', publish_in=1),
+        _item('item_2', priority='urgent'),
+        _item('item_3'),
+    ], mode='deadline', horizon_h=12)
+    assert q.pop_ready(lambda it: it['iid'] == 'item_3')['iid'] == 'item_3'
+    assert _drain(q) == ['item_1', 'item_2']
+
+
+def test_load_scheduler_falls_back_on_bad_values(tmp_path):
+    f = tmp_path / 'settings.json'
+    f.write_text(json.dumps({'scheduler': {'mode': 'lifo', 'horizon_h': -5}}), encoding='utf-8')
+    assert load_scheduler(f) == {'mode': 'fifo', 'horizon_h': 0.0}
+    f.write_text(json.dumps({'scheduler': {'mode': 'Deadline', 'horizon_h': 'x'}}), encoding='utf-8')
+    assert load_scheduler(f) == {'mode': 'deadline', 'horizon_h': 12.0}
+    assert load_scheduler(tmp_path / 'absent.json') == {'mode': 'fifo', 'horizon_h': 12.0}
+
+
+def test_set_mode_rebuilds_ready_order():
+    q = IndexedQueue([_item('item_1', priority='bulk'), _item('item_2', priority='urgent')])
+    q.set_mode('deadline')
+    assert q.pop_ready()['iid'] == 'item_2'
+    q.set_mode('fifo')
+    assert _drain(q) == ['item_1']
+
+
+def test_new_iid_is_monotonic_after_removal():
+    q = IndexedQueue([_item('item_1'), _item('item_7')])
+    q.remove('item_7')
+    assert q.new_iid() == 'item_8'
+    dup = q.append({'iid': 'item_1', 'status': 'en attente'})
+    assert dup['iid'] == 'item_9'
@@ -0,0 +1,117 @@
+"""
+Tests du backend SQLite de la file (positions, mises à jour, baux).
+"""
+import time
+
+import pytest
+
+from t2y.queue_store import SqliteQueueStore
+
+
+def _item(iid, **kw):
+    return {'iid': iid, 'url': f'https://www.tiktok.com/@u/video/{iid[5:]}', 'status': 'en attente', **kw}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SqliteQueueStore(tmp_path / 'queue.db')
+
+
+def _iids(store):
+    return [it['iid'] for it in store.load()]
+
+
+def test_put_appends_and_replaces_in_place(store):
+    store.put(_item('item_1'))
+    store.put(_item('item_2'))
+    store.put(_item('item_1', title='nouveau', d_pct=40))
+    assert _iids(store) == ['item_1', 'item_2']
+    it = store.load()[0]
+    assert it['title'] == 'nouveau'
+    assert it['d_pct'] == 40
+    assert it['result'] == ''
+
+
+def test_update_columns_and_data(store):
+    store.put(_item('item_1', adv={'profile': 'a'}))
+    store.update('item_1', {'status': 'terminé', 'u_pct': '100', 'result': None, 'yt_id': 'abc'})
+    it = store.load()[0]
+    assert it['status'] == 'terminé'
+    assert it['u_pct'] == 100
+    assert it['result'] == ''
+    assert it['yt_id'] == 'abc'
+    assert it['adv'] == {'profile': 'a'}
+
+
+def test_swap_and_delete(store):
+    store.put_many([_item('item_1'), _item('item_2'), _item('item_3')])
+    store.swap('item_1', 'item_3')
+    assert _iids(store) == ['item_3', 'item_2', 'item_1']
+    store.swap('item_1', 'item_404')
+    assert _iids(store) == ['item_3', 'item_2', 'item_1']
+    store.delete_many(['item_2', 'item_3'])
+    assert _iids(store) == ['item_1']
+
+
+def test_lease_next_follows_order_and_profile(store):
+    store.put_many([
+        _item('item_1', status='terminé'),
+        _item('item_2', adv={'profile': 'chaine2'}),
+        _item('item_3'),
+    ])
+    it = store.lease_next('w1', ttl=60, profile='')
+    assert it['iid'] == 'item_3'
+    assert it['status'] == 'en cours'
+    it = store.lease_next('w2', ttl=60)
+    assert it['iid'] == 'item_2'
+    # tout est pris ou terminé
+    assert store.lease_next('w3', ttl=60) is None
+    # bail détenu par un autre: refusé; par soi-même: prolongé
+    assert not store.acquire('item_3', 'w2', ttl=60)
+    assert store.acquire('item_3', 'w1', ttl=60)
+
+
+def test_heartbeat_reports_lost_leases(store):
+    store.put_many([_item('item_1'), _item('item_2')])
+    store.lease_next('w1', ttl=60)
+    assert store.heartbeat(['item_1', 'item_2'], 'w1', ttl=60) == ['item_2']
+    store.release('item_1', 'w1')
+    assert store.heartbeat(['item_1'], 'w1', ttl=60) == ['item_1']
+
+
+def test_reclaim_expired_leases(store):
+    store.put_many([_item('item_1'), _item('item_2'), _item('item_3', status='en cours')])
+    store.lease_next('mort', ttl=-1)   # bail déjà expiré
+    store.lease_next('vivant', ttl=60)
+    # item_1 (bail expiré) et item_3 (en cours sans bail: crash) repartent en attente
+    assert store.reclaim_expired() == 2
+    statuses = {it['iid']: it['status'] for it in store.load()}
+    assert statuses == {'item_1': 'en attente', 'item_2': 'en cours', 'item_3': 'en attente'}
+    assert store.lease_next('w', ttl=60)['iid'] == 'item_1'
+
+
+def test_reclaim_expired_quota_holds(store):
+    store.put_many([_item('item_1', status='quota', result='quota épuisé'), _item('item_2', status='quota')])
+    store.hold('item_1', time.time() - 1)
+    store.hold('item_2', time.time() + 3600)
+    assert store.reclaim_expired() == 1
+    items = {it['iid']: it for it in store.load()}
+    assert items['item_1']['status'] == 'en attente'
+    assert items['item_1']['result'] == ''
+    assert items['item_2']['status'] == 'quota'
+
+
+def test_changes_since_tracks_updates_and_deletes(tmp_path):
+    a = SqliteQueueStore(tmp_path / 'queue.db')
+    b = SqliteQueueStore(tmp_path / 'queue.db')  # autre processus sur la même base
+    a.put_many([_item('item_1'), _item('item_2')])
+    rev = a.revision()
+    assert a.changes_since(rev) == ([], [], rev)
+    b.lease_next('w', ttl=60)
+    b.heartbeat(['item_1'], 'w', ttl=60)  # sans effet sur la révision
+    b.delete('item_2')
+    rows, gone, cur = a.changes_since(rev)
+    assert [(it['iid'], it['status'], owner) for it, owner, _ in rows] == [('item_1', 'en cours', 'w')]
+    assert gone == ['item_2']
+    assert cur > rev
+    assert a.changes_since(cur) == ([], [], cur)
@@ -0,0 +1,93 @@
+"""
+Tests du registre de quota YouTube (jour et reset à minuit, heure du Pacifique).
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+import t2y.quota as quota
+from t2y.quota import QuotaExceededError, QuotaLedger, next_reset, pacific_day
+
+
+def _ts(*args) -> float:
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def test_next_reset_is_pacific_midnight():
+    # hiver (PST, UTC-8): minuit Pacifique = 08:00 UTC
+    assert next_reset(_ts(2026, 1, 15, 10, 0)) == _ts(2026, 1, 16, 8, 0)
+    assert next_reset(_ts(2026, 1, 16, 7, 59)) == _ts(2026, 1, 16, 8, 0)
+    assert next_reset(_ts(2026, 1, 16, 8, 0)) == _ts(2026, 1, 17, 8, 0)
+    assert pacific_day(_ts(2026, 1, 16, 7, 59)) == '2026-01-15'
+
+
+@pytest.mark.skipif(quota._PACIFIC.utcoffset(None) is not None, reason='tzdata absent: fuseau fixe UTC-8')
+def test_next_reset_follows_daylight_saving():
+    # été (PDT, UTC-7): minuit Pacifique = 07:00 UTC
+    assert next_reset(_ts(2026, 7, 1, 12, 0)) == _ts(2026, 7, 2, 7, 0)
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    day = {'v': '2026-01-15'}
+    monkeypatch.setattr(quota, 'pacific_day', lambda now=None: day['v'])
+    settings = tmp_path / 'settings.json'
+    settings.write_text('{"quota": {"daily_limit": 2000, "profiles": {"chaine2": 5000}}}', encoding='utf-8')
+    led = QuotaLedger(tmp_path / 'quota.json', settings_file=settings)
+    led.day = day
+    return led
+
+
+def test_charge_and_limits(ledger):
+    assert ledger.remaining() == 2000
+    assert ledger.remaining('chaine2') == 5000
+    ledger.charge(None, 'videos.insert')
+    ledger.charge(None, 'playlistItems.insert', 2)
+    assert ledger.remaining('default') == 300
+    with pytest.raises(QuotaExceededError):
+        ledger.ensure('', 'videos.insert')
+    # persisté
+    assert QuotaLedger(ledger.path, ledger.settings_file).snapshot()['profiles']['default']['calls'] == {
+        'videos.insert': 1, 'playlistItems.insert': 2}
+
+
+def test_exhausted_until_next_pacific_day(ledger):
+    ledger.mark_exhausted('chaine2')
+    assert ledger.remaining('chaine2') == 0
+    assert not ledger.can_spend('chaine2', 1)
+    ledger.day['v'] = '2026-01-16'
+    assert ledger.remaining('chaine2') == 5000
+    assert ledger.snapshot()['profiles']['chaine2']['exhausted'] is False
+
+
+def test_two_processes_share_the_ledger(ledger):
+    other = QuotaLedger(ledger.path, ledger.settings_file)  # même fichier, autre processus
+    ledger.charge(None, 'videos.update')
+    other.charge(None, 'videos.update')
+    ledger.charge(None, 'playlistItems.insert')
+    assert ledger.remaining() == other.remaining() == 2000 - 150
+    other.mark_exhausted(None)
+    assert ledger.remaining() == 0
+
+
+def test_reservation_at_dispatch(ledger):
+    other = QuotaLedger(ledger.path, ledger.settings_file)
+    assert ledger.reserve(None, 'item_1', 1600)
+    # le reste (400) ne couvre pas un second upload, quel que soit le processus
+    assert not other.reserve(None, 'item_2', 1600)
+    assert other.remaining() == 400
+    with ledger.working_on('item_1'):
+        ledger.ensure(None, 'videos.insert')  # sa propre réservation reste disponible
+        ledger.charge(None, 'videos.insert')
+        ledger.charge(None, 'videos.update')
+    snap = other.snapshot()['profiles']['default']
+    assert (snap['used'], snap['reserved'], snap['remaining']) == (1650, 0, 350)
+    ledger.release(None, 'item_1')
+    assert other.snapshot()['profiles']['default']['reserved'] == 0
+
+
+def test_stale_reservation_expires(ledger, monkeypatch):
+    assert ledger.reserve(None, 'item_1', 1600)
+    assert ledger.remaining() == 400
+    monkeypatch.setattr(quota, 'RESERVATION_TTL', -1.0)  # processus mort sans rendre sa réservation
+    assert ledger.remaining() == 2000
@@ -0,0 +1,92 @@
+"""
+Tests du pipeline d'un item (webapp.runner): bail perdu en cours de traitement.
+
+Les étapes (yt-dlp, ffmpeg, API YouTube) sont remplacées: seul l'enchaînement est testé.
+"""
+import pytest
+
+pytest.importorskip('yt_dlp')
+pytest.importorskip('googleapiclient')
+
+from t2y.pipeline import PrefetchGate, StageLimiter  # noqa: E402
+from t2y.progress import ProgressRegistry  # noqa: E402
+from t2y.workdir import WorkdirManager  # noqa: E402
+from webapp.runner import ItemRunner  # noqa: E402
+
+
+class _Leases:
+    def __init__(self):
+        self.lost_iids = set()
+        self.released = []
+
+    def lost(self, iid):
+        return iid in self.lost_iids
+
+    def release(self, iid):
+        self.released.append(iid)
+        self.lost_iids.discard(iid)
+
+
+@pytest.fixture
+def make_runner(tmp_path):
+    def _make(leases, saved, finished, lose_at=None):
+        workdirs = WorkdirManager({'root': str(tmp_path / 'work'), 'tmpfs_root': '', 'min_free_gb': 0.0,
+                                   'reserve_factor': 1.0, 'default_mb': 1.0, 'gc_after_h': 48.0})
+        runner = ItemRunner(ProgressRegistry(), StageLimiter({}), PrefetchGate(), workdirs,
+                            save=lambda it, *keys: saved.append(keys), leases=leases,
+                            on_finished=finished.append)
+        calls = []
+
+        def _download(it, adv):
+            calls.append('download')
+            if lose_at == 'download':
+                leases.lost_iids.add(it['iid'])
+            vf = tmp_path / 'work' / 'v.mp4'
+            vf.write_bytes(b'x')
+            return str(vf), {}
+
+        def _ffmpeg(it, adv, vf, info):
+            calls.append('ffmpeg')
+            if lose_at == 'ffmpeg':
+                leases.lost_iids.add(it['iid'])
+            return vf
+
+        def _upload(it, adv, vf):
+            runner._check_lease(it)
+            calls.append('upload')
+            it['status'] = 'terminé'
+
+        runner._stage_download = _download
+        runner._stage_ffmpeg = _ffmpeg
+        runner._stage_upload = _upload
+        return runner, calls
+    return _make
+
+
+def _item():
+    return {'iid': 'item_1', 'url': 'https://www.tiktok.com/@u/video/1', 'status': 'en attente',
+            'adv': {'destinations': {'yt': False}}}
+
+
+def test_process_saves_and_releases(make_runner):
+    leases, saved, finished = _Leases(), [], []
+    runner, calls = make_runner(leases, saved, finished)
+    it = _item()
+    assert runner.process(it) is True
+    assert calls == ['download', 'ffmpeg', 'upload']
+    assert saved[-1] == ('status', 'result', 'results', 'badges', 'finished_at')
+    assert leases.released == ['item_1']
+    assert finished == [it]
+
+
+@pytest.mark.parametrize('lose_at', ['download', 'ffmpeg'])
+def test_lost_lease_stops_before_upload_and_writes_nothing(make_runner, lose_at):
+    leases, saved, finished = _Leases(), [], []
+    runner, calls = make_runner(leases, saved, finished, lose_at=lose_at)
+    assert runner.process(_item()) is False
+    assert 'upload' not in calls
+    # seul le passage "en cours" (bail encore tenu) a été écrit
+    assert saved == [('status',)]
+    assert finished == []
+    assert leases.released == ['item_1']
+    assert runner.workdirs._reserved == {}
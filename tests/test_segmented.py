@@ -0,0 +1,139 @@
+"""
+Tests du téléchargement segmenté (requêtes Range parallèles) contre un serveur HTTP local.
+"""
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+from t2y.segmented import CHUNK, _split, download_ranged, load_segmented_settings  # noqa: E402
+
+PAYLOAD = bytes(range(256)) * 8192  # 2 Mio: plusieurs blocs de lecture par segment
+
+
+class _Server:
+    def __init__(self, ranges=True, cut_once_at=None):
+        self.ranges = ranges
+        # coupe la connexion une fois après N octets du segment qui commence à 0
+        self.cut_once_at = cut_once_at
+        self.requested = []
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                rng = self.headers.get('Range')
+                if not server.ranges or not rng:
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(PAYLOAD)))
+                    self.end_headers()
+                    self.wfile.write(PAYLOAD)
+                    return
+                start, _, end = rng.split('=', 1)[1].partition('-')
+                start, end = int(start), int(end or len(PAYLOAD) - 1)
+                server.requested.append((start, end))
+                body = PAYLOAD[start:end + 1]
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{len(PAYLOAD)}')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if start == 0 and end > 0 and server.cut_once_at:
+                    self.wfile.write(body[:server.cut_once_at])
+                    server.cut_once_at = None
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/v.mp4'
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def _make(**kw):
+        s = _Server(**kw)
+        servers.append(s)
+        return s
+    yield _make
+    for s in servers:
+        s.close()
+
+
+def _data_ranges(server):
+    return sorted(r for r in server.requested if r != (0, 0))  # sans la sonde
+
+
+def test_segments_are_merged_in_order(serve, tmp_path):
+    server = serve()
+    dest = str(tmp_path / 'v.mp4')
+    seen, paid = [], []
+    assert download_ranged(server.url, dest, connections=4, on_progress=seen.append, throttle=paid.append)
+    with open(dest, 'rb') as f:
+        assert f.read() == PAYLOAD
+    assert _data_ranges(server) == [(s, e) for s, e, _ in _split(len(PAYLOAD), 4)]
+    assert sum(paid) == len(PAYLOAD)
+    assert seen[-1] == 100
+    assert os.listdir(tmp_path) == ['v.mp4']  # ni .seg.part ni état
+
+
+def test_no_range_support_leaves_nothing(serve, tmp_path):
+    server = serve(ranges=False)
+    dest = str(tmp_path / 'v.mp4')
+    assert download_ranged(server.url, dest) is False
+    assert os.listdir(tmp_path) == []
+
+
+def test_small_file_is_left_to_ytdlp(serve, tmp_path):
+    server = serve()
+    assert download_ranged(server.url, str(tmp_path / 'v.mp4'), min_bytes=len(PAYLOAD) + 1) is False
+    assert _data_ranges(server) == []
+
+
+def test_interrupted_segment_retries_from_last_byte(serve, tmp_path):
+    server = serve(cut_once_at=2 * CHUNK + 1000)
+    dest = str(tmp_path / 'v.mp4')
+    assert download_ranged(server.url, dest, connections=2)
+    with open(dest, 'rb') as f:
+        assert f.read() == PAYLOAD
+    first = [r for r in _data_ranges(server) if r[0] < len(PAYLOAD) // 2]
+    assert first[0][0] == 0
+    # reprise après les blocs reçus, pas de retéléchargement du début
+    assert first[1][0] == 2 * CHUNK
+
+
+def test_resume_from_saved_state(serve, tmp_path):
+    server = serve()
+    dest = str(tmp_path / 'v.mp4')
+    segs = _split(len(PAYLOAD), 2)
+    half = len(PAYLOAD) // 2
+    # essai précédent: premier segment à moitié écrit, second terminé
+    segs[0][2] = 20000
+    segs[1][2] = segs[1][1] - segs[1][0] + 1
+    part = dest + '.seg.part'
+    with open(part, 'wb') as f:
+        f.write(PAYLOAD[:20000] + b'\0' * (half - 20000) + PAYLOAD[half:])
+    with open(part + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'total': len(PAYLOAD), 'segments': segs}, f)
+    assert download_ranged(server.url, dest, connections=2)
+    assert _data_ranges(server) == [(20000, segs[0][1])]
+    with open(dest, 'rb') as f:
+        assert f.read() == PAYLOAD
+
+
+def test_settings_bounds(tmp_path):
+    f = tmp_path / 'settings.json'
+    f.write_text(json.dumps({'segmented': {'connections': 64, 'min_mb': -1}}), encoding='utf-8')
+    assert load_segmented_settings(f) == {'enabled': True, 'connections': 16, 'min_mb': 0.0}
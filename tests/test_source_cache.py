@@ -0,0 +1,82 @@
+"""
+Tests du cache de sources (par id TikTok): LRU, liens physiques, formats acceptés.
+"""
+import json
+import os
+
+from t2y.source_cache import SourceCache, load_source_cache_settings, video_id_from_url
+
+
+def _src(tmp_path, name, size):
+    p = tmp_path / 'work' / name
+    p.parent.mkdir(exist_ok=True)
+    p.write_bytes(b'v' * size)
+    return str(p)
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = SourceCache(tmp_path / 'cache', max_bytes=250)
+    cache.put('1', _src(tmp_path, '1.mp4', 100))
+    cache.put('2', _src(tmp_path, '2.mp4', 100))
+    assert cache.get('1') is not None  # 1 redevient le plus récent
+    cache.put('3', _src(tmp_path, '3.mp4', 100))
+    assert cache.get('2') is None
+    assert cache.get('1') is not None and cache.get('3') is not None
+    assert cache.stats() == {'entries': 2, 'bytes': 200, 'max_bytes': 250}
+    assert not os.path.exists(tmp_path / 'cache' / '2.json')
+
+
+def test_put_and_checkout_use_hard_links(tmp_path):
+    cache = SourceCache(tmp_path / 'cache')
+    src = _src(tmp_path, '1.mp4', 10)
+    cached = cache.put('1', src, {'vcodec': 'h264'})
+    assert os.stat(cached).st_ino == os.stat(src).st_ino
+    out = tmp_path / 'item_2'
+    out.mkdir()
+    work = cache.checkout(cached, str(out))
+    assert os.stat(work).st_ino == os.stat(cached).st_ino
+    # l'appelant supprime sa copie de travail: l'entrée du cache reste
+    os.remove(work)
+    os.remove(src)
+    path, meta = cache.get('1')
+    assert os.path.getsize(path) == 10
+    assert meta['vcodec'] == 'h264' and meta['size'] == 10
+
+
+def test_accept_filters_formats_and_put_replaces(tmp_path):
+    cache = SourceCache(tmp_path / 'cache')
+    cache.put('1', _src(tmp_path, '1.webm', 10), {'vcodec': 'vp9'})
+    h264 = lambda meta: meta.get('vcodec') == 'h264'  # noqa: E731
+    assert cache.get('1', accept=h264) is None
+    cache.put('1', _src(tmp_path, '1.mp4', 20), {'vcodec': 'h264'})
+    path, _ = cache.get('1', accept=h264)
+    assert path.endswith('1.mp4')
+    assert not os.path.exists(tmp_path / 'cache' / '1.webm')
+    assert cache.stats()['bytes'] == 20
+
+
+def test_rescan_restores_lru_order(tmp_path):
+    cache = SourceCache(tmp_path / 'cache', max_bytes=1000)
+    for vid in ('1', '2'):
+        cache.put(vid, _src(tmp_path, f'{vid}.mp4', 100))
+    os.utime(tmp_path / 'cache' / '1.mp4', (1, 1))
+    os.utime(tmp_path / 'cache' / '2.mp4', (2, 2))
+    reopened = SourceCache(tmp_path / 'cache', max_bytes=250)
+    reopened.put('3', _src(tmp_path, '3.mp4', 100))
+    assert reopened.get('1') is None
+    assert reopened.get('2') is not None
+
+
+def test_oversized_file_is_not_cached(tmp_path):
+    cache = SourceCache(tmp_path / 'cache', max_bytes=50)
+    assert cache.put('1', _src(tmp_path, '1.mp4', 100)) is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_settings_and_video_id(tmp_path):
+    f = tmp_path / 'settings.json'
+    f.write_text(json.dumps({'source_cache': {'max_gb': 0}}), encoding='utf-8')
+    assert load_source_cache_settings(f)['enabled'] is False
+    assert load_source_cache_settings(tmp_path / 'absent.json') == {'enabled': True, 'max_gb': 5.0}
+    assert video_id_from_url('https://www.tiktok.com/@u/video/7301234567?lang=fr') == '7301234567'
+    assert video_id_from_url('https://vm.tiktok.com/ZM123/') is None
@@ -0,0 +1,135 @@
+"""
+Tests des dossiers de travail par item: dossier stable (reprise des `.part`), ramassage par âge,
+admission selon l'espace disque (réservations) et nettoyage des orphelins.
+"""
+import os
+import threading
+
+import pytest
+
+from t2y import workdir as wd
+from t2y.workdir import WorkdirManager
+
+
+def _conf(root, **kw):
+    conf = {'root': str(root), 'tmpfs_root': '', 'tmpfs_max_mb': 64.0, 'min_free_gb': 0.0,
+            'reserve_factor': 1.0, 'default_mb': 1.0, 'gc_after_h': 48.0}
+    conf.update(kw)
+    return conf
+
+
+def _age(path, seconds):
+    t = os.path.getmtime(path) - seconds
+    os.utime(path, (t, t))
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    m = WorkdirManager(_conf(tmp_path / 'work'))
+    monkeypatch.setattr(wd, 'manager', m)
+    return m
+
+
+def test_item_workdir_is_stable_and_keeps_partial_files(manager):
+    d = wd.item_workdir('item_1')
+    part = os.path.join(d, '123.mp4.part')
+    with open(part, 'wb') as f:
+        f.write(b'x' * 10)
+    assert wd.item_workdir('item_1') == d  # reprise: même dossier, .part intact
+    assert os.path.getsize(part) == 10
+    # iid hostile: le dossier reste sous la racine
+    assert os.path.dirname(wd.item_workdir('../item 2')) == manager.root
+    wd.remove_workdir('item_1')
+    assert not os.path.exists(d)
+
+
+def test_existing_disk_dir_wins_over_tmpfs(tmp_path, monkeypatch):
+    monkeypatch.setattr(wd, '_free_bytes', lambda path: 10 ** 9)
+    m = WorkdirManager(_conf(tmp_path / 'work', tmpfs_root=str(tmp_path / 'shm')))
+    os.makedirs(tmp_path / 'work' / 'item_1')
+    # petit fichier: tmpfs en temps normal, sauf si un essai précédent a laissé son dossier sur disque
+    assert m.item_workdir('item_1', expected_bytes=1000) == str(tmp_path / 'work' / 'item_1')
+    assert m.item_workdir('item_2', expected_bytes=1000) == str(tmp_path / 'shm' / 'item_2')
+
+
+def test_gc_removes_idle_dirs_only(manager):
+    old = wd.item_workdir('item_1')
+    kept = wd.item_workdir('item_2')
+    fresh = wd.item_workdir('item_3')
+    part = os.path.join(fresh, 'v.mp4.part')
+    open(part, 'wb').close()
+    for d in (old, kept, fresh):
+        _age(d, 3 * 3600)
+    assert wd.gc_workdirs(max_age_h=2, keep=['item_2']) == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(kept)
+    assert os.path.exists(fresh)  # un .part récent garde le dossier vivant
+    assert wd.gc_workdirs(max_age_h=0) == 0
+
+
+@pytest.fixture
+def disk(tmp_path, monkeypatch):
+    """Disque de 1000 octets libres (hors fichiers écrits par le test)."""
+    monkeypatch.setattr(wd, '_free_bytes', lambda path: 1000)
+    return WorkdirManager(_conf(tmp_path / 'work'))
+
+
+def test_admission_waits_for_reserved_space(disk):
+    assert disk.acquire('item_1', 600) is not None
+    waited = threading.Event()
+    got = []
+    t = threading.Thread(target=lambda: got.append(disk.acquire('item_2', 600, on_wait=waited.set)))
+    t.start()
+    assert waited.wait(2.0)
+    assert got == [] and disk.blocked
+    disk.release('item_1')
+    t.join(2.0)
+    assert got and got[0].endswith('item_2')
+    assert not disk.blocked
+    assert disk.snapshot()['reserved_bytes'] == 600
+
+
+def test_admission_gives_up_when_stopped(disk):
+    disk.acquire('item_1', 900)
+    running = [True]
+    got = []
+    t = threading.Thread(target=lambda: got.append(disk.acquire('item_2', 900, lambda: running[0])))
+    t.start()
+    running[0] = False
+    disk.wake()
+    t.join(2.0)
+    assert got == [None]
+
+
+def test_partial_download_counts_toward_reservation(disk):
+    disk.acquire('item_1', 600)
+    # reprise: 500 octets déjà écrits par un essai précédent, seuls 100 restent à réserver
+    d = disk.item_workdir('item_2')
+    with open(os.path.join(d, 'v.mp4.part'), 'wb') as f:
+        f.write(b'x' * 500)
+    assert disk.acquire('item_2', 600, lambda: False) == d
+
+
+def test_min_free_margin_blocks_admission(tmp_path, monkeypatch):
+    monkeypatch.setattr(wd, '_free_bytes', lambda path: 3 * 1024 ** 3)
+    m = WorkdirManager(_conf(tmp_path / 'work', min_free_gb=2.0))
+    assert m.acquire('item_1', 512 * 1024 ** 2) is not None
+    assert m.acquire('item_2', 600 * 1024 ** 2, lambda: False) is None
+
+
+def test_cleanup_orphans(disk):
+    orphan = disk.item_workdir('item_1')
+    kept = disk.item_workdir('item_2')
+    active = disk.item_workdir('item_3')
+    scratch = disk.scratch_dir()
+    for name in ('v.mp4.part', 'v.proc.mp4'):
+        open(os.path.join(kept, name), 'wb').close()
+        _age(os.path.join(kept, name), 3600)
+    disk.acquire('item_3', 10)
+    for d in (orphan, kept, active, scratch):
+        _age(d, 3600)
+    assert disk.cleanup_orphans(keep=['item_2'], min_age_s=600) == 2
+    assert not os.path.exists(orphan) and not os.path.exists(scratch)
+    assert os.path.exists(active)
+    # item gardé: sa sortie ffmpeg partielle part, le .part du téléchargement reste
+    assert sorted(os.listdir(kept)) == ['v.mp4.part']
@@ -0,0 +1,82 @@
+"""
+Tests du pool d'instances YoutubeDL (réutilisation par profil, recyclage, hooks par appel).
+
+`yt_dlp.YoutubeDL` est remplacé par une classe minimale: seul le prêt des instances est testé.
+"""
+import types
+
+import pytest
+
+from t2y import ydl_pool as pool_mod
+from t2y.ydl_pool import YDLPool, profile_key
+
+
+class _FakeYDL:
+    def __init__(self, params):
+        self.params = dict(params)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_yt_dlp(monkeypatch):
+    monkeypatch.setattr(pool_mod, 'yt_dlp', types.SimpleNamespace(YoutubeDL=_FakeYDL))
+
+
+def test_same_profile_reuses_instance():
+    pool = YDLPool()
+    with pool.get({'proxy': 'a'}, outtmpl='/tmp/x/%(id)s.%(ext)s') as y1:
+        assert y1.params['outtmpl'] == {'default': '/tmp/x/%(id)s.%(ext)s'}
+    with pool.get({'proxy': 'a', 'outtmpl': 'ignoré'}) as y2:
+        assert y2 is y1
+    with pool.get({'proxy': 'b'}) as y3:
+        assert y3 is not y1
+    assert pool.snapshot() == {'created': 2, 'reused': 1, 'recycled': 0, 'idle': 2, 'profiles': 2}
+
+
+def test_concurrent_borrowers_get_distinct_instances():
+    pool = YDLPool()
+    with pool.get({}) as y1, pool.get({}) as y2:
+        assert y1 is not y2
+    assert pool.snapshot()['idle'] == 2
+
+
+def test_hook_is_per_call():
+    pool = YDLPool()
+    seen = []
+    with pool.get({}, hook=seen.append) as ydl:
+        for h in ydl.params['progress_hooks']:
+            h({'status': 'downloading'})
+    for h in ydl.params['progress_hooks']:
+        h({'status': 'finished'})  # hors prêt: plus de destinataire
+    assert seen == [{'status': 'downloading'}]
+
+
+def test_recycle_after_max_uses_and_idle_bound():
+    pool = YDLPool(max_uses=2, max_idle=1)
+    with pool.get({}) as y1:
+        pass
+    with pool.get({}) as again:
+        assert again is y1
+    assert y1.closed  # 2 utilisations: recyclée
+    with pool.get({}) as y2, pool.get({}) as y3:
+        pass
+    assert pool.snapshot()['idle'] == 1
+    assert y2.closed != y3.closed  # une seule instance inactive gardée
+    pool.clear()
+    assert pool.snapshot()['idle'] == 0
+    assert pool.snapshot()['recycled'] == 1
+
+
+def test_profile_key_ignores_per_call_options():
+    assert profile_key({'a': 1, 'outtmpl': 'x', 'progress_hooks': [print]}) == profile_key({'a': 1})
+    assert profile_key({'a': 1}) != profile_key({'a': 2})
+
+
+def test_missing_yt_dlp_raises(monkeypatch):
+    monkeypatch.setattr(pool_mod, 'yt_dlp', None)
+    with pytest.raises(RuntimeError):
+        with YDLPool().get({}):
+            pass
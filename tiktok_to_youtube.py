@@ -20,8 +20,9 @@ import json
 import webbrowser
 import shutil
 import hashlib
-import csv
 import time
+import collections
+from concurrent.futures import ThreadPoolExecutor
 from t2y.constants import (
     SCOPES,
     DEFAULT_CATEGORY_ID,
@@ -732,6 +733,16 @@ def save_settings():
         'watchAutostart': watch_autostart_var.get() if 'watch_autostart_var' in globals() else False,
         'ffmpegPath': ffmpeg_path_var.get().strip() if 'ffmpeg_path_var' in globals() else '',
     }
+    # Conserver les clés non gérées par l'UI Tk (ex: concurrency/pipeline de la webapp)
+    try:
+        prev = load_settings()
+        pipe = dict(prev.get('pipeline') or {})
+        if 'queue_pipeline_var' in globals():
+            pipe['enabled'] = bool(queue_pipeline_var.get())
+            prev['pipeline'] = pipe
+        data = {**prev, **data}
+    except Exception:
+        pass
     try:
         with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
             json.dump(data, f)
@@ -1466,8 +1477,8 @@ queue_frame.pack(fill=BOTH, expand=YES, pady=10)
 queue_toolbar = tb.Frame(queue_frame)
 queue_toolbar.pack(fill=X)
 
-def queue_add_item(url: str, title: str = "", description: str | None = None, tags: list[str] | None = None):
-    iid = f"item_{len(queue_items)+1}"
+def queue_add_item(url: str, title: str = "", description: str | None = None, tags: list[str] | None = None, ie_info: dict | None = None):
+    iid = _queue_next_iid()
     queue_items.append({
         'iid': iid,
         'url': url,
@@ -1479,8 +1490,12 @@ def queue_add_item(url: str, title: str = "", description: str | None = None, ta
         'u_pct': 0,
         'result': ''
     })
+    if ie_info:
+        # extraction du watcher réutilisée au téléchargement (pas de seconde extraction de la page)
+        queue_items[-1]['ie_info'] = ie_info
     queue_tree.insert('', 'end', iid=iid, values=(url, title, 'en attente', '0%', '0%', ''))
-    _queue_save()
+    _queue_save_item(queue_items[-1])
+    _queue_enqueue(queue_items[-1])
 
 def on_queue_add():
     u = url_var.get().strip()
@@ -1490,47 +1505,77 @@ def on_queue_add():
         return
     queue_add_item(u, t)
 
+def queue_add_items(entries):
+    """Ajout en masse: dédoublonnage par URL, une écriture par lot dans le store."""
+    seen = {normalize_url(it.get('url') or '') for it in queue_items}
+    stats = {'added': 0, 'duplicates': 0}
+    global _queue_last_id
+    try:
+        if _queue_store is not None:
+            _queue_last_id = max(_queue_last_id, int(_queue_store.get_meta('next_id') or 0))
+    except Exception:
+        pass
+    for batch in batched(dedupe(entries, seen, stats)):
+        items = []
+        for e in batch:
+            _queue_last_id += 1
+            items.append({
+                'iid': f'item_{_queue_last_id}',
+                'url': e['url'],
+                'title': e.get('title') or '',
+                'description': e.get('description') or '',
+                'tags': e.get('tags') or [],
+                'status': 'en attente',
+                'd_pct': 0,
+                'u_pct': 0,
+                'result': ''
+            })
+        queue_items.extend(items)
+        for it in items:
+            queue_tree.insert('', 'end', iid=it['iid'], values=(it['url'], it['title'], 'en attente', '0%', '0%', ''))
+            _queue_enqueue(it)
+        if _queue_store is not None:
+            try:
+                _queue_store.put_many(items)
+                _queue_store.set_meta('next_id', str(_queue_last_id))
+            except Exception as e:
+                log('error', f"Import: sauvegarde du lot échouée: {e}")
+        stats['added'] += len(items)
+    if _queue_store is None and stats['added']:
+        _queue_save()
+    return stats
+
 def on_queue_import():
-    paths = filedialog.askopenfilenames(title='Importer TXT/CSV', filetypes=[('TXT/CSV', '*.txt;*.csv')])
+    paths = filedialog.askopenfilenames(title='Importer TXT/CSV/JSONL', filetypes=[('TXT/CSV/JSONL', '*.txt;*.csv;*.jsonl')])
     if not paths:
         return
+    added = dup = 0
     for p in paths:
         try:
-            if p.lower().endswith('.csv'):
-                with open(p, 'r', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    for row in reader:
-                        if not row:
-                            continue
-                        url = row[0].strip()
-                        title = (row[1].strip() if len(row) > 1 else '')
-                        if url:
-                            queue_add_item(url, title)
-            else:
-                with open(p, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        # format possible: url[,titre]
-                        if ',' in line:
-                            url, title = line.split(',', 1)
-                        else:
-                            url, title = line, ''
-                        if url.strip():
-                            queue_add_item(url.strip(), title.strip())
+            fmt = detect_format(p, next(open_lines(p), ''))
+            st = queue_add_items(iter_entries(open_lines(p), fmt))
+            added += st['added']
+            dup += st['duplicates']
         except Exception as e:
             log('error', f"Import échoué {p}: {e}")
-    _queue_save()
+    set_status(f"Import: {added} ajouté(s), {dup} doublon(s) ignoré(s)")
 
 def on_queue_remove():
+    removed = []
     for sel in queue_tree.selection():
         queue_tree.delete(sel)
         for i, it in list(enumerate(queue_items)):
             if it['iid'] == sel:
                 queue_items.pop(i)
+                removed.append(sel)
                 break
-    _queue_save()
+    if _queue_store is not None:
+        try:
+            _queue_store.delete_many(removed)
+        except Exception as e:
+            log('error', f"Sauvegarde queue échouée: {e}")
+    else:
+        _queue_save()
 
 def on_queue_up():
     sel = queue_tree.selection()
@@ -1538,10 +1583,11 @@ def on_queue_up():
         return
     iid = sel[0]
     index = queue_tree.index(iid)
-    if index > 0:
-        queue_tree.move(iid, '', index - 1)
+    if index <= 0:
+        return
+    queue_tree.move(iid, '', index - 1)
     queue_items.insert(index - 1, queue_items.pop(index))
-    _queue_save()
+    _queue_save_swap(iid, queue_items[index]['iid'])
 
 def on_queue_down():
     sel = queue_tree.selection()
@@ -1549,9 +1595,11 @@ def on_queue_down():
         return
     iid = sel[0]
     index = queue_tree.index(iid)
+    if index >= len(queue_items) - 1:
+        return
     queue_tree.move(iid, '', index + 1)
     queue_items.insert(index + 1, queue_items.pop(index))
-    _queue_save()
+    _queue_save_swap(iid, queue_items[index]['iid'])
 
 tb.Button(queue_toolbar, text='Ajouter', bootstyle=SUCCESS, command=on_queue_add).pack(side=LEFT)
 tb.Button(queue_toolbar, text='Importer…', bootstyle=INFO, command=on_queue_import).pack(side=LEFT, padx=(6,0))
@@ -1567,45 +1615,121 @@ for c, lbl in zip(queue_cols, ['URL', 'Titre', 'Statut', 'D%', 'U%', 'Résultat'
 queue_tree.pack(fill=BOTH, expand=YES, padx=4, pady=6)
 
 import json as _json
+from t2y.queue_store import open_queue_store
+from t2y.progress import ProgressRegistry
+from t2y.queue_model import iid_number
+from t2y.pipeline import load_pipeline
+from t2y.quota import QuotaExceededError
+from t2y.history import HistoryStore, load_history_settings
+from t2y.ydl_pool import pool as ydl_pool
+from t2y.workdir import expected_size, item_workdir, manager as workdirs
+from t2y.formats import format_policy
+from t2y.bulk_import import batched, dedupe, detect_format, iter_entries, normalize_url, open_lines
 QUEUE_FILE = CONFIG_DIR / 'queue.json'
 queue_items = []
+# Même store que la webapp (SQLite par défaut, None = queue.json historique)
+_queue_store = open_queue_store()
+# Historique partagé avec la webapp: une seule instance (segment courant, verrou d'écriture)
+_queue_history = HistoryStore(segment_items=load_history_settings()['segment_items'])
+_queue_progress = ProgressRegistry()
+_queue_last_id = 0
+
+def _queue_next_iid():
+    """Identifiant monotone partagé avec la webapp via le store (pas de collision après suppression)."""
+    global _queue_last_id
+    try:
+        if _queue_store is not None:
+            _queue_last_id = max(_queue_last_id, int(_queue_store.get_meta('next_id') or 0))
+    except Exception:
+        pass
+    _queue_last_id += 1
+    if _queue_store is not None:
+        try:
+            _queue_store.set_meta('next_id', str(_queue_last_id))
+        except Exception:
+            pass
+    return f"item_{_queue_last_id}"
 
 def _queue_save():
     try:
+        if _queue_store is not None:
+            _queue_store.replace_all(queue_items)
+            return
         CONFIG_DIR.mkdir(parents=True, exist_ok=True)
         with open(QUEUE_FILE, 'w', encoding='utf-8') as f:
             _json.dump(queue_items, f, ensure_ascii=False, indent=2)
     except Exception as e:
         log('error', f"Sauvegarde queue échouée: {e}")
 
+def _queue_save_item(item, *keys):
+    """Persiste un item (ou seulement `keys`) sans réécrire toute la file."""
+    if _queue_store is None:
+        _queue_save()
+        return
+    try:
+        if keys:
+            _queue_store.update(item['iid'], {k: item.get(k) for k in keys})
+        else:
+            _queue_store.put(item)
+    except Exception as e:
+        log('error', f"Sauvegarde queue échouée: {e}")
+
+def _queue_save_swap(iid_a, iid_b):
+    if _queue_store is None:
+        _queue_save()
+        return
+    try:
+        _queue_store.swap(iid_a, iid_b)
+    except Exception as e:
+        log('error', f"Sauvegarde queue échouée: {e}")
+
+def _queue_read_items():
+    if _queue_store is not None:
+        return _queue_store.load()
+    with open(QUEUE_FILE, 'r', encoding='utf-8') as f:
+        return _json.load(f)
+
 def _queue_load():
     try:
-        with open(QUEUE_FILE, 'r', encoding='utf-8') as f:
-            items = _json.load(f)
-            queue_items.clear()
-            resumable = 0
-            total = 0
-            for it in items:
-                iid = it.get('iid') or f"item_{len(queue_items)+1}"
-                it['iid'] = iid
-                # Normaliser statuts transitoires vers 'en attente'
-                status = (it.get('status') or 'en attente')
-                if status in ('en cours', 'téléchargement', 'upload'):
-                    status = 'en attente'
-                it['status'] = status
-                total += 1
-                if status != 'terminé':
-                    resumable += 1
-                queue_items.append(it)
-                queue_tree.insert('', 'end', iid=iid, values=(it.get('url',''), it.get('title',''), status, f"{it.get('d_pct',0)}%", f"{it.get('u_pct',0)}%", it.get('result','')))
-            try:
-                _queue_save()  # persister les statuts normalisés
-            except Exception:
-                pass
-            try:
-                set_status(f"File chargée: {resumable}/{total} à reprendre (terminés ignorés)")
-            except Exception:
-                pass
+        items = _queue_read_items()
+        queue_items.clear()
+        resumable = 0
+        total = 0
+        global _queue_last_id
+        _queue_last_id = max([_queue_last_id] + [iid_number(it.get('iid') or '') for it in items])
+        # items modifiés par la normalisation: iid -> champs à réécrire (() = item complet)
+        changed = {}
+        for it in items:
+            iid = it.get('iid')
+            if not iid:
+                iid = it['iid'] = _queue_next_iid()
+                changed[iid] = ()
+            # Normaliser statuts transitoires vers 'en attente'
+            status = (it.get('status') or 'en attente')
+            if status in ('en cours', 'téléchargement', 'upload'):
+                status = 'en attente'
+                changed.setdefault(iid, ('status',))
+            it['status'] = status
+            total += 1
+            if status != 'terminé':
+                resumable += 1
+            queue_items.append(it)
+            queue_tree.insert('', 'end', iid=iid, values=(it.get('url',''), it.get('title',''), status, f"{it.get('d_pct',0)}%", f"{it.get('u_pct',0)}%", it.get('result','')))
+        # persister seulement les items normalisés (pas de réécriture complète à chaque démarrage)
+        if changed:
+            if _queue_store is None:
+                _queue_save()
+            else:
+                by_id = {it['iid']: it for it in queue_items}
+                for iid, keys in changed.items():
+                    _queue_save_item(by_id[iid], *keys)
+        try:
+            set_status(f"File chargée: {resumable}/{total} à reprendre (terminés ignorés)")
+        except Exception:
+            pass
+        # dossiers de travail orphelins d'une exécution précédente (hors thread UI)
+        keep = [it['iid'] for it in queue_items]
+        threading.Thread(target=workdirs.cleanup_orphans, args=(keep,), daemon=True).start()
     except Exception:
         pass
 
@@ -1646,6 +1770,8 @@ tb.Entry(watch_frame, textvariable=watch_quota_var, width=6).grid(row=3, column=
 
 watch_running = False
 _watch_seen = set()
+# Arrêt immédiat de la surveillance (attente interruptible entre deux polls)
+_watch_stop = threading.Event()
 
 def _watch_load_state():
     try:
@@ -1723,12 +1849,12 @@ def _filters_ok(meta, inc_kw, exc_kw, min_d, max_d):
         return True
 
 def _watch_worker():
-    import time as _time
     from t2y.metadata import fetch_tiktok_metadata
     global _watch_seen
     seen = _watch_seen or _watch_load_state()
     global watch_running
     watch_running = True
+    stop = _watch_stop
     while watch_running:
         try:
             handle = watch_handle_var.get().strip()
@@ -1743,9 +1869,8 @@ def _watch_worker():
             # obtenir une liste de vidéos depuis le profil via yt-dlp (playlist)
             urls = []
             try:
-                import yt_dlp
                 ydl_opts = {'extract_flat': True, 'skip_download': True}
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                with ydl_pool.get(ydl_opts) as ydl:
                     info = ydl.extract_info(handle, download=False)
                     entries = info.get('entries') or []
                     for e in entries:
@@ -1776,7 +1901,7 @@ def _watch_worker():
                     continue
                 # récupérer meta et filtrer
                 try:
-                    meta = fetch_tiktok_metadata(u) or {}
+                    meta = fetch_tiktok_metadata(u, with_info=True) or {}
                     if _filters_ok(meta or {}, inc_kw, exc_kw, min_d, max_d):
                         # Préparer description + tags depuis hashtags
                         desc = (meta.get('description') or '').strip()
@@ -1794,7 +1919,7 @@ def _watch_worker():
                             seen_t.add(k)
                             norm_tags.append(tt)
                         norm_tags = _sanitize_tags_500(norm_tags) if norm_tags else []
-                        queue_add_item(u, meta.get('title') or '', description=desc, tags=norm_tags)
+                        queue_add_item(u, meta.get('title') or '', description=desc, tags=norm_tags, ie_info=meta.get('info'))
                         seen.add(u)
                         _watch_seen = seen
                         _watch_save_state()
@@ -1816,23 +1941,24 @@ def _watch_worker():
                 minutes = float(watch_interval_var.get() or '10')
             except Exception:
                 minutes = 10.0
-            for _ in range(int(minutes * 60 / 1)):
-                if not watch_running:
-                    break
-                _time.sleep(1)
+            if stop.wait(max(1.0, minutes * 60)):
+                break
         except Exception as e:
             log('error', f"Watch: erreur: {e}")
         # boucle continue tant que watch_running reste True
     watch_running = False
 
 def on_watch_start():
+    global _watch_stop
     if not watch_running:
+        _watch_stop = threading.Event()
         threading.Thread(target=_watch_worker, daemon=True).start()
         set_status('Surveillance démarrée')
 
 def on_watch_stop():
     global watch_running
     watch_running = False
+    _watch_stop.set()
     set_status('Surveillance arrêtée')
 
 # Charger état de surveillance au démarrage
@@ -1874,6 +2000,16 @@ except Exception:
 # Worker de file d'attente
 queue_running = False
 queue_paused = False
+# Réveil du worker (ajout, reprise): plus de boucle sleep/poll
+_queue_wake = threading.Condition()
+_queue_pending = collections.deque()  # items à traiter par le worker en cours
+
+def _queue_enqueue(item):
+    """Confie un item au worker en cours d'exécution (sans effet si la file est arrêtée)."""
+    with _queue_wake:
+        if queue_running:
+            _queue_pending.append(item)
+            _queue_wake.notify_all()
 pause_after_n_var = tk.BooleanVar(value=False)
 pause_after_n_value = tk.StringVar(value='0')
 _processed_in_run = 0
@@ -1891,21 +2027,28 @@ def _update_item_progress(iid, d_pct=None, u_pct=None, status=None, result=None)
         if result is not None:
             res = result
         queue_tree.item(iid, values=(url, title, st, d, u, res))
+        # Progression: registre en mémoire uniquement (pas d'écriture disque par tick)
+        _queue_progress.set(iid, d_pct=d_pct, u_pct=u_pct)
         for it in queue_items:
             if it['iid'] == iid:
-                try:
+                # Ne persister que les transitions de statut / résultat
+                if it.get('status') != st or (it.get('result') or '') != (res or ''):
                     it['status'] = st
-                    it['d_pct'] = int(d.replace('%','')) if isinstance(d, str) else it.get('d_pct', 0)
-                    it['u_pct'] = int(u.replace('%','')) if isinstance(u, str) else it.get('u_pct', 0)
                     it['result'] = res
-                except Exception:
-                    pass
+                    if st in ('terminé', 'erreur'):
+                        try:
+                            it['d_pct'] = int(d.replace('%','')) if isinstance(d, str) else it.get('d_pct', 0)
+                            it['u_pct'] = int(u.replace('%','')) if isinstance(u, str) else it.get('u_pct', 0)
+                        except Exception:
+                            pass
+                        _queue_save_item(it, 'status', 'result', 'd_pct', 'u_pct')
+                    else:
+                        _queue_save_item(it, 'status', 'result')
                 break
-        _queue_save()
     except Exception:
         pass
 
-def _process_one_item(item):
+def _queue_progress_callbacks(item):
     # Alimente les callbacks de progression pour l'item
     def _dl_prog(p):
         root.after(0, _update_item_progress, item['iid'], p, None, 'téléchargement', None)
@@ -1913,7 +2056,29 @@ def _process_one_item(item):
     def _ul_prog(p):
         root.after(0, _update_item_progress, item['iid'], None, p, 'upload', None)
         set_upload_progress(p)
-
+    return _dl_prog, _ul_prog
+
+def _ui_call(fn, *args):
+    """Exécute `fn(*args)` dans le thread Tk et retourne son résultat (Tkinter n'est pas thread-safe)."""
+    if threading.current_thread() is threading.main_thread():
+        return fn(*args)
+    done = threading.Event()
+    box = {}
+    def _run():
+        try:
+            box['value'] = fn(*args)
+        except Exception as e:
+            box['error'] = e
+        finally:
+            done.set()
+    root.after(0, _run)
+    done.wait()
+    if 'error' in box:
+        raise box['error']
+    return box.get('value')
+
+def _queue_build_job(item):
+    """Prépare titre/description/options d'upload d'un item depuis l'UI courante (thread Tk: voir `_ui_call`)."""
     # Remplit les champs UI principaux avant de réutiliser process core
     entry_url.delete(0, tk.END)
     entry_url.insert(0, item['url'])
@@ -1982,72 +2147,182 @@ def _process_one_item(item):
         "uploadMaxRetries": (upload_retries_var.get().strip() if 'upload_retries_var' in globals() else ''),
     }
 
-    # Télécharger
+    return {'url': url, 'title': title, 'description': description, 'privacy': privacy, 'adv': adv}
+
+def _queue_download(item, job):
+    """Télécharge la vidéo d'un item; retourne (fichier, info) ou (None, None) en cas d'erreur."""
+    _dl_prog, _ = _queue_progress_callbacks(item)
+    adv = job['adv']
     set_status("Téléchargement (queue)…")
+    ie_info = item.pop('ie_info', None)
+    if ie_info is not None:
+        _queue_save_item(item, 'ie_info')
     try:
-        video_file, info = download_tiktok_with_info(
-            url,
+        return download_tiktok_with_info(
+            job['url'],
             on_progress=_dl_prog,
             proxy=(adv.get('proxy') or '').strip() or None,
             timeout=(adv.get('timeout') or '').strip() or None,
+            info=ie_info,
+            workdir=item_workdir(item['iid'], expected_bytes=expected_size(ie_info)),
+            policy=format_policy(adv),
         )
     except Exception as e:
         root.after(0, _update_item_progress, item['iid'], None, None, 'erreur', str(e))
-        return
+        return None, None
 
-    # Upload
+def _queue_upload(item, job, video_file):
+    _, _ul_prog = _queue_progress_callbacks(item)
+    adv = job['adv']
     set_status("Upload (queue)…")
     try:
-        vid = upload_to_youtube(video_file, title, description, privacy, on_progress=_ul_prog, advanced=adv)
+        vid = upload_to_youtube(video_file, job['title'], job['description'], job['privacy'], on_progress=_ul_prog, advanced=adv)
         apply_post_upload_settings(vid, adv)
         root.after(0, _update_item_progress, item['iid'], None, 100.0, 'terminé', vid)
         last_video_id.set(vid or "")
+    except QuotaExceededError as e:
+        # Quota du jour épuisé: l'item reste en attente, la file reprend au reset
+        root.after(0, _update_item_progress, item['iid'], 0.0, 0.0, 'en attente', str(e))
+        _queue_quota_hold(item, e.reset_at)
     except Exception as e:
         root.after(0, _update_item_progress, item['iid'], None, None, 'erreur', str(e))
     finally:
-        try:
-            if video_file and os.path.exists(video_file):
-                os.remove(video_file)
-                temp_dir = os.path.dirname(video_file)
-                if os.path.isdir(temp_dir) and not os.listdir(temp_dir):
-                    os.rmdir(temp_dir)
-        except Exception:
-            pass
+        _queue_discard_file(video_file)
+
+def _queue_quota_hold(item, reset_at):
+    global queue_paused
+    with _queue_wake:
+        queue_paused = True
+        _queue_pending.appendleft(item)
+    set_status(f"Quota YouTube épuisé — reprise le {datetime.fromtimestamp(reset_at).strftime('%Y-%m-%d %H:%M')}")
+    root.after(int(max(1.0, reset_at - time.time() + 5.0) * 1000), _queue_quota_resume)
+
+def _queue_quota_resume():
+    global queue_paused
+    with _queue_wake:
+        queue_paused = False
+        _queue_wake.notify_all()
+    set_status('Queue reprise (reset du quota YouTube)')
+
+def _queue_discard_file(video_file):
+    try:
+        if video_file and os.path.exists(video_file):
+            os.remove(video_file)
+            temp_dir = os.path.dirname(video_file)
+            if os.path.isdir(temp_dir) and not os.listdir(temp_dir):
+                os.rmdir(temp_dir)
+    except Exception:
+        pass
+
+def _process_one_item(item):
+    job = _ui_call(_queue_build_job, item)
+    video_file, _info = _queue_download(item, job)
+    if video_file:
+        _queue_upload(item, job, video_file)
 
 def _queue_worker():
     global queue_running
     queue_running = True
     global _processed_in_run, queue_paused
     _processed_in_run = 0
-    for item in list(queue_items):
-        if not queue_running:
-            break
-        # pause
-        while queue_paused and queue_running:
-            time.sleep(0.2)
-        # sauter les terminés/erreur déjà marqués
-        vals = queue_tree.item(item['iid'], 'values')
-        # Ne pas relancer les éléments 'terminé' (les erreurs seront rejouées par défaut)
-        if vals and vals[2] in ('terminé',):
-            continue
-        root.after(0, _update_item_progress, item['iid'], 0.0, 0.0, 'en cours', None)
-        _process_one_item(item)
-        # Après chaque item traité, appliquer la pause automatique si activée
-        try:
-            if pause_after_n_var.get():
-                try:
-                    n = int((pause_after_n_value.get() or '0').strip())
-                except Exception:
-                    n = 0
-                if n > 0:
-                    _processed_in_run += 1
-                    if _processed_in_run >= n:
-                        queue_paused = True
-                        _processed_in_run = 0
-                        set_status(f'Queue en pause (quota {n} atteint)')
-        except Exception:
-            pass
-    queue_running = False
+    # Mode pipeline: l'item suivant se télécharge pendant l'upload du courant
+    pipe = load_pipeline()
+    lookahead = int(pipe.get('lookahead') or 0) if pipe.get('enabled') else 0
+    max_bytes = int(float(pipe.get('max_temp_gb') or 0) * 1024 ** 3)
+    with _queue_wake:
+        _queue_pending.clear()
+        _queue_pending.extend(queue_items)
+    inflight = collections.deque()  # (item, job, future) téléchargés ou en cours de téléchargement
+    dl_pool = ThreadPoolExecutor(max_workers=1)
+    uploading = [False]
+    active = set()  # iids dispatchés et pas encore terminés (évite un double traitement)
+
+    def _prefetched_bytes():
+        total = 0
+        for _it, _job, fut in inflight:
+            try:
+                if fut.done() and fut.result()[0]:
+                    total += os.path.getsize(fut.result()[0])
+            except Exception:
+                pass
+        return total
+
+    def _fill():
+        while queue_running and len(inflight) + (1 if uploading[0] else 0) < 1 + lookahead:
+            if inflight and max_bytes and _prefetched_bytes() >= max_bytes:
+                break
+            item = None
+            while True:
+                with _queue_wake:
+                    cand = _queue_pending.popleft() if _queue_pending else None
+                if cand is None:
+                    break
+                if cand['iid'] in active:
+                    continue
+                # Ne pas relancer les éléments 'terminé' (les erreurs seront rejouées par défaut)
+                vals = _ui_call(lambda iid: queue_tree.item(iid, 'values') if queue_tree.exists(iid) else None, cand['iid'])
+                if vals and vals[2] not in ('terminé',):
+                    item = cand
+                    break
+            if item is None:
+                break
+            active.add(item['iid'])
+            root.after(0, _update_item_progress, item['iid'], 0.0, 0.0, 'en cours', None)
+            # les widgets ne sont lus que par le thread Tk, pendant que l'upload courant continue ici
+            job = _ui_call(_queue_build_job, item)
+            inflight.append((item, job, dl_pool.submit(_queue_download, item, job)))
+
+    try:
+        while queue_running:
+            # pause: attente sans CPU jusqu'à on_queue_pause_resume
+            with _queue_wake:
+                while queue_paused and queue_running:
+                    _queue_wake.wait()
+            if not queue_running:
+                break
+            _fill()
+            if not inflight:
+                with _queue_wake:
+                    # file vide: s'arrêter, sauf si un item vient d'être ajouté
+                    if not _queue_pending:
+                        queue_running = False
+                        break
+                continue
+            item, job, fut = inflight.popleft()
+            video_file, _info = fut.result()
+            uploading[0] = True
+            _fill()  # lance le téléchargement suivant pendant cet upload
+            if video_file:
+                _queue_upload(item, job, video_file)
+            uploading[0] = False
+            active.discard(item['iid'])
+            # Après chaque item traité, appliquer la pause automatique si activée
+            try:
+                if _ui_call(pause_after_n_var.get):
+                    try:
+                        n = int((_ui_call(pause_after_n_value.get) or '0').strip())
+                    except Exception:
+                        n = 0
+                    if n > 0:
+                        _processed_in_run += 1
+                        if _processed_in_run >= n:
+                            queue_paused = True
+                            _processed_in_run = 0
+                            set_status(f'Queue en pause (quota {n} atteint)')
+            except Exception:
+                pass
+    finally:
+        # Arrêt: remettre en attente les items téléchargés d'avance mais non uploadés
+        for item, _job, fut in inflight:
+            try:
+                video_file, _info = fut.result()
+                _queue_discard_file(video_file)
+                if video_file:
+                    root.after(0, _update_item_progress, item['iid'], 0.0, 0.0, 'en attente', None)
+            except Exception:
+                pass
+        dl_pool.shutdown(wait=False)
+        queue_running = False
 
 def on_queue_start():
     global _processed_in_run
@@ -2057,7 +2332,9 @@ def on_queue_start():
 
 def on_queue_pause_resume():
     global queue_paused
-    queue_paused = not queue_paused
+    with _queue_wake:
+        queue_paused = not queue_paused
+        _queue_wake.notify_all()
     # Si on reprend, réinitialiser le compteur courant
     global _processed_in_run
     if not queue_paused:
@@ -2065,20 +2342,38 @@ def on_queue_pause_resume():
     set_status('Queue en pause' if queue_paused else 'Queue en cours')
 
 def on_queue_clear_done():
+    done = []
     for iid in queue_tree.get_children():
         vals = queue_tree.item(iid, 'values')
         if vals and vals[2] == 'terminé':
             queue_tree.delete(iid)
+            done.append(iid)
     # sync modèle
     remaining = []
+    archived = []
     for it in queue_items:
         try:
             vals = queue_tree.item(it['iid'], 'values')
             if vals:
                 remaining.append(it)
+            else:
+                archived.append(it)
         except Exception:
-            pass
+            archived.append(it)
     queue_items[:] = remaining
+    # Les terminés vont dans l'historique partagé avec la webapp (archiver avant de supprimer)
+    try:
+        if archived:
+            _queue_history.append(archived)
+    except Exception as e:
+        log('error', f"Archivage historique échoué: {e}")
+    if _queue_store is not None:
+        try:
+            _queue_store.delete_many(done)
+        except Exception as e:
+            log('error', f"Suppression des terminés échouée: {e}")
+    else:
+        _queue_save()
 
 def on_queue_resume_errors():
     """Remettre uniquement les items en erreur à 'en attente' et relancer si nécessaire."""
@@ -2088,6 +2383,7 @@ def on_queue_resume_errors():
             st = (it.get('status') or '')
             if st == 'erreur':
                 it['status'] = 'en attente'
+                _queue_enqueue(it)
                 try:
                     queue_tree.item(it['iid'], values=(it.get('url',''), it.get('title',''), 'en attente', f"{it.get('d_pct',0)}%", f"{it.get('u_pct',0)}%", it.get('result','')))
                 except Exception:
@@ -2104,7 +2400,9 @@ def on_queue_resume_errors():
         _processed_in_run = 0
         on_queue_start()
     else:
-        queue_paused = False
+        with _queue_wake:
+            queue_paused = False
+            _queue_wake.notify_all()
         _processed_in_run = 0
         set_status('Queue reprise (erreurs)')
 
@@ -2120,6 +2418,11 @@ tb.Checkbutton(pause_n_frame, text='Pause après', variable=pause_after_n_var, b
 tb.Entry(pause_n_frame, textvariable=pause_after_n_value, width=4).pack(side=LEFT, padx=(4,0))
 tb.Label(pause_n_frame, text='vidéo(s)').pack(side=LEFT, padx=(4,0))
 
+# Option "Pipeline": télécharger l'item suivant pendant l'upload du courant
+queue_pipeline_var = tk.BooleanVar(value=bool(load_pipeline().get('enabled')))
+tb.Checkbutton(queue_toolbar, text='Pipeline', variable=queue_pipeline_var, bootstyle=SECONDARY).pack(side=RIGHT, padx=(12,0))
+queue_pipeline_var.trace_add('write', lambda *_: save_settings())
+
 # Charger état de "Pause après N" depuis settings (après création des widgets)
 try:
     if settings.get('pauseAfterNEnabled') is not None:
@@ -2241,6 +2544,8 @@ def purge_temp_files():
                         removed += 1
                 except Exception:
                     pass
+        # dossiers de travail d'items qui ne sont plus dans la file (+ sorties ffmpeg partielles)
+        removed += workdirs.cleanup_orphans(keep=[it.get('iid') for it in queue_items])
         set_status(f"Temporaires purgés: {removed}")
         log('info', f"Purge temporaires: {removed} élément(s)")
     except Exception as e:
@@ -2336,6 +2641,9 @@ def export_diagnostics():
             try:
                 from t2y.config import CONFIG_DIR as _CFG
                 qf = _CFG / 'queue.json'
+                if _queue_store is not None:
+                    qf = _CFG / 'queue.export.json'
+                    _queue_store.export_json(qf)
                 _safe_add(str(qf), 'config/queue.json')
             except Exception:
                 pass
@@ -0,0 +1,241 @@
+"""
+Agent distant: prend des items en bail auprès de la webapp (coordinateur) et exécute
+localement le pipeline téléchargement → ffmpeg → upload de `webapp.runner`.
+
+    T2Y_AGENT_TOKEN=secret python -m webapp.agent --server http://coordinateur:8765 --name box2
+
+La progression et les statuts remontent au coordinateur (file unifiée dans l'UI);
+le bail est prolongé par heartbeat tant que l'agent travaille sur l'item. Si l'agent
+disparaît, le coordinateur remet l'item en attente à l'expiration du bail; si un heartbeat
+est refusé (bail perdu), l'agent abandonne l'item avant l'upload sans rien rendre.
+Les uploads utilisent les profils YouTube (tokens OAuth) présents sur la machine de l'agent.
+"""
+from __future__ import annotations
+from typing import Dict, Optional, Tuple
+import argparse
+import os
+import socket
+import threading
+import time
+
+import requests
+
+from t2y.leases import DEFAULT_TTL
+from t2y.logger import log
+from t2y.pipeline import StageLimiter, PrefetchGate, load_concurrency
+from t2y.progress import ProgressRegistry
+from t2y.workdir import manager as workdirs
+from webapp.runner import ItemRunner
+
+
+class CoordinatorClient:
+    def __init__(self, server: str, token: str, agent: str, timeout: float = 30.0):
+        self.base = server.rstrip('/')
+        self.agent = agent
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Bearer {token}'
+
+    def _post(self, path: str, **payload) -> Dict:
+        r = self.session.post(f'{self.base}{path}', json={'agent': self.agent, **payload}, timeout=self.timeout)
+        if r.status_code == 409:
+            return {'ok': False, 'lost': True}
+        r.raise_for_status()
+        return r.json()
+
+    def lease(self, profile: Optional[str] = None, ttl: Optional[float] = None) -> Tuple[Optional[Dict], float]:
+        """Prochain item (ou None) et durée du bail accordée par le coordinateur (s)."""
+        r = self._post('/api/agent/lease', profile=profile, ttl=ttl)
+        return r.get('item'), float(r.get('ttl') or DEFAULT_TTL)
+
+    def heartbeat(self, iid: str) -> bool:
+        return bool(self._post('/api/agent/heartbeat', iid=iid).get('ok'))
+
+    def progress(self, iid: str, **fields) -> bool:
+        return bool(self._post('/api/agent/progress', iid=iid, **fields).get('ok'))
+
+    def complete(self, iid: str, result: str, results: Dict, badges: list) -> bool:
+        return bool(self._post('/api/agent/complete', iid=iid, result=result, results=results, badges=badges).get('ok'))
+
+    def fail(self, iid: str, error: str, quota_reset_at: Optional[float] = None) -> bool:
+        return bool(self._post('/api/agent/fail', iid=iid, error=error, quota_reset_at=quota_reset_at).get('ok'))
+
+
+class _RemoteProgress(ProgressRegistry):
+    """Registre local dont les changements remontent au coordinateur (au plus 1/s par item)."""
+
+    def __init__(self, client: CoordinatorClient, min_interval: float = 1.0):
+        super().__init__()
+        self.client = client
+        self.min_interval = min_interval
+        self._sent: Dict[str, float] = {}
+
+    def set(self, iid: str, **pcts) -> bool:
+        changed = super().set(iid, **pcts)
+        now = time.time()
+        done = any(v is not None and float(v) >= 100 for v in pcts.values())
+        if changed and (done or now - self._sent.get(iid, 0.0) >= self.min_interval):
+            self._sent[iid] = now
+            try:
+                self.client.progress(iid, **self.get(iid))
+            except Exception as e:
+                log('error', f'agent: remontée de progression échouée: {e}')
+        return changed
+
+    def clear(self, iid: str):
+        super().clear(iid)
+        self._sent.pop(iid, None)
+
+
+class _RemoteLeases:
+    """Baux tenus auprès du coordinateur: un heartbeat par tiers de la durée accordée à chacun.
+
+    Un heartbeat refusé (409: bail expiré, item confié à un autre agent) marque l'item perdu;
+    le runner l'abandonne avant l'étape suivante, au plus tard avant l'upload.
+    """
+
+    def __init__(self, client: CoordinatorClient, stop: threading.Event):
+        self.client = client
+        self._stop = stop
+        self._lock = threading.Lock()
+        # iid -> [ttl accordé, dernier heartbeat]
+        self._inflight: Dict[str, list] = {}
+        self._lost = set()
+
+    def add(self, iid: str, ttl: float):
+        with self._lock:
+            self._inflight[iid] = [ttl, time.time()]
+            self._lost.discard(iid)
+
+    def lost(self, iid: str) -> bool:
+        with self._lock:
+            return iid in self._lost
+
+    def release(self, iid: str):
+        with self._lock:
+            self._inflight.pop(iid, None)
+            self._lost.discard(iid)
+
+    def _beat_interval(self) -> float:
+        # réveil au plus toutes les 5 s: un bail court pris entre deux réveils est prolongé à temps
+        with self._lock:
+            return min([5.0] + [ttl / 3.0 for ttl, _ in self._inflight.values()])
+
+    def beat(self, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            iids = [iid for iid, rec in self._inflight.items() if now - rec[1] >= rec[0] / 3.0]
+            for iid in iids:
+                self._inflight[iid][1] = now
+        for iid in iids:
+            try:
+                ok = self.client.heartbeat(iid)
+            except Exception as e:
+                # coordinateur injoignable: on réessaie au prochain tour, le bail court encore
+                log('error', f'agent: heartbeat échoué: {e}')
+                continue
+            if not ok:
+                log('error', f'agent: bail perdu pour {iid} — traitement abandonné')
+                with self._lock:
+                    if self._inflight.pop(iid, None) is not None:
+                        self._lost.add(iid)
+
+    def run(self):
+        while not self._stop.wait(self._beat_interval()):
+            self.beat()
+
+
+def _make_runner(client: CoordinatorClient, leases: _RemoteLeases, stop: threading.Event) -> ItemRunner:
+    """Pipeline sans file locale: statuts et résultats partent au coordinateur."""
+
+    def _save(it: Dict, *keys: str):
+        # seules les transitions de statut remontent; le résultat final part par complete/fail
+        if keys != ('status',):
+            return
+        try:
+            client.progress(it['iid'], status=it.get('status'), badges=it.get('badges') or [])
+        except Exception as e:
+            log('error', f'agent: remontée de statut échouée: {e}')
+
+    def _requeue(it: Dict):
+        # arrêt de l'agent avant le lancement: le bail expire, le coordinateur remet l'item en file
+        it['status'] = 'en attente'
+
+    def _hold_for_quota(it: Dict, reset_at: float):
+        it['status'] = 'quota'
+        it['_quota_reset_at'] = reset_at
+
+    return ItemRunner(_RemoteProgress(client), StageLimiter(load_concurrency()), PrefetchGate(), workdirs,
+                      save=_save, requeue=_requeue, hold_for_quota=_hold_for_quota,
+                      running=lambda: not stop.is_set(), leases=leases)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description='Agent distant TikTok → YouTube')
+    ap.add_argument('--server', required=True, help='URL de la webapp coordinatrice')
+    ap.add_argument('--token', default=os.environ.get('T2Y_AGENT_TOKEN') or '', help='jeton (défaut: $T2Y_AGENT_TOKEN)')
+    ap.add_argument('--name', default=socket.gethostname(), help="nom de l'agent")
+    ap.add_argument('--profile', default=None, help="ne traiter que ce profil YouTube ('' = défaut)")
+    ap.add_argument('--threads', type=int, default=1, help='items traités en parallèle')
+    ap.add_argument('--ttl', type=float, default=None, help='durée de bail demandée (s, bornée par le coordinateur)')
+    ap.add_argument('--poll', type=float, default=5.0, help='intervalle de scrutation quand la file est vide (s)')
+    ap.add_argument('--once', action='store_true', help="s'arrêter quand la file est vide")
+    args = ap.parse_args(argv)
+    if not args.token:
+        print('Jeton manquant: --token ou T2Y_AGENT_TOKEN.')
+        return 2
+
+    client = CoordinatorClient(args.server, args.token, args.name)
+    stop = threading.Event()
+    leases = _RemoteLeases(client, stop)
+    runner = _make_runner(client, leases, stop)
+
+    def _loop():
+        while not stop.is_set():
+            try:
+                it, ttl = client.lease(profile=args.profile, ttl=args.ttl)
+            except Exception as e:
+                log('error', f'agent: coordinateur injoignable: {e}')
+                stop.wait(args.poll)
+                continue
+            if it is None:
+                if args.once:
+                    break
+                stop.wait(args.poll)
+                continue
+            iid = it['iid']
+            leases.add(iid, ttl)
+            try:
+                log('info', f"agent {args.name}: {iid} {it.get('url', '')}")
+                if not runner.process(it):
+                    # item confié à un autre agent: ni complete ni fail (le coordinateur refuserait)
+                    continue
+                st = it.get('status')
+                if st == 'terminé':
+                    client.complete(iid, it.get('result') or '', it.get('results') or {}, it.get('badges') or [])
+                elif st == 'quota':
+                    client.fail(iid, it.get('result') or 'quota', quota_reset_at=it.get('_quota_reset_at'))
+                elif st == 'en attente':
+                    log('info', f'agent: {iid} non lancé (arrêt), rendu au coordinateur à expiration du bail')
+                else:
+                    client.fail(iid, it.get('result') or 'erreur')
+            except Exception as e:
+                log('error', f'agent: compte-rendu de {iid} échoué: {e}')
+            finally:
+                leases.release(iid)
+
+    threading.Thread(target=leases.run, daemon=True).start()
+    threads = [threading.Thread(target=_loop, daemon=True) for _ in range(max(1, args.threads))]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            while t.is_alive():
+                t.join(1.0)
+    except KeyboardInterrupt:
+        stop.set()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
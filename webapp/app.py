@@ -35,7 +35,7 @@ async def api_tiktok_upload(request: Request, file: UploadFile = File(...), capt
 async def youtube_page(request: Request):
     ctx = {
         "request": request,
-        "q": state.queue,
+        "q": state.queue_page(limit=50)['items'],
         "queue": {
             "running": state.queue_running,
             "paused": state.queue_paused
@@ -52,7 +52,7 @@ async def youtube_page(request: Request):
 async def tiktok_page(request: Request):
     ctx = {
         "request": request,
-        "q": state.queue,
+        "q": state.queue_page(limit=50)['items'],
         "queue": {
             "running": state.queue_running,
             "paused": state.queue_paused
@@ -62,17 +62,28 @@ async def tiktok_page(request: Request):
     html = templates.get_template("tiktok.html").render(ctx)
     return HTMLResponse(content=html)
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, FileResponse, Response
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, FileResponse, Response, StreamingResponse
 from fastapi import UploadFile, File, Form
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from .state import state
+from .state import state, agent_ttl
 from t2y.constants import YOUTUBE_CATEGORIES, LANGUAGES, LICENSES, PROFILES_FILE
 from t2y.config import LOG_FILE
 from t2y.config import SETTINGS_FILE, CONFIG_DIR
+from t2y.queue_model import SCHED_MODES, STATUSES
+from t2y.validators import sanitize_tags_500
+from t2y.bulk_import import FORMATS as IMPORT_FORMATS, detect_format
+from t2y.ydl_pool import pool as ydl_pool
+from t2y.source_cache import get_cache as get_source_cache
+from t2y.bandwidth import manager as bandwidth
+from t2y.meta_cache import get_meta_cache
+from starlette.concurrency import run_in_threadpool
 from t2y.auth import delete_token as auth_delete_token, get_credentials as auth_get_credentials
 from t2y.tiktok_auth import is_connected as tt_is_connected, get_status as tt_get_status, start_auth as tt_start_auth, exchange_code as tt_exchange_code, disconnect as tt_disconnect
 import json, shutil, subprocess, zipfile, io, os
+import asyncio
+import hmac
+import math
 import time
 
 
@@ -98,7 +109,7 @@ async def index(request: Request):
     # Rendu Jinja immédiat (évite le streaming qui peut produire un body vide dans certains contextes)
     ctx = {
         "request": request,
-        "q": state.queue,
+        "q": state.queue_page(limit=50)['items'],
         "watch": {
             "running": state.watch_running,
             "handle": state.handle,
@@ -118,6 +129,7 @@ async def index(request: Request):
         "categories": list(YOUTUBE_CATEGORIES.items()),
         "languages": list(LANGUAGES.items()),
         "licenses": list(LICENSES.items()),
+        "statuses": STATUSES,
     }
     html = templates.get_template("index.html").render(ctx)
     return HTMLResponse(content=html)
@@ -181,23 +193,104 @@ async def api_status():
             'paused': state.queue_paused,
             'size': len(state.queue),
             'lastVideoId': state.last_video_id,
-            'items': [
-                {
-                    'iid': it.get('iid',''),
-                    'url': it.get('url',''),
-                    'title': it.get('title',''),
-                    'status': it.get('status',''),
-                    'badges': it.get('badges', []),
-                    'd_pct': it.get('d_pct', 0),
-                    'u_pct': it.get('u_pct', 0),
-                    'result': it.get('result',''),
-                    'results': it.get('results', {})
-                }
-                for it in list(state.queue)
-            ]
+            'concurrency': state.concurrency,
+            'stages': state.stages.snapshot(),
+            'pipeline': {**state.pipeline, 'prefetch': state.prefetch.snapshot()},
+            'scheduler': {**state.scheduler, 'ready': state.queue.ready_count()},
+            'quota': state.quota_status(),
+            'agents': state.agent_status(),
+            'history': {**state.history_settings, **state.history.stats()},
+            # les items passent par /api/queue (paginé); ici seulement les compteurs
+            'counts': state.queue.status_counts(),
+            'version': state.changes.version,
+            'ydl_pool': ydl_pool.snapshot(),
+            'source_cache': get_source_cache().stats() if get_source_cache() is not None else None,
+            'bandwidth': bandwidth.snapshot(),
+            'workdir': state.workdirs.snapshot(),
+            'meta_cache': get_meta_cache().snapshot() if get_meta_cache() is not None else None,
         }
     }
 
+QUEUE_FIELDS = ('iid', 'url', 'title', 'status', 'priority', 'publishAt', 'badges',
+                'f_pct', 'd_pct', 'u_pct', 'result', 'results')
+
+def _queue_row(it, fields=QUEUE_FIELDS, pcts=None):
+    row = {
+        'iid': it.get('iid',''),
+        'url': it.get('url',''),
+        'title': it.get('title',''),
+        'status': it.get('status',''),
+        'priority': it.get('priority') or 'normal',
+        'publishAt': (it.get('adv') or {}).get('publishAt') or '',
+        'badges': it.get('badges', []),
+        **(pcts if pcts is not None else state.item_progress(it)),
+        'result': it.get('result',''),
+        'results': it.get('results', {})
+    }
+    return {k: row.get(k) for k in fields}
+
+@app.get('/api/queue')
+async def api_queue(limit: int = 50, cursor: str = '', status: str = '', q: str = '', fields: str = ''):
+    """Page de la file: `status` et `fields` sont des listes séparées par des virgules;
+    `next_cursor` (vide en fin de file) est à repasser pour la page suivante."""
+    limit = max(1, min(int(limit or 50), 500))
+    wanted = tuple(f for f in (x.strip() for x in fields.split(',')) if f in QUEUE_FIELDS) or QUEUE_FIELDS
+    # version lue avant la page: un delta depuis cette version ne peut rien manquer
+    version = state.changes.version
+    page = state.queue_page(cursor=cursor, limit=limit, statuses=[x.strip() for x in status.split(',')], q=q)
+    return {
+        'items': [_queue_row(it, wanted) for it in page['items']],
+        'next_cursor': page['next_cursor'],
+        'total': page['total'],
+        'size': len(state.queue),
+        'version': version,
+    }
+
+def _sse(event: str, data, id=None) -> str:
+    head = f'id: {id}\n' if id is not None else ''
+    return f'{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+@app.get('/api/events')
+async def api_events(request: Request):
+    """Flux SSE: `hello` (état initial), `queue` (compteurs), `item`/`removed` (deltas de file),
+    `watch` (scrutations) et `log` (nouvelles lignes). `resync` = client trop lent, recharger."""
+    sub = state.events.subscribe()
+
+    async def _stream():
+        try:
+            yield 'retry: 3000\n\n'
+            yield _sse('hello', {'queue': state.summary(), 'watch': {'running': state.watch_running,
+                                 'handle': state.handle, 'last_poll': state.last_poll}})
+            while True:
+                try:
+                    ev = await asyncio.wait_for(sub.queue.get(), timeout=15.0)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ': ping\n\n'  # garde la connexion ouverte à travers les proxys
+                    continue
+                data = ev['data']
+                if ev['event'] == 'item':
+                    data = _queue_row(data, pcts={k: data.get(k) or 0 for k in ('f_pct', 'd_pct', 'u_pct')})
+                yield _sse(ev['event'], data, ev.get('id'))
+        finally:
+            state.events.unsubscribe(sub)
+
+    return StreamingResponse(_stream(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.get('/api/queue/changes')
+async def api_queue_changes(since: int = 0, limit: int = 1000, fields: str = ''):
+    """Items modifiés (et iids supprimés) depuis la version `since`; 304 si rien n'a changé.
+    `reset: true` = version inconnue ou trop ancienne, recharger via /api/queue."""
+    if since == state.changes.version:
+        return Response(status_code=304)
+    wanted = tuple(f for f in (x.strip() for x in fields.split(',')) if f in QUEUE_FIELDS) or QUEUE_FIELDS
+    delta = state.changes.since(since, limit=max(1, min(int(limit or 1000), 5000)))
+    delta['items'] = [_queue_row(snap, wanted, pcts={k: snap.get(k) or 0 for k in ('f_pct', 'd_pct', 'u_pct')})
+                      for snap in delta['items']]
+    return delta
+
 @app.post('/api/watch/start')
 async def api_watch_start(request: Request):
     body = await request.json()
@@ -234,29 +327,7 @@ async def api_queue_add(request: Request):
             return [str(x).strip() for x in v if str(x).strip()]
         s = str(v)
         return [t.strip() for t in s.split(',') if t.strip()]
-    def _sanitize_tags_500(tags_list):
-        try:
-            if not tags_list:
-                return tags_list
-            cleaned = []
-            seen = set()
-            total = 0
-            for t in tags_list:
-                s = (t or '').strip().lstrip('#')
-                if not s:
-                    continue
-                key = s.lower()
-                if key in seen:
-                    continue
-                if total + len(s) > 500:
-                    continue
-                cleaned.append(s)
-                seen.add(key)
-                total += len(s)
-            return cleaned
-        except Exception:
-            return tags_list
-    tags = _sanitize_tags_500(_to_list(b.get('tags')))
+    tags = sanitize_tags_500(_to_list(b.get('tags')))
     playlists = _to_list(b.get('playlists'))
     adv = {
         'tags': tags,
@@ -300,9 +371,46 @@ async def api_queue_add(request: Request):
         b.get('description') or '',
         adv=adv,
         privacy=(b.get('privacy') or 'private').strip() or 'private',
+        priority=(b.get('priority') or 'normal').strip().lower(),
     )
     return {'ok': True, 'item': it}
 
+@app.post('/api/queue/import')
+async def api_queue_import(request: Request, format: str = '', privacy: str = 'private', priority: str = 'bulk', profile: str = '', filename: str = ''):
+    """Import en masse (CSV/TXT/JSONL) envoyé en corps brut, lu en flux.
+
+    Le corps est recopié par blocs dans un fichier temporaire (mémoire bornée), puis
+    importé par lots dans un thread (dédoublonnage, tags nettoyés, une transaction par lot).
+    """
+    import tempfile
+    fmt = (format or '').strip().lower()
+    if fmt and fmt not in IMPORT_FORMATS:
+        return JSONResponse({'error': f"format inconnu: {format!r} (attendu: {', '.join(IMPORT_FORMATS)})"}, status_code=400)
+    # format retenu explicitement (ou d'après `filename`): jamais déduit du nom du fichier temporaire
+    fd, tmp_path = tempfile.mkstemp(prefix='t2y-import-', suffix='.import')
+    try:
+        f = os.fdopen(fd, 'wb')
+        try:
+            # écritures disque hors de la boucle d'événements
+            async for chunk in request.stream():
+                await run_in_threadpool(f.write, chunk)
+        finally:
+            await run_in_threadpool(f.close)
+        adv = {'profile': profile.strip() or None} if profile.strip() else None
+        stats = await run_in_threadpool(state.import_file, tmp_path, fmt or (detect_format(filename) if filename else ''),
+                                        privacy=privacy, priority=priority, adv=adv)
+        if not stats['added'] and not stats['duplicates'] and stats['skipped']:
+            return JSONResponse({'error': f"aucune entrée valide (format {stats['format']}, "
+                                          f"{stats['skipped']} ligne(s) ignorée(s))", **stats}, status_code=400)
+        return {'ok': True, **stats}
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    finally:
+        try:
+            os.remove(tmp_path)
+        except Exception:
+            pass
+
 @app.post('/api/queue/start')
 async def api_queue_start():
     state.start_queue()
@@ -329,6 +437,140 @@ async def api_queue_move(request: Request):
     ok = state.move_item(iid, direction)
     return {'ok': bool(ok)}
 
+@app.get('/api/queue/export')
+async def api_queue_export():
+    try:
+        qf = CONFIG_DIR / 'queue.export.json'
+        state.export_queue_json(qf)
+        return FileResponse(str(qf), filename='queue.json', media_type='application/json')
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@app.post('/api/queue/concurrency')
+async def api_queue_concurrency(request: Request):
+    b = await request.json()
+    try:
+        limits = {k: b[k] for k in ('download', 'ffmpeg', 'upload', 'workers') if b.get(k) not in (None, '')}
+        state.set_concurrency(limits)
+        # Persister dans settings.json (clé lue par t2y.pipeline.load_concurrency)
+        d = {}
+        try:
+            with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+                d = json.load(f)
+        except Exception:
+            d = {}
+        d['concurrency'] = dict(state.concurrency)
+        CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(d, f, ensure_ascii=False, indent=2)
+        return {'ok': True, 'concurrency': state.concurrency}
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+@app.post('/api/queue/scheduler')
+async def api_queue_scheduler(request: Request):
+    b = await request.json()
+    try:
+        mode = (b.get('mode') or '').strip().lower() or None
+        if mode is not None and mode not in SCHED_MODES:
+            return JSONResponse({'error': 'mode invalide'}, status_code=400)
+        horizon = b.get('horizon_h')
+        state.set_scheduler(mode, float(horizon) if horizon not in (None, '') else None)
+        # Persister dans settings.json (clé lue par t2y.queue_model.load_scheduler)
+        d = {}
+        try:
+            with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+                d = json.load(f)
+        except Exception:
+            d = {}
+        d['scheduler'] = dict(state.scheduler)
+        CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(d, f, ensure_ascii=False, indent=2)
+        return {'ok': True, 'scheduler': state.scheduler}
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+# --- Agents distants: lease → heartbeat/progress → complete/fail ---
+def _agent_auth(request: Request):
+    """Jeton partagé `T2Y_AGENT_TOKEN` (header `Authorization: Bearer ...`); sans jeton, API désactivée."""
+    token = os.environ.get('T2Y_AGENT_TOKEN') or ''
+    if not token:
+        return JSONResponse({'error': 'API agents désactivée (T2Y_AGENT_TOKEN non défini)'}, status_code=403)
+    if not hmac.compare_digest(request.headers.get('authorization') or '', f'Bearer {token}'):
+        return JSONResponse({'error': 'jeton invalide'}, status_code=401)
+    return None
+
+def _agent_lost():
+    return JSONResponse({'ok': False, 'error': 'bail inconnu ou expiré'}, status_code=409)
+
+@app.post('/api/agent/lease')
+async def api_agent_lease(request: Request):
+    denied = _agent_auth(request)
+    if denied:
+        return denied
+    b = await request.json()
+    agent = (b.get('agent') or '').strip()
+    if not agent:
+        return JSONResponse({'error': 'agent manquant'}, status_code=400)
+    try:
+        ttl = agent_ttl(b.get('ttl'))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    profile = b.get('profile')
+    it = state.agent_lease(agent, ttl=ttl, profile=(profile.strip() if isinstance(profile, str) else None))
+    # durée réellement accordée (bornée): l'agent cale ses heartbeats dessus
+    return {'ok': True, 'item': it, 'ttl': ttl}
+
+@app.post('/api/agent/heartbeat')
+async def api_agent_heartbeat(request: Request):
+    denied = _agent_auth(request)
+    if denied:
+        return denied
+    b = await request.json()
+    if not state.agent_heartbeat((b.get('agent') or '').strip(), (b.get('iid') or '').strip()):
+        return _agent_lost()
+    return {'ok': True}
+
+@app.post('/api/agent/progress')
+async def api_agent_progress(request: Request):
+    denied = _agent_auth(request)
+    if denied:
+        return denied
+    b = await request.json()
+    pcts = {k: b[k] for k in ('d_pct', 'u_pct', 'f_pct') if b.get(k) is not None}
+    ok = state.agent_progress((b.get('agent') or '').strip(), (b.get('iid') or '').strip(),
+                              status=b.get('status') or None, badges=b.get('badges'), **pcts)
+    return {'ok': True} if ok else _agent_lost()
+
+@app.post('/api/agent/complete')
+async def api_agent_complete(request: Request):
+    denied = _agent_auth(request)
+    if denied:
+        return denied
+    b = await request.json()
+    ok = state.agent_complete((b.get('agent') or '').strip(), (b.get('iid') or '').strip(),
+                              result=b.get('result') or '', results=b.get('results') or {}, badges=b.get('badges'))
+    return {'ok': True} if ok else _agent_lost()
+
+@app.post('/api/agent/fail')
+async def api_agent_fail(request: Request):
+    denied = _agent_auth(request)
+    if denied:
+        return denied
+    b = await request.json()
+    reset_at = b.get('quota_reset_at') or None
+    if reset_at is not None:
+        try:
+            reset_at = float(reset_at)
+            if not math.isfinite(reset_at):
+                raise ValueError
+        except (TypeError, ValueError):
+            return JSONResponse({'error': f'quota_reset_at invalide: {reset_at!r}'}, status_code=400)
+    ok = state.agent_fail((b.get('agent') or '').strip(), (b.get('iid') or '').strip(),
+                          error=b.get('error') or '', quota_reset_at=reset_at)
+    return {'ok': True} if ok else _agent_lost()
+
 @app.post('/api/queue/pause_after_n')
 async def api_queue_pause_after_n(request: Request):
     b = await request.json()
@@ -357,6 +599,21 @@ async def api_queue_clear_done():
     n = state.clear_done()
     return {'ok': True, 'removed': n}
 
+@app.get('/api/history')
+async def api_history(limit: int = 50, cursor: str = '', status: str = '', q: str = '', dest: str = '', since: float = 0, until: float = 0):
+    """Historique paginé (plus récent d'abord); `next_cursor` à repasser pour la page suivante."""
+    try:
+        page = await run_in_threadpool(state.history.query, limit=limit, cursor=cursor, status=status or None,
+                                       q=q or None, dest=dest or None, since=since or None, until=until or None)
+        return {'ok': True, **page}
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@app.post('/api/history/archive')
+async def api_history_archive():
+    n = state.archive_done()
+    return {'ok': True, 'archived': n}
+
 @app.post('/api/queue/resume_errors')
 async def api_queue_resume_errors():
     n = state.resume_errors()
@@ -505,7 +762,9 @@ async def api_diagnostics():
             except Exception:
                 pass
             try:
-                qf = CONFIG_DIR / 'queue.json'
+                # Exporter la file (quel que soit le backend) au format queue.json
+                qf = CONFIG_DIR / 'queue.export.json'
+                state.export_queue_json(qf)
                 _safe_add(str(qf), 'config/queue.json')
             except Exception:
                 pass
@@ -0,0 +1,71 @@
+"""
+Import en masse d'un fichier CSV/TXT/JSONL dans la file de la webapp en cours d'exécution.
+
+    python -m webapp.importer urls.csv --server http://127.0.0.1:8765 --priority bulk
+
+Le fichier est envoyé en flux (par blocs) à `POST /api/queue/import`: la webapp
+dédoublonne, nettoie les tags et écrit par lots.
+"""
+from __future__ import annotations
+import argparse
+import os
+
+import requests
+
+from t2y.bulk_import import FORMATS
+
+
+def _chunks(path: str, size: int = 256 * 1024):
+    with open(path, 'rb') as f:
+        while True:
+            b = f.read(size)
+            if not b:
+                break
+            yield b
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description='Import en masse dans la file TikTok → YouTube')
+    ap.add_argument('path', help='fichier CSV, TXT ou JSONL')
+    ap.add_argument('--server', default='http://127.0.0.1:8765', help='URL de la webapp')
+    ap.add_argument('--format', choices=FORMATS, default='', help='format (défaut: selon extension/contenu)')
+    ap.add_argument('--privacy', default='private')
+    ap.add_argument('--priority', default='bulk', choices=('urgent', 'normal', 'bulk'))
+    ap.add_argument('--profile', default='', help='profil YouTube des items importés')
+    args = ap.parse_args(argv)
+
+    params = {
+        'format': args.format,
+        'privacy': args.privacy,
+        'priority': args.priority,
+        'profile': args.profile,
+        'filename': os.path.basename(args.path),
+    }
+    if not os.path.isfile(args.path):
+        print(f'Fichier introuvable: {args.path}')
+        return 2
+    try:
+        r = requests.post(f"{args.server.rstrip('/')}/api/queue/import", params=params,
+                          data=_chunks(args.path), headers={'Content-Type': 'application/octet-stream'}, timeout=600)
+    except Exception as e:
+        print(f'Webapp injoignable: {e}')
+        return 1
+    try:
+        d = r.json()
+    except ValueError:
+        print(f'Réponse invalide ({r.status_code}): {r.text[:200]}')
+        return 1
+    if r.status_code != 200:
+        print(f"Échec ({r.status_code}): {d.get('error') or r.text}")
+        return 1
+    print(f"Format: {d.get('format') or '?'} — ajoutés: {d.get('added', 0)} — doublons ignorés: {d.get('duplicates', 0)}"
+          f" — lignes illisibles ignorées: {d.get('skipped', 0)} — lots: {d.get('batches', 0)}")
+    if not d.get('added'):
+        print('Aucun item ajouté.')
+        # que des doublons: rien à faire; sinon le fichier ne contient aucune entrée exploitable
+        return 0 if d.get('duplicates') else 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
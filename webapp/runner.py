@@ -0,0 +1,438 @@
+"""
+Pipeline d'un item (admission disque → téléchargement → ffmpeg → upload), partagé par la
+webapp (`AppState`), le worker autonome (`webapp.worker`) et l'agent distant (`webapp.agent`).
+
+Le runner ne connaît ni la file ni la base: chaque hôte lui passe ses dépendances au
+constructeur et ses effets de bord en rappels:
+- `save(it, *champs)`: persiste/transmet des champs de l'item (statut compris);
+- `requeue(it)`: item pris mais non lancé (arrêt pendant une attente);
+- `hold_for_quota(it, reset_at)`: item retenu jusqu'au reset du quota YouTube;
+- `running()`: faux quand l'hôte s'arrête;
+- `on_finished(it)`: après la sauvegarde finale (dernier id YouTube, pause après N...).
+
+Baux: `leases` (facultatif) fournit `lost(iid)` et `release(iid)`. Si le bail d'un item est
+perdu (heartbeat refusé: un autre worker l'a repris), le traitement s'arrête avant l'étape
+suivante, au plus tard avant l'upload, et rien n'est écrit pour cet item.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, Optional
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+from t2y.downloader import download_tiktok_with_info
+from t2y.formats import format_policy
+from t2y.logger import log
+from t2y.pipeline import PrefetchGate, StageLimiter
+from t2y.progress import ProgressRegistry
+from t2y.quota import ledger as quota_ledger, next_reset, upload_cost, QuotaExceededError
+from t2y.uploader import upload_to_youtube, apply_post_upload_settings
+from t2y.workdir import WorkdirManager, expected_size, item_workdir
+
+
+class LeaseLost(Exception):
+    """Le bail de l'item a été perdu: un autre worker le traite."""
+
+
+def _noop(*_args, **_kw):
+    pass
+
+
+class ItemRunner:
+    def __init__(self, progress: ProgressRegistry, stages: StageLimiter, prefetch: PrefetchGate,
+                 workdirs: WorkdirManager, *,
+                 save: Callable[..., None] = _noop,
+                 requeue: Callable[[Dict], None] = _noop,
+                 hold_for_quota: Callable[[Dict, float], None] = _noop,
+                 running: Callable[[], bool] = lambda: True,
+                 leases=None,
+                 on_finished: Callable[[Dict], None] = _noop,
+                 lock: Optional[threading.RLock] = None):
+        self.progress = progress
+        self.stages = stages
+        self.prefetch = prefetch
+        self.workdirs = workdirs
+        self._save = save
+        self.requeue = requeue
+        self.hold_for_quota = hold_for_quota
+        self.running = running
+        self.leases = leases
+        self.on_finished = on_finished
+        # Verrou des transitions d'état d'item (partagé avec l'hôte)
+        self._lock = lock or threading.RLock()
+
+    def save(self, it: Dict, *keys: str):
+        """Persiste des champs de l'item, sauf s'il n'est plus à nous (bail perdu)."""
+        if not self.lost(it):
+            self._save(it, *keys)
+
+    def set_status(self, it: Dict, status: str):
+        """Change le statut d'un item et ne le sauvegarde que s'il a réellement changé."""
+        with self._lock:
+            if it.get('status') == status:
+                return
+            it['status'] = status
+        self.save(it, 'status')
+
+    # --- baux ---
+    def lost(self, it: Dict) -> bool:
+        return self.leases is not None and self.leases.lost(it['iid'])
+
+    def _check_lease(self, it: Dict):
+        if self.lost(it):
+            raise LeaseLost(it['iid'])
+
+    # --- quota YouTube ---
+    @staticmethod
+    def uses_youtube(it: Dict) -> bool:
+        return bool(((it.get('adv') or {}).get('destinations') or {}).get('yt', True))
+
+    def quota_blocked(self, it: Dict) -> bool:
+        """Réserve le coût de l'upload (tous processus confondus); quota insuffisant: retenir l'item
+        jusqu'au reset plutôt que d'échouer."""
+        adv = it.get('adv') or {}
+        if self.uses_youtube(it) and not quota_ledger.reserve(adv.get('profile'), it['iid'], upload_cost(adv)):
+            self.hold_for_quota(it, next_reset())
+            self.save(it, 'status', 'result')
+            return True
+        return False
+
+    def release_quota(self, it: Dict):
+        """Rend le reliquat de la réservation de l'item (fin de traitement, échec, remise en file)."""
+        if self.uses_youtube(it):
+            quota_ledger.release((it.get('adv') or {}).get('profile'), it['iid'])
+
+    # --- étapes ---
+    def _add_badge(self, it: Dict, b: str):
+        try:
+            if b not in it['badges']:
+                it['badges'].append(b)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _file_size(path) -> int:
+        try:
+            return os.path.getsize(path) if path else 0
+        except Exception:
+            return 0
+
+    def _stage_download(self, it: Dict, adv: Dict):
+        timeout = (adv.get('timeout') or '').strip() or None
+        proxy = (adv.get('proxy') or '').strip() or None
+        def _dl(p):
+            try:
+                self.progress.set(it['iid'], d_pct=p)
+                self.set_status(it, 'téléchargement')
+            except Exception:
+                pass
+        res = download_tiktok_with_info(it['url'], timeout=timeout, proxy=proxy, on_progress=_dl,
+                                        info=it.get('ie_info'), workdir=item_workdir(it['iid']),
+                                        policy=format_policy(adv))
+        if it.pop('ie_info', None) is not None:
+            # consommée (ou périmée): inutile de la garder dans la file
+            self.save(it, 'ie_info')
+        return res
+
+    def _stage_ffmpeg(self, it: Dict, adv: Dict, vf: str, _info: Dict) -> str:
+        # ffmpeg pré-traitement si demandé
+        try:
+            ff_mode = (adv.get('ff_mode') or 'none').strip()
+            ff_w = int(adv.get('ff_target_w') or 1080)
+            ff_h = int(adv.get('ff_target_h') or 1920)
+            ff_norm = bool(adv.get('ff_normalize'))
+            ff_remux = bool(adv.get('ff_remux'))
+            trim_start = str(adv.get('ff_trim_start') or '').strip()
+            trim_end = str(adv.get('ff_trim_end') or '').strip()
+            wm_path = (adv.get('ff_wm_path') or '').strip()
+            wm_pos = (adv.get('ff_wm_pos') or 'bottom-right').strip()
+            ff_selected = (ff_mode != 'none') or ff_norm or ff_remux or trim_start or trim_end or wm_path
+            # Ne pas tenter ffmpeg sur une vidéo qui semble invalide/vidée (stub) → échec assuré
+            min_valid_size = 64 * 1024  # 64KB
+            vf_ok = bool(vf and os.path.exists(vf) and os.path.getsize(vf) >= min_valid_size)
+            if ff_selected and not shutil.which('ffmpeg'):
+                log('error', 'ffmpeg introuvable — options ffmpeg ignorées')
+            if ff_selected and shutil.which('ffmpeg') and not vf_ok:
+                log('error', f"ffmpeg ignoré: entrée invalide/trop petite ({os.path.getsize(vf) if vf and os.path.exists(vf) else 0} bytes): {vf}")
+                self._add_badge(it, 'ffskip')
+            if ff_selected and shutil.which('ffmpeg') and vf_ok:
+                self.progress.set(it['iid'], f_pct=0)
+                self.set_status(it, 'pré-traitement vidéo')
+                out_path = vf + '.proc.mp4'
+                prev_vf = vf
+                vf_parts = []
+                af_parts = []
+                # mode vidéo
+                if ff_mode == 'crop_9_16':
+                    vf_parts.append(f"crop=ih*9/16:ih:(iw-ih*9/16)/2:0,scale={ff_w}:{ff_h}")
+                elif ff_mode == 'pad_9_16':
+                    vf_parts.append(f"scale={ff_w}:-2,pad={ff_w}:{ff_h}:(ow-iw)/2:(oh-ih)/2:black")
+                # audio normalize
+                if ff_norm:
+                    af_parts.append('loudnorm=I=-16:LRA=11:TP=-1.5')
+                # position watermark
+                overlay_expr = {
+                    'top-left': '10:10',
+                    'top-right': 'W-w-10:10',
+                    'bottom-left': '10:H-h-10',
+                    'bottom-right': 'W-w-10:H-h-10'
+                }.get(wm_pos, 'W-w-10:H-h-10')
+                # Construire commande
+                cmd = ['ffmpeg', '-y']
+                # trim
+                if trim_start:
+                    try:
+                        float(trim_start)
+                        cmd += ['-ss', str(trim_start)]
+                    except Exception:
+                        pass
+                cmd += ['-i', vf]
+                if trim_end:
+                    try:
+                        float(trim_end)
+                        cmd += ['-to', str(trim_end)]
+                    except Exception:
+                        pass
+                map_args = []
+                filter_complex = None
+                if wm_path and os.path.exists(wm_path):
+                    # overlay watermark
+                    wm_chain = 'format=rgba'
+                    if vf_parts:
+                        filter_complex = f"[0:v]{','.join(vf_parts)}[vbase];[1:v]{wm_chain}[wm];[vbase][wm]overlay={overlay_expr}[vout]"
+                    else:
+                        filter_complex = f"[1:v]{wm_chain}[wm];[0:v][wm]overlay={overlay_expr}[vout]"
+                    cmd += ['-i', wm_path, '-filter_complex', filter_complex, '-map', '[vout]']
+                    map_args = ['-map', '0:a?']
+                elif vf_parts:
+                    cmd += ['-vf', ','.join(vf_parts)]
+                # audio filter
+                if af_parts:
+                    cmd += ['-af', ','.join(af_parts)]
+                # codecs
+                needs_encode = bool(vf_parts or af_parts or (wm_path and os.path.exists(wm_path)))
+                if needs_encode:
+                    cmd += ['-c:v', 'libx264', '-preset', 'medium', '-crf', '18', '-c:a', 'aac', '-b:a', '192k']
+                else:
+                    if ff_remux:
+                        cmd += ['-c', 'copy', '-movflags', '+faststart']
+                if map_args:
+                    cmd += map_args
+                cmd += [out_path]
+                try:
+                    # Flux live pour estimer la progression
+                    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+                    last = ''
+                    # Estimation simple: bytes écrits vs. durée estimée inconnue → fallback à spinner progressif
+                    step = 0
+                    while True:
+                        line = proc.stdout.readline() if proc.stdout else ''
+                        if not line and proc.poll() is not None:
+                            break
+                        if line:
+                            last = line.strip()
+                            # Tentative de parse time= dans la sortie
+                            # Exemple: time=00:00:12.34
+                            import re
+                            m = re.search(r'time=(\d{2}):(\d{2}):(\d{2})[\.,](\d{2})', last)
+                            if m:
+                                hh, mm, ss, cs = map(int, m.groups())
+                                elapsed = hh*3600 + mm*60 + ss + cs/100.0
+                                # si l'info durée source est connue, approx
+                                src_dur = None
+                                try:
+                                    src_dur = float((_info or {}).get('duration') or 0)
+                                except Exception:
+                                    src_dur = None
+                                if src_dur and src_dur > 0:
+                                    pct = int(max(0, min(100, (elapsed/src_dur)*100)))
+                                    self.progress.set(it['iid'], f_pct=pct)
+                        else:
+                            step = (step + 5) % 100
+                            cur_f = self.progress.get(it['iid']).get('f_pct', 0)
+                            if cur_f < 95:
+                                self.progress.set(it['iid'], f_pct=max(cur_f, step))
+                    rc = proc.wait()
+                    if rc == 0 and os.path.exists(out_path):
+                        self.progress.set(it['iid'], f_pct=100)
+                        vf = out_path
+                        # nettoyer l'ancien fichier source si différent
+                        try:
+                            if prev_vf and prev_vf != vf and os.path.exists(prev_vf):
+                                os.remove(prev_vf)
+                        except Exception:
+                            pass
+                    else:
+                        raise RuntimeError(f"ffmpeg exit {rc}; dernière ligne: {last}")
+                except Exception as e:
+                    log('error', f"ffmpeg a échoué: {e}")
+        except Exception as _ffe:
+            log('error', f'pré-traitement ffmpeg: {_ffe}')
+
+        # Remux systématique en MP4 + faststart si aucun traitement explicite n'est demandé
+        try:
+            # Recalcule un indicateur local sans dépendre d'une variable potentiellement non définie
+            ff_mode_local = (adv.get('ff_mode') or 'none') if isinstance(adv, dict) else 'none'
+            ff_any = False
+            try:
+                m = str(ff_mode_local).strip().lower()
+                ff_any = (m != 'none') or bool(adv.get('ff_normalize') if isinstance(adv, dict) else False) or bool(
+                    (adv.get('ff_pad_9_16') if isinstance(adv, dict) else False) or (adv.get('ff_pad_1_1') if isinstance(adv, dict) else False) or (adv.get('ff_pad_16_9') if isinstance(adv, dict) else False)
+                )
+            except Exception:
+                ff_any = False
+
+            if (not ff_any) and shutil.which('ffmpeg') and os.path.exists(vf):
+                self.set_status(it, 'préparation pour YouTube')
+                remux_out = vf + '.fast.mp4'
+                prev_vf = vf
+                cmd = ['ffmpeg', '-y', '-i', vf, '-c', 'copy', '-movflags', '+faststart', remux_out]
+                rc = subprocess.call(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                if rc == 0 and os.path.exists(remux_out) and os.path.getsize(remux_out) > 0:
+                    vf = remux_out
+                    self._add_badge(it, 'prep')
+                    # supprimer l'ancien fichier source
+                    try:
+                        if prev_vf and prev_vf != vf and os.path.exists(prev_vf):
+                            os.remove(prev_vf)
+                    except Exception:
+                        pass
+                else:
+                    # fallback encode vers un MP4 standard (H.264/AAC/yuv420p)
+                    enc_out = vf + '.enc.mp4'
+                    cmd2 = ['ffmpeg', '-y', '-i', vf, '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '20', '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart', enc_out]
+                    rc2 = subprocess.call(cmd2, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                    if rc2 == 0 and os.path.exists(enc_out) and os.path.getsize(enc_out) > 0:
+                        vf = enc_out
+                        self._add_badge(it, 'prep')
+                        # supprimer l'ancien fichier source
+                        try:
+                            if prev_vf and prev_vf != vf and os.path.exists(prev_vf):
+                                os.remove(prev_vf)
+                        except Exception:
+                            pass
+                    else:
+                        log('error', 'remux/encode MP4 a échoué — upload du fichier original')
+        except Exception as e:
+            log('error', f'remux MP4 échoué: {e}')
+        return vf
+
+    def _stage_upload(self, it: Dict, adv: Dict, vf: str):
+        # dernier point de contrôle: pas d'upload pour un item repris par un autre worker
+        self._check_lease(it)
+        title = it.get('title') or ''
+        desc = it.get('description') or ''
+        privacy = it.get('privacy') or 'private'
+        def _ul(p):
+            try:
+                self.progress.set(it['iid'], u_pct=p)
+                self.set_status(it, 'upload')
+            except Exception:
+                pass
+        # YouTube (optionnel via destinations)
+        dests = (adv.get('destinations') or {}) if isinstance(adv, dict) else {}
+        vid = None
+        # les appels API de ce thread consomment la réservation faite au lancement
+        with quota_ledger.working_on(it['iid']):
+            if dests.get('yt', True):
+                vid = upload_to_youtube(vf, title, desc, privacy, on_progress=_ul, advanced=adv)
+                it['results'] = it.get('results') or {}
+                it['results']['yt'] = vid
+            try:
+                from t2y.auth import get_credentials as _get_creds
+                yt = _get_creds((adv.get('profile') or None))
+                apply_post_upload_settings(yt, vid, adv)
+            except Exception as e:
+                log('error', f'post-upload settings échoués: {e}')
+        # Instagram/TikTok (stubs)
+        try:
+            if dests.get('ig'):
+                from t2y.insta_uploader import upload_to_instagram
+                ig_id = upload_to_instagram(vf, caption=desc or title, on_progress=_ul, advanced=adv)
+                it['results']['ig'] = ig_id
+        except Exception as e:
+            log('error', f'instagram stub error: {e}')
+        try:
+            if dests.get('tt'):
+                from t2y.tiktok_poster import post_to_tiktok
+                tt_id = post_to_tiktok(vf, caption=desc or title, on_progress=_ul, advanced=adv)
+                it['results']['tt'] = tt_id
+        except Exception as e:
+            log('error', f'tiktok stub error: {e}')
+
+        with self._lock:
+            it['status'] = 'terminé'
+            it['finished_at'] = time.time()
+            it['result'] = vid or it.get('results', {}).get('ig') or it.get('results', {}).get('tt') or ''
+
+    def process(self, it: Dict) -> bool:
+        """Traite un item de bout en bout; False si son bail a été perdu en route (rien n'est écrit)."""
+        self.progress.clear(it.get('iid'))
+        self.set_status(it, 'en cours')
+        vf = None
+        lost = False
+        try:
+            adv = it.get('adv') or {}
+            # initialiser badges si absents
+            if 'badges' not in it or not isinstance(it.get('badges'), list):
+                it['badges'] = []
+            # Borne disque des items téléchargés d'avance (mode pipeline); arrêt pendant l'attente
+            if not self.prefetch.enter(it['iid'], self.running):
+                self.requeue(it)
+                return True
+            # Admission: pas de lancement si le disque de travail ne peut pas contenir l'item
+            if self.workdirs.acquire(it['iid'], expected_size(it.get('ie_info')), self.running,
+                                     on_wait=lambda: self.set_status(it, 'attente espace disque')) is None:
+                self.requeue(it)
+                return True
+            # Chaque étape prend un slot de son pool (concurrence configurable par étape)
+            with self.stages.slot('download'):
+                self._check_lease(it)
+                vf, _info = self._stage_download(it, adv)
+            self.prefetch.set_bytes(it['iid'], self._file_size(vf))
+            with self.stages.slot('ffmpeg'):
+                self._check_lease(it)
+                vf = self._stage_ffmpeg(it, adv, vf, _info)
+            self.prefetch.set_bytes(it['iid'], self._file_size(vf))
+            with self.stages.slot('upload'):
+                self._stage_upload(it, adv, vf)
+        except LeaseLost:
+            lost = True
+            log('error', f"{it['iid']}: bail perdu — traitement abandonné (repris par un autre worker)")
+        except QuotaExceededError as e:
+            # quota atteint pendant l'upload: l'item repartira après le reset
+            self.hold_for_quota(it, e.reset_at)
+        except Exception as e:
+            with self._lock:
+                it['status'] = 'erreur'
+                it['result'] = str(e)
+        finally:
+            self.release_quota(it)
+            self.prefetch.leave(it['iid'])
+            self.workdirs.release(it['iid'])
+            try:
+                if vf and os.path.exists(vf):
+                    os.remove(vf)
+                    d = os.path.dirname(vf)
+                    if os.path.isdir(d) and not os.listdir(d):
+                        os.rmdir(d)
+            except Exception:
+                pass
+            # bail perdu pendant la dernière étape: l'item n'est plus à nous non plus
+            lost = lost or self.lost(it)
+            if lost:
+                # l'item appartient à un autre worker: rien n'est écrit pour lui
+                self.progress.clear(it['iid'])
+            else:
+                self.save(it, 'status', 'result', 'results', 'badges', 'finished_at')
+            if self.leases is not None:
+                # libération limitée à notre propre bail: sans effet sur celui du nouveau détenteur
+                self.leases.release(it['iid'])
+            if not lost:
+                try:
+                    self.on_finished(it)
+                except Exception as e:
+                    log('error', f"{it['iid']}: fin de traitement: {e}")
+        return not lost
@@ -1,31 +1,86 @@
+import math
 import threading
 import time
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
 
 from t2y.metadata import fetch_tiktok_metadata
-from t2y.downloader import download_tiktok_with_info
-from t2y.uploader import upload_to_youtube, apply_post_upload_settings
-from t2y.validators import parse_rfc3339
+from t2y.validators import parse_rfc3339, sanitize_tags_500
+from t2y.bulk_import import BATCH_SIZE, batched, dedupe, detect_format, iter_entries, normalize_url, open_lines
 from t2y.config import CONFIG_DIR
-from t2y.logger import log
+from t2y.logger import log, add_listener as add_log_listener
+from t2y.queue_store import LEASABLE_STATUSES, open_queue_store
+from t2y.progress import ProgressRegistry
+from t2y.queue_model import IndexedQueue, PRIORITIES, load_scheduler
+from t2y.quota import ledger as quota_ledger
+from t2y.leases import LeaseKeeper, make_owner, supports_leases
+from t2y.changelog import ChangeLog
+from t2y.events import EventBus
+from t2y.ydl_pool import pool as ydl_pool, available as ydl_pool_available
+from t2y.workdir import gc_workdirs, remove_workdir, manager as workdirs
+from t2y.history import HistoryStore, load_history_settings
+from t2y.pipeline import StageLimiter, PrefetchGate, load_concurrency, load_pipeline
+from webapp.runner import ItemRunner
 
 import json
-import os
-import shutil
-import subprocess
 
 QUEUE_FILE = CONFIG_DIR / 'queue.json'
+AGENT_TTL = 120.0
+AGENT_TTL_MIN = 10.0
+AGENT_TTL_MAX = 3600.0
+# Relecture de la base partagée (workers autonomes, autres processus), en secondes
+RESYNC_INTERVAL = 2.0
 WATCH_FILE = CONFIG_DIR / 'watch.json'
 
 
+def agent_ttl(value=None) -> float:
+    """Durée de bail accordée à un agent: `value` (s) bornée à [AGENT_TTL_MIN, AGENT_TTL_MAX],
+    `AGENT_TTL` si absente. ValueError si `value` n'est pas un nombre."""
+    try:
+        ttl = float(value or 0) or AGENT_TTL
+    except (TypeError, ValueError):
+        raise ValueError(f'ttl invalide: {value!r}')
+    if not math.isfinite(ttl):
+        raise ValueError(f'ttl invalide: {value!r}')
+    return max(AGENT_TTL_MIN, min(ttl, AGENT_TTL_MAX))
+
+
 class AppState:
     def __init__(self):
-        self.queue: List[Dict] = []
+        self.queue = IndexedQueue()
         self.queue_running = False
         self.queue_paused = False
         self.watch_running = False
         self._watch_thread: Optional[threading.Thread] = None
         self._queue_thread: Optional[threading.Thread] = None
+        self._queue_threads: List[threading.Thread] = []
+        self._queue_gen = 0
+        # Verrou des transitions d'état d'item (plusieurs workers en parallèle)
+        self._lock = threading.RLock()
+        # Réveil des workers (ajout, reprise, arrêt): plus de boucle sleep/poll
+        self._queue_cv = threading.Condition()
+        # Arrêt immédiat du watcher (attente interruptible de l'intervalle)
+        self._watch_stop = threading.Event()
+        self.concurrency = load_concurrency()
+        self.stages = StageLimiter(self.concurrency)
+        # Mode pipeline: téléchargement de l'item suivant pendant l'upload du courant
+        self.pipeline = load_pipeline()
+        self.prefetch = PrefetchGate()
+        # Dossiers de travail: réservation de place disque par item, admission si espace suffisant
+        self.workdirs = workdirs
+        # Ordonnancement: fifo (ordre de liste) ou deadline (publishAt + classe de priorité)
+        self.scheduler = load_scheduler()
+        # Items retenus faute de quota YouTube, backends sans baux seulement (relâchés au reset,
+        # minuit heure du Pacifique); en SQLite la base s'en charge (`reclaim_expired`)
+        self._quota_held: Dict[str, Dict] = {}
+        self._quota_timer: Optional[threading.Timer] = None
+        # Agents distants (HTTP): iid -> {agent, owner, expires, item}
+        self._agent_leases: Dict[str, Dict] = {}
+        self._agent_reaper: Optional[threading.Thread] = None
+        # Items pris par un thread de ce processus (la resynchronisation ne les touche pas)
+        self._active = set()
+        # Items en bail chez un autre processus: iid -> expiration du bail (revus ensuite)
+        self._deferred: Dict[str, float] = {}
+        self._store_rev = 0
         self.interval_min = 10.0
         self.handle = ''
         self.quota = 3
@@ -39,23 +94,170 @@ class AppState:
         self.pause_after_n_value = 0
         self._processed_in_run = 0
         self._seen = set()
+        self._store = open_queue_store()
+        # Baux (SQLite): plusieurs processus workers peuvent partager la file
+        self.leases = LeaseKeeper(self._store, make_owner('webapp')) if supports_leases(self._store) else None
+        # Version monotone de la file (API delta): chaque mutation d'item l'incrémente
+        self.changes = ChangeLog()
+        # Flux SSE: progression/statuts (débit limité par item), watcher et lignes de log
+        self.events = EventBus()
+        self.events.on_tick = self._publish_summary
+        self._summary_key = None
+        add_log_listener(lambda line: self.events.publish('log', line))
+        # Progression volatile (non persistée): seules les transitions de statut sont écrites
+        self.progress = ProgressRegistry(on_change=self._touch_iid)
+        # Pipeline d'un item (téléchargement → ffmpeg → upload), partagé avec worker et agent
+        self.runner = ItemRunner(self.progress, self.stages, self.prefetch, self.workdirs,
+                                 save=self._save_item, requeue=self._requeue,
+                                 hold_for_quota=self._hold_for_quota,
+                                 running=lambda: self.queue_running, leases=self.leases,
+                                 on_finished=self._item_finished, lock=self._lock)
         self._load_queue()
         self._load_watch()
+        # Historique: les terminés quittent la file active (après N minutes / au-delà de max_live)
+        self.history_settings = load_history_settings()
+        self.history = HistoryStore(segment_items=self.history_settings['segment_items'])
+        self._history_stop = threading.Event()
+        threading.Thread(target=self._history_loop, daemon=True).start()
+        if self._store is not None and hasattr(self._store, 'changes_since'):
+            threading.Thread(target=self._resync_loop, daemon=True).start()
 
     def _save_queue(self):
         try:
+            if self._store is not None:
+                self._store.replace_all(self.queue.to_list())
+                return
             CONFIG_DIR.mkdir(parents=True, exist_ok=True)
             with open(QUEUE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.queue, f, ensure_ascii=False, indent=2)
+                json.dump(self.queue.to_list(), f, ensure_ascii=False, indent=2)
         except Exception as e:
             log('error', f'webapp: save queue failed: {e}')
 
+    def _snapshot(self, it: Dict) -> Dict:
+        """Copie de l'item (progression comprise) figée à la version courante."""
+        snap = dict(it)
+        for k in ('adv', 'results'):
+            if isinstance(snap.get(k), dict):
+                snap[k] = dict(snap[k])
+        if isinstance(snap.get('badges'), list):
+            snap['badges'] = list(snap['badges'])
+        snap.update(self.progress.merged(snap))
+        return snap
+
+    def _touch(self, *items: Dict):
+        for it in items:
+            if it is not None and it.get('iid'):
+                snap = self._snapshot(it)
+                self.events.item(it['iid'], snap, self.changes.touch(it['iid'], snap))
+
+    def _forget(self, iid: str):
+        self.events.removed(iid, self.changes.remove(iid))
+
+    def summary(self) -> Dict:
+        return {
+            'running': self.queue_running,
+            'paused': self.queue_paused,
+            'size': len(self.queue),
+            'counts': self.queue.status_counts(),
+            'version': self.changes.version,
+            'lastVideoId': self.last_video_id,
+        }
+
+    def _publish_summary(self):
+        # compteurs de la file, seulement s'ils ont changé (appelé par le thread du bus)
+        key = (self.changes.version, self.queue_running, self.queue_paused, self.last_video_id)
+        if key != self._summary_key:
+            self._summary_key = key
+            self.events.publish('queue', self.summary())
+
+    def _touch_iid(self, iid: str):
+        self._touch(self.queue.get(iid))
+
+    def _save_item(self, it: Dict, *keys: str):
+        """Persiste seulement les champs `keys` d'un item (UPDATE d'une ligne en SQLite)."""
+        self._touch(it)
+        if self._store is None:
+            self._save_queue()
+            return
+        try:
+            self._store.update(it.get('iid'), {k: it.get(k) for k in keys})
+        except Exception as e:
+            log('error', f'webapp: save item failed: {e}')
+
     def _load_queue(self):
+        items, next_id = [], 0
+        if self.leases is not None:
+            # items restés "en cours" après un crash (bail expiré ou absent) → en attente
+            self.leases.reclaim()
         try:
-            with open(QUEUE_FILE, 'r', encoding='utf-8') as f:
-                self.queue = json.load(f)
+            if self._store is not None:
+                if hasattr(self._store, 'revision'):
+                    # lue avant le chargement: rien de ce qui suit n'est manqué par la resynchronisation
+                    self._store_rev = self._store.revision()
+                items = self._store.load()
+                next_id = int(self._store.get_meta('next_id') or 0)
+            else:
+                with open(QUEUE_FILE, 'r', encoding='utf-8') as f:
+                    items = json.load(f)
         except Exception:
-            self.queue = []
+            items = []
+        if self.leases is None:
+            # sans baux, aucun autre processus ne traite la file: tout statut transitoire est un reste de crash
+            for it in items:
+                if (it.get('status') or 'en attente') not in ('en attente', 'quota', 'terminé', 'erreur'):
+                    it['status'] = 'en attente'
+                    if self._store is not None:
+                        try:
+                            self._store.update(it.get('iid'), {'status': 'en attente'})
+                        except Exception:
+                            pass
+        # terminés sans date de fin (anciennes versions): le délai d'archivage part du chargement
+        now = time.time()
+        for it in items:
+            if (it.get('status') or '') == 'terminé' and not it.get('finished_at'):
+                it['finished_at'] = now
+        self.queue = IndexedQueue(items, next_id=next_id, mode=self.scheduler['mode'], horizon_h=self.scheduler['horizon_h'])
+
+    def _new_iid(self) -> str:
+        """Identifiant monotone (jamais réutilisé, même après suppression)."""
+        iid = self.queue.new_iid()
+        if self._store is not None:
+            try:
+                self._store.set_meta('next_id', str(self.queue.last_id))
+            except Exception:
+                pass
+        return iid
+
+    def _set_status(self, it: Dict, status: str):
+        """Change le statut d'un item et ne persiste que s'il a réellement changé."""
+        self.runner.set_status(it, status)
+
+    def item_progress(self, it: Dict) -> Dict[str, int]:
+        return self.progress.merged(it)
+
+    def queue_page(self, cursor: str = '', limit: int = 50, statuses: Optional[List[str]] = None,
+                   q: str = '') -> Dict:
+        """Page de la file (ordre affiché), filtrée par statut et par texte (URL, titre, iid)."""
+        wanted = set(s for s in (statuses or []) if s)
+        ql = (q or '').strip().lower()
+
+        def _pred(it: Dict) -> bool:
+            if wanted and (it.get('status') or 'en attente') not in wanted:
+                return False
+            if ql:
+                hay = f"{it.get('iid', '')} {it.get('url', '')} {it.get('title', '')}".lower()
+                if ql not in hay:
+                    return False
+            return True
+        items, next_cursor, total = self.queue.page(cursor, limit, _pred if (wanted or ql) else None)
+        return {'items': items, 'next_cursor': next_cursor, 'total': total}
+
+    def export_queue_json(self, path=QUEUE_FILE) -> int:
+        """Exporte la file au format `queue.json` historique."""
+        if self._store is not None:
+            return self._store.export_json(path)
+        self._save_queue()
+        return len(self.queue)
 
     def _save_watch(self):
         try:
@@ -91,39 +293,17 @@ class AppState:
         except Exception:
             pass
 
-    def queue_add(self, url: str, title: str = '', description: str = '', tags: Optional[list] = None, adv: Optional[dict] = None, privacy: str = 'private'):
-        # Conserver compat avec anciens appels (tags simple)
-        if adv is None:
-            adv = {'tags': (tags or [])}
+    def _make_item(self, url: str, title: str = '', description: str = '', adv: Optional[dict] = None, privacy: str = 'private', priority: str = 'normal', iid: str = '', ie_info: Optional[Dict] = None) -> Dict:
         # Sanitize tags (500 chars total)
-        def _sanitize(tags_list):
-            try:
-                if not tags_list:
-                    return []
-                cleaned, seen, total = [], set(), 0
-                for t in tags_list:
-                    s = (t or '').strip().lstrip('#')
-                    if not s:
-                        continue
-                    k = s.lower()
-                    if k in seen:
-                        continue
-                    if total + len(s) > 500:
-                        continue
-                    cleaned.append(s)
-                    seen.add(k)
-                    total += len(s)
-                return cleaned
-            except Exception:
-                return tags_list or []
-        adv['tags'] = _sanitize(adv.get('tags') or [])
+        adv['tags'] = sanitize_tags_500(adv.get('tags') or [])
         item = {
-            'iid': f'item_{len(self.queue)+1}',
+            'iid': iid or self._new_iid(),
             'url': url,
             'title': title,
             'description': description or '',
             'tags': adv.get('tags') or [],
             'privacy': (privacy or 'private'),
+            'priority': priority if priority in PRIORITIES else 'normal',
             'adv': adv,
             'status': 'en attente',
             'd_pct': 0,
@@ -131,345 +311,521 @@ class AppState:
             'result': '',
             'results': {}
         }
+        if ie_info:
+            # extraction déjà faite (watcher): le téléchargement la réutilise tant que les URLs sont valides
+            item['ie_info'] = ie_info
+        return item
+
+    def queue_add(self, url: str, title: str = '', description: str = '', tags: Optional[list] = None, adv: Optional[dict] = None, privacy: str = 'private', priority: str = 'normal', ie_info: Optional[Dict] = None):
+        # Conserver compat avec anciens appels (tags simple)
+        if adv is None:
+            adv = {'tags': (tags or [])}
+        item = self._make_item(url, title, description, adv, privacy, priority, ie_info=ie_info)
         self.queue.append(item)
-        self._save_queue()
+        self._touch(item)
+        if self._store is not None:
+            try:
+                self._store.put(item)
+            except Exception as e:
+                log('error', f'webapp: save item failed: {e}')
+        else:
+            self._save_queue()
+        self._wake_workers()
         return item
 
-    def _queue_worker(self):
-        self.queue_running = True
-        while self.queue_running:
-            for it in list(self.queue):
-                if not self.queue_running:
-                    break
-                while self.queue_paused and self.queue_running:
-                    time.sleep(0.3)
-                if it.get('status') == 'terminé':
-                    continue
-                it['status'] = 'en cours'
-                self._save_queue()
+    def queue_add_many(self, entries: Iterable[Dict], privacy: str = 'private', priority: str = 'bulk', adv: Optional[dict] = None, batch_size: int = BATCH_SIZE, stats: Optional[Dict] = None) -> Dict[str, int]:
+        """Ajout en masse: dédoublonnage par URL, une transaction (et un réveil des workers) par lot.
+        `stats` est complété (et peut déjà être alimenté par le lecteur des entrées)."""
+        stats = stats if stats is not None else {}
+        for k in ('added', 'duplicates', 'batches'):
+            stats.setdefault(k, 0)
+        seen = {normalize_url(it.get('url') or '') for it in self.queue}
+        base_adv = dict(adv or {})
+        for batch in batched(dedupe(entries, seen, stats), batch_size):
+            items = []
+            for e in batch:
+                a = {**base_adv, 'tags': e.get('tags') or list(base_adv.get('tags') or [])}
+                items.append(self._make_item(e['url'], e.get('title') or '', e.get('description') or '', a,
+                                             e.get('privacy') or privacy, e.get('priority') or priority,
+                                             iid=self.queue.new_iid()))
+            for it in items:
+                self.queue.append(it)
+            self._touch(*items)
+            if self._store is not None:
                 try:
-                    vf = None
-                    # download
-                    adv = it.get('adv') or {}
-                    # initialiser badges si absents
-                    if 'badges' not in it or not isinstance(it.get('badges'), list):
-                        it['badges'] = []
-                    def _add_badge(b):
-                        try:
-                            if b not in it['badges']:
-                                it['badges'].append(b)
-                        except Exception:
-                            pass
-                    timeout = (adv.get('timeout') or '').strip() or None
-                    proxy = (adv.get('proxy') or '').strip() or None
-                    def _dl(p):
-                        try:
-                            it['d_pct'] = int(p)
-                            it['status'] = 'téléchargement'
-                            self._save_queue()
-                        except Exception:
-                            pass
-                    vf, _info = download_tiktok_with_info(it['url'], timeout=timeout, proxy=proxy, on_progress=_dl)
-
-                    # ffmpeg pré-traitement si demandé
-                    try:
-                        ff_mode = (adv.get('ff_mode') or 'none').strip()
-                        ff_w = int(adv.get('ff_target_w') or 1080)
-                        ff_h = int(adv.get('ff_target_h') or 1920)
-                        ff_norm = bool(adv.get('ff_normalize'))
-                        ff_remux = bool(adv.get('ff_remux'))
-                        trim_start = str(adv.get('ff_trim_start') or '').strip()
-                        trim_end = str(adv.get('ff_trim_end') or '').strip()
-                        wm_path = (adv.get('ff_wm_path') or '').strip()
-                        wm_pos = (adv.get('ff_wm_pos') or 'bottom-right').strip()
-                        ff_selected = (ff_mode != 'none') or ff_norm or ff_remux or trim_start or trim_end or wm_path
-                        # Ne pas tenter ffmpeg sur une vidéo qui semble invalide/vidée (stub) → échec assuré
-                        min_valid_size = 64 * 1024  # 64KB
-                        vf_ok = bool(vf and os.path.exists(vf) and os.path.getsize(vf) >= min_valid_size)
-                        if ff_selected and not shutil.which('ffmpeg'):
-                            log('error', 'ffmpeg introuvable — options ffmpeg ignorées')
-                        if ff_selected and shutil.which('ffmpeg') and not vf_ok:
-                            log('error', f"ffmpeg ignoré: entrée invalide/trop petite ({os.path.getsize(vf) if vf and os.path.exists(vf) else 0} bytes): {vf}")
-                            _add_badge('ffskip')
-                        if ff_selected and shutil.which('ffmpeg') and vf_ok:
-                            it['status'] = 'pré-traitement vidéo'
-                            it['f_pct'] = 0
-                            self._save_queue()
-                            out_path = vf + '.proc.mp4'
-                            prev_vf = vf
-                            vf_parts = []
-                            af_parts = []
-                            # mode vidéo
-                            if ff_mode == 'crop_9_16':
-                                vf_parts.append(f"crop=ih*9/16:ih:(iw-ih*9/16)/2:0,scale={ff_w}:{ff_h}")
-                            elif ff_mode == 'pad_9_16':
-                                vf_parts.append(f"scale={ff_w}:-2,pad={ff_w}:{ff_h}:(ow-iw)/2:(oh-ih)/2:black")
-                            # audio normalize
-                            if ff_norm:
-                                af_parts.append('loudnorm=I=-16:LRA=11:TP=-1.5')
-                            # position watermark
-                            overlay_expr = {
-                                'top-left': '10:10',
-                                'top-right': f"W-w-10:10",
-                                'bottom-left': '10:H-h-10',
-                                'bottom-right': 'W-w-10:H-h-10'
-                            }.get(wm_pos, 'W-w-10:H-h-10')
-                            # Construire commande
-                            cmd = ['ffmpeg', '-y']
-                            # trim
-                            if trim_start:
-                                try:
-                                    float(trim_start)
-                                    cmd += ['-ss', str(trim_start)]
-                                except Exception:
-                                    pass
-                            cmd += ['-i', vf]
-                            if trim_end:
-                                try:
-                                    float(trim_end)
-                                    cmd += ['-to', str(trim_end)]
-                                except Exception:
-                                    pass
-                            map_args = []
-                            filter_complex = None
-                            if wm_path and os.path.exists(wm_path):
-                                # overlay watermark
-                                wm_chain = 'format=rgba'
-                                if vf_parts:
-                                    filter_complex = f"[0:v]{','.join(vf_parts)}[vbase];[1:v]{wm_chain}[wm];[vbase][wm]overlay={overlay_expr}[vout]"
-                                else:
-                                    filter_complex = f"[1:v]{wm_chain}[wm];[0:v][wm]overlay={overlay_expr}[vout]"
-                                cmd += ['-i', wm_path, '-filter_complex', filter_complex, '-map', '[vout]']
-                                map_args = ['-map', '0:a?']
-                            elif vf_parts:
-                                cmd += ['-vf', ','.join(vf_parts)]
-                            # audio filter
-                            if af_parts:
-                                cmd += ['-af', ','.join(af_parts)]
-                            # codecs
-                            needs_encode = bool(vf_parts or af_parts or (wm_path and os.path.exists(wm_path)))
-                            if needs_encode:
-                                cmd += ['-c:v', 'libx264', '-preset', 'medium', '-crf', '18', '-c:a', 'aac', '-b:a', '192k']
-                            else:
-                                if ff_remux:
-                                    cmd += ['-c', 'copy', '-movflags', '+faststart']
-                            if map_args:
-                                cmd += map_args
-                            cmd += [out_path]
-                            try:
-                                # Flux live pour estimer la progression
-                                proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
-                                last = ''
-                                # Estimation simple: bytes écrits vs. durée estimée inconnue → fallback à spinner progressif
-                                step = 0
-                                while True:
-                                    line = proc.stdout.readline() if proc.stdout else ''
-                                    if not line and proc.poll() is not None:
-                                        break
-                                    if line:
-                                        last = line.strip()
-                                        # Tentative de parse time= dans la sortie
-                                        # Exemple: time=00:00:12.34
-                                        import re
-                                        m = re.search(r'time=(\d{2}):(\d{2}):(\d{2})[\.,](\d{2})', last)
-                                        if m:
-                                            hh, mm, ss, cs = map(int, m.groups())
-                                            elapsed = hh*3600 + mm*60 + ss + cs/100.0
-                                            # si l'info durée source est connue, approx
-                                            src_dur = None
-                                            try:
-                                                src_dur = float((_info or {}).get('duration') or 0)
-                                            except Exception:
-                                                src_dur = None
-                                            if src_dur and src_dur > 0:
-                                                pct = int(max(0, min(100, (elapsed/src_dur)*100)))
-                                                it['f_pct'] = pct
-                                                self._save_queue()
-                                    else:
-                                        step = (step + 5) % 100
-                                        if it.get('f_pct', 0) < 95:
-                                            it['f_pct'] = max(it.get('f_pct', 0), step)
-                                            self._save_queue()
-                                rc = proc.wait()
-                                if rc == 0 and os.path.exists(out_path):
-                                    it['f_pct'] = 100
-                                    self._save_queue()
-                                    vf = out_path
-                                    # nettoyer l'ancien fichier source si différent
-                                    try:
-                                        if prev_vf and prev_vf != vf and os.path.exists(prev_vf):
-                                            os.remove(prev_vf)
-                                    except Exception:
-                                        pass
-                                else:
-                                    raise RuntimeError(f"ffmpeg exit {rc}; dernière ligne: {last}")
-                            except Exception as e:
-                                log('error', f"ffmpeg a échoué: {e}")
-                    except Exception as _ffe:
-                        log('error', f'pré-traitement ffmpeg: {_ffe}')
-
-                    # Remux systématique en MP4 + faststart si aucun traitement explicite n'est demandé
-                    try:
-                        # Recalcule un indicateur local sans dépendre d'une variable potentiellement non définie
-                        ff_mode_local = (adv.get('ff_mode') or 'none') if isinstance(adv, dict) else 'none'
-                        ff_any = False
-                        try:
-                            m = str(ff_mode_local).strip().lower()
-                            ff_any = (m != 'none') or bool(adv.get('ff_normalize') if isinstance(adv, dict) else False) or bool(
-                                (adv.get('ff_pad_9_16') if isinstance(adv, dict) else False) or (adv.get('ff_pad_1_1') if isinstance(adv, dict) else False) or (adv.get('ff_pad_16_9') if isinstance(adv, dict) else False)
-                            )
-                        except Exception:
-                            ff_any = False
-
-                        if (not ff_any) and shutil.which('ffmpeg') and os.path.exists(vf):
-                            it['status'] = 'préparation pour YouTube'
-                            self._save_queue()
-                            remux_out = vf + '.fast.mp4'
-                            prev_vf = vf
-                            cmd = ['ffmpeg', '-y', '-i', vf, '-c', 'copy', '-movflags', '+faststart', remux_out]
-                            rc = subprocess.call(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                            if rc == 0 and os.path.exists(remux_out) and os.path.getsize(remux_out) > 0:
-                                vf = remux_out
-                                _add_badge('prep')
-                                # supprimer l'ancien fichier source
-                                try:
-                                    if prev_vf and prev_vf != vf and os.path.exists(prev_vf):
-                                        os.remove(prev_vf)
-                                except Exception:
-                                    pass
-                            else:
-                                # fallback encode vers un MP4 standard (H.264/AAC/yuv420p)
-                                enc_out = vf + '.enc.mp4'
-                                cmd2 = ['ffmpeg', '-y', '-i', vf, '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '20', '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart', enc_out]
-                                rc2 = subprocess.call(cmd2, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                                if rc2 == 0 and os.path.exists(enc_out) and os.path.getsize(enc_out) > 0:
-                                    vf = enc_out
-                                    _add_badge('prep')
-                                    # supprimer l'ancien fichier source
-                                    try:
-                                        if prev_vf and prev_vf != vf and os.path.exists(prev_vf):
-                                            os.remove(prev_vf)
-                                    except Exception:
-                                        pass
-                                else:
-                                    log('error', 'remux/encode MP4 a échoué — upload du fichier original')
-                    except Exception as e:
-                        log('error', f'remux MP4 échoué: {e}')
-
-                    # upload
-                    title = it.get('title') or ''
-                    desc = it.get('description') or ''
-                    privacy = it.get('privacy') or 'private'
-                    def _ul(p):
-                        try:
-                            it['u_pct'] = int(p)
-                            it['status'] = 'upload'
-                            self._save_queue()
-                        except Exception:
-                            pass
-                    # YouTube (optionnel via destinations)
-                    dests = (adv.get('destinations') or {}) if isinstance(adv, dict) else {}
-                    vid = None
-                    if dests.get('yt', True):
-                        vid = upload_to_youtube(vf, title, desc, privacy, on_progress=_ul, advanced=adv)
-                        it['results'] = it.get('results') or {}
-                        it['results']['yt'] = vid
-                    try:
-                        from t2y.auth import get_credentials as _get_creds
-                        yt = _get_creds((adv.get('profile') or None))
-                        apply_post_upload_settings(yt, vid, adv)
-                    except Exception as e:
-                        log('error', f'post-upload settings échoués: {e}')
-                    # Instagram/TikTok (stubs)
-                    try:
-                        if dests.get('ig'):
-                            from t2y.insta_uploader import upload_to_instagram
-                            ig_id = upload_to_instagram(vf, caption=desc or title, on_progress=_ul, advanced=adv)
-                            it['results']['ig'] = ig_id
-                    except Exception as e:
-                        log('error', f'instagram stub error: {e}')
-                    try:
-                        if dests.get('tt'):
-                            from t2y.tiktok_poster import post_to_tiktok
-                            tt_id = post_to_tiktok(vf, caption=desc or title, on_progress=_ul, advanced=adv)
-                            it['results']['tt'] = tt_id
-                    except Exception as e:
-                        log('error', f'tiktok stub error: {e}')
-
-                    it['status'] = 'terminé'
-                    it['result'] = vid or it.get('results', {}).get('ig') or it.get('results', {}).get('tt') or ''
-                    self.last_video_id = (it.get('results', {}).get('yt') or '')
+                    self._store.put_many(items)
+                    self._store.set_meta('next_id', str(self.queue.last_id))
                 except Exception as e:
-                    it['status'] = 'erreur'
-                    it['result'] = str(e)
-                finally:
-                    try:
-                        if vf and os.path.exists(vf):
-                            os.remove(vf)
-                            d = os.path.dirname(vf)
-                            if os.path.isdir(d) and not os.listdir(d):
-                                os.rmdir(d)
-                    except Exception:
-                        pass
-                    self._save_queue()
-                    # Pause automatique après N éléments si activée
+                    log('error', f'webapp: import batch failed: {e}')
+            stats['added'] += len(items)
+            stats['batches'] += 1
+            self._wake_workers()
+        if self._store is None and stats['added']:
+            self._save_queue()
+        return stats
+
+    def import_file(self, path: str, fmt: str = '', **kw) -> Dict:
+        """Importe un fichier CSV/TXT/JSONL lu en flux (voir `t2y.bulk_import`).
+
+        Retourne added/duplicates/batches, `skipped` (lignes illisibles) et `format` (retenu).
+        """
+        if not fmt:
+            first = next(open_lines(path), '')
+            fmt = detect_format(path, first)
+        stats = {'skipped': 0}
+        self.queue_add_many(iter_entries(open_lines(path), fmt, stats), stats=stats, **kw)
+        stats['format'] = fmt
+        return stats
+
+    def _wake_workers(self):
+        with self._queue_cv:
+            self._queue_cv.notify_all()
+
+    def _queue_worker(self, gen: int):
+        # Plusieurs workers tournent en parallèle; un redémarrage (gen) congédie les anciens
+        while True:
+            with self._queue_cv:
+                # Attente sans CPU: réveil par queue_add/pause_queue/stop_queue/resume_errors
+                while (self.queue_running and gen == self._queue_gen
+                       and (self.queue_paused or not self.queue.ready_count())):
+                    self._queue_cv.wait()
+                if not self.queue_running or gen != self._queue_gen:
+                    break
+                # Dépilage O(1) des items prêts: les terminés ne sont jamais revus
+                it = self.queue.pop_ready()
+                if it is not None:
+                    self._active.add(it['iid'])
+            if it is None:
+                continue
+            resync = False
+            try:
+                if self.leases is not None and not self.leases.acquire(it['iid']):
+                    resync = True
+                elif not self.runner.quota_blocked(it):
+                    # bail perdu en route: l'item appartient désormais à un autre processus
+                    resync = not self.runner.process(it)
+            finally:
+                with self._queue_cv:
+                    self._active.discard(it['iid'])
+            if resync:
+                # Item pris par un autre processus worker (bail SQLite): relire son état en base
+                self._resync_item(it['iid'])
+
+    def _hold_for_quota(self, it: Dict, reset_at: float):
+        with self._lock:
+            it['status'] = 'quota'
+            it['result'] = 'quota YouTube épuisé — reprise au reset'
+            if self.leases is not None:
+                # Base partagée: réservé jusqu'au reset, puis remis en attente par `reclaim_expired`
+                # (ce processus ou un autre) et relu par la resynchronisation. Pas de minuterie locale.
+                self.leases.hold(it['iid'], reset_at)
+                return
+            # Sans baux (queue.json, journal): seul ce processus traite la file, il relâche lui-même
+            self._quota_held[it['iid']] = it
+            if self._quota_timer is None:
+                delay = max(1.0, reset_at - time.time()) + 5.0
+                self._quota_timer = threading.Timer(delay, self._release_quota_holds)
+                self._quota_timer.daemon = True
+                self._quota_timer.start()
+
+    def quota_status(self) -> Dict:
+        """Registre de quota par profil + nombre d'items retenus (par ce processus ou un worker)."""
+        return {**quota_ledger.snapshot(), 'held': self.queue.status_counts().get('quota', 0)}
+
+    def _release_quota_holds(self):
+        with self._lock:
+            held = list(self._quota_held.values())
+            self._quota_held.clear()
+            self._quota_timer = None
+        for it in held:
+            # déjà remis en attente (reprise en base, resynchronisation) voire repris
+            if it.get('iid') not in self.queue or it.get('status') != 'quota':
+                continue
+            it['status'] = 'en attente'
+            it['result'] = ''
+            self.queue.mark_ready(it)
+            self._save_item(it, 'status', 'result')
+        if held:
+            log('info', f'quota: {len(held)} item(s) remis en file après le reset')
+            self._wake_workers()
+
+    # --- agents distants (la webapp coordonne, l'agent exécute le pipeline) ---
+    def agent_lease(self, agent: str, ttl: float = AGENT_TTL, profile: Optional[str] = None) -> Optional[Dict]:
+        """Confie le prochain item prêt à un agent (bail de `ttl` s, prolongé par heartbeat)."""
+        owner = f'agent:{agent}'
+        ttl = agent_ttl(ttl)
+        match = None
+        if profile is not None:
+            match = lambda it: ((it.get('adv') or {}).get('profile') or '') == profile
+        while True:
+            with self._queue_cv:
+                if self.queue_paused:
+                    return None
+                it = self.queue.pop_ready(match)
+                if it is None:
+                    return None
+                self._active.add(it['iid'])
+            refused = False
+            try:
+                if self._store is not None and self.leases is not None and not self._store.acquire(it['iid'], owner, ttl):
+                    refused = True
+                elif not self.runner.quota_blocked(it):
+                    with self._lock:
+                        self._agent_leases[it['iid']] = {'agent': agent, 'owner': owner, 'expires': time.time() + ttl, 'ttl': ttl, 'item': it}
+                        if self._agent_reaper is None:
+                            self._agent_reaper = threading.Thread(target=self._reap_agent_leases, daemon=True)
+                            self._agent_reaper.start()
+                    self.progress.clear(it['iid'])
+                    self._set_status(it, 'en cours')
+                    return it
+            finally:
+                with self._queue_cv:
+                    self._active.discard(it['iid'])
+            if refused:
+                self._resync_item(it['iid'])
+
+    def _agent_item(self, agent: str, iid: str, extend: bool = True) -> Optional[Dict]:
+        """Item tenu par `agent` (None si bail inconnu, expiré ou repris); prolonge le bail."""
+        with self._lock:
+            rec = self._agent_leases.get(iid)
+            if rec is None or rec['agent'] != agent:
+                return None
+            if extend:
+                rec['expires'] = time.time() + rec['ttl']
+        if extend and self._store is not None and self.leases is not None:
+            try:
+                self._store.heartbeat([iid], rec['owner'], rec['ttl'])
+            except Exception:
+                pass
+        return rec['item']
+
+    def agent_heartbeat(self, agent: str, iid: str) -> bool:
+        return self._agent_item(agent, iid) is not None
+
+    def agent_progress(self, agent: str, iid: str, status: Optional[str] = None, badges: Optional[list] = None, **pcts) -> bool:
+        it = self._agent_item(agent, iid)
+        if it is None:
+            return False
+        self.progress.set(iid, **pcts)
+        if isinstance(badges, list):
+            it['badges'] = [str(b) for b in badges]
+            self._touch(it)
+        if status and status not in ('terminé', 'erreur', 'quota'):
+            self._set_status(it, status)
+        return True
+
+    def agent_complete(self, agent: str, iid: str, result: str = '', results: Optional[Dict] = None, badges: Optional[list] = None) -> bool:
+        it = self._agent_item(agent, iid, extend=False)
+        if it is None:
+            return False
+        with self._lock:
+            it['status'] = 'terminé'
+            it['finished_at'] = time.time()
+            it['results'] = dict(results or {})
+            it['result'] = result or it['results'].get('yt') or it['results'].get('ig') or it['results'].get('tt') or ''
+            if isinstance(badges, list):
+                it['badges'] = [str(b) for b in badges]
+            self.last_video_id = it['results'].get('yt') or ''
+        adv = it.get('adv') or {}
+        if it['results'].get('yt'):
+            # vue unifiée du quota: les uploads des agents sont décomptés ici aussi (sur leur réservation)
+            quota_ledger.charge(adv.get('profile'), 'videos.insert', iid=iid)
+            if adv.get('playlists'):
+                quota_ledger.charge(adv.get('profile'), 'playlistItems.insert', n=len(adv['playlists']), iid=iid)
+        self._finish_agent_item(iid)
+        return True
+
+    def agent_fail(self, agent: str, iid: str, error: str = '', quota_reset_at: Optional[float] = None) -> bool:
+        it = self._agent_item(agent, iid, extend=False)
+        if it is None:
+            return False
+        if quota_reset_at:
+            quota_ledger.mark_exhausted((it.get('adv') or {}).get('profile'))
+            self._hold_for_quota(it, float(quota_reset_at))
+        else:
+            with self._lock:
+                it['status'] = 'erreur'
+                it['result'] = error or 'échec agent'
+        self._finish_agent_item(iid)
+        return True
+
+    def _finish_agent_item(self, iid: str):
+        with self._lock:
+            rec = self._agent_leases.pop(iid, None)
+        if rec is None:
+            return
+        it = rec['item']
+        self.runner.release_quota(it)
+        self._save_item(it, 'status', 'result', 'results', 'badges', 'finished_at')
+        if self._store is not None and self.leases is not None:
+            try:
+                self._store.release(iid, rec['owner'])
+            except Exception:
+                pass
+
+    def _reap_agent_leases(self):
+        """Remet en file les items dont l'agent ne donne plus signe de vie."""
+        while True:
+            time.sleep(5.0)
+            now = time.time()
+            with self._lock:
+                expired = [rec for rec in self._agent_leases.values() if rec['expires'] < now]
+                for rec in expired:
+                    self._agent_leases.pop(rec['item']['iid'], None)
+                if not self._agent_leases and not expired:
+                    self._agent_reaper = None
+                    return
+            for rec in expired:
+                it = rec['item']
+                log('error', f"agent {rec['agent']}: bail expiré pour {it['iid']} — remis en attente")
+                self.runner.release_quota(it)
+                it['status'] = 'en attente'
+                it['result'] = ''
+                self.progress.clear(it['iid'])
+                self._save_item(it, 'status', 'result')
+                if self._store is not None and self.leases is not None:
                     try:
-                        if self.pause_after_n_enabled:
-                            n = int(self.pause_after_n_value or 0)
-                            if n > 0:
-                                self._processed_in_run += 1
-                                if self._processed_in_run >= n:
-                                    self.queue_paused = True
-                                    self._processed_in_run = 0
+                        self._store.release(it['iid'], rec['owner'])
                     except Exception:
                         pass
-            # end for
-            time.sleep(0.3)
-        self.queue_running = False
+                self.queue.mark_ready(it)
+            if expired:
+                self._wake_workers()
+
+    def agent_status(self) -> List[Dict]:
+        now = time.time()
+        with self._lock:
+            return [{'iid': iid, 'agent': rec['agent'], 'expires_in': round(rec['expires'] - now, 1)}
+                    for iid, rec in self._agent_leases.items()]
+
+    def _requeue(self, it: Dict):
+        """Remet en attente un item pris mais non lancé (arrêt de la file pendant une attente)."""
+        with self._lock:
+            it['status'] = 'en attente'
+        self.queue.mark_ready(it)
+
+    def _item_finished(self, it: Dict):
+        """Après la sauvegarde finale d'un item traité par ce processus."""
+        if it.get('status') == 'terminé':
+            self.last_video_id = (it.get('results', {}).get('yt') or '')
+        # Pause automatique après N éléments si activée
+        try:
+            if self.pause_after_n_enabled:
+                n = int(self.pause_after_n_value or 0)
+                if n > 0:
+                    with self._lock:
+                        self._processed_in_run += 1
+                        if self._processed_in_run >= n:
+                            self.queue_paused = True
+                            self._processed_in_run = 0
+                    if self.queue_paused:
+                        self.events.wake()
+        except Exception:
+            pass
 
     def start_queue(self):
         if not self.queue_running:
             self._processed_in_run = 0
-            self._queue_thread = threading.Thread(target=self._queue_worker, daemon=True)
-            self._queue_thread.start()
+            self.queue_running = True
+            self._queue_gen += 1
+            self.stages.resize(self.concurrency)
+            n = max(1, int(self.concurrency.get('workers') or 1))
+            if self.pipeline.get('enabled'):
+                # workers supplémentaires = items d'avance (bloqués ensuite sur les slots ffmpeg/upload)
+                n += int(self.pipeline.get('lookahead') or 0)
+                self.prefetch.max_bytes = int(float(self.pipeline.get('max_temp_gb') or 0) * 1024 ** 3)
+            else:
+                self.prefetch.max_bytes = 0
+            self._queue_threads = [
+                threading.Thread(target=self._queue_worker, args=(self._queue_gen,), daemon=True)
+                for _ in range(n)
+            ]
+            for t in self._queue_threads:
+                t.start()
+            self._queue_thread = self._queue_threads[0]
+            # congédier les workers d'une génération précédente encore en attente
+            self._wake_workers()
+            self.events.wake()
+
+    def set_concurrency(self, limits: Dict):
+        """Change les limites par étape (effet immédiat; `workers` au prochain démarrage)."""
+        for k in ('download', 'ffmpeg', 'upload', 'workers'):
+            if k in limits:
+                try:
+                    self.concurrency[k] = max(1, int(limits[k]))
+                except Exception:
+                    pass
+        self.stages.resize(self.concurrency)
+
+    def set_scheduler(self, mode: Optional[str] = None, horizon_h: Optional[float] = None):
+        """Change le mode d'ordonnancement (réordonne immédiatement les items prêts)."""
+        if mode is not None:
+            self.scheduler['mode'] = mode
+        if horizon_h is not None:
+            self.scheduler['horizon_h'] = max(0.0, float(horizon_h))
+        self.queue.set_mode(self.scheduler['mode'], self.scheduler['horizon_h'])
 
     def pause_queue(self, pause: bool):
-        self.queue_paused = bool(pause)
+        with self._queue_cv:
+            self.queue_paused = bool(pause)
+            self._queue_cv.notify_all()
+        self.events.wake()
 
     def stop_queue(self):
-        self.queue_running = False
+        with self._queue_cv:
+            self.queue_running = False
+            self._queue_cv.notify_all()
+        self.events.wake()
+        # débloquer les items en attente de place disque (mode pipeline, admission)
+        self.prefetch.wake()
+        self.workdirs.wake()
 
     def move_item(self, iid: str, direction: str) -> bool:
         try:
-            idx = next((i for i, it in enumerate(self.queue) if it.get('iid') == iid), -1)
-            if idx < 0:
+            other = self.queue.move(iid, direction)
+            if other is None:
                 return False
-            if direction == 'up' and idx > 0:
-                self.queue[idx-1], self.queue[idx] = self.queue[idx], self.queue[idx-1]
-            elif direction == 'down' and idx < len(self.queue)-1:
-                self.queue[idx+1], self.queue[idx] = self.queue[idx], self.queue[idx+1]
+            self._touch(self.queue.get(iid), self.queue.get(other))
+            if self._store is not None:
+                self._store.swap(iid, other)
             else:
-                return False
-            self._save_queue()
+                self._save_queue()
             return True
         except Exception:
             return False
 
     def clear_done(self) -> int:
+        """Archive immédiatement tous les items terminés (consultables via l'historique)."""
+        return self.archive_done(force=True)
+
+    def archive_done(self, force: bool = False) -> int:
+        """Déplace les terminés vers l'historique: ceux finis depuis plus de N minutes, puis les
+        plus anciens tant que la file dépasse `max_live` (tous si `force`)."""
         removed = 0
         try:
-            newq = []
-            for it in self.queue:
-                if (it.get('status') or '') == 'terminé':
-                    removed += 1
-                    continue
-                newq.append(it)
-            self.queue = newq
-            self._save_queue()
-        except Exception:
-            pass
+            cfg = self.history_settings
+            cutoff = time.time() - cfg['archive_after_min'] * 60.0
+            done = [it for it in self.queue if (it.get('status') or '') == 'terminé']
+            if force:
+                pick = {it['iid'] for it in done}
+            else:
+                pick = {it['iid'] for it in done if (it.get('finished_at') or 0) <= cutoff}
+                excess = len(self.queue) - len(pick) - cfg['max_live']
+                if cfg['max_live'] and excess > 0:
+                    rest = sorted((it for it in done if it['iid'] not in pick), key=lambda it: it.get('finished_at') or 0)
+                    pick.update(it['iid'] for it in rest[:excess])
+            if not pick:
+                return 0
+            moved = self.queue.remove_where(lambda it: it.get('iid') in pick)
+            removed = len(moved)
+            # archiver avant de supprimer: un crash entre les deux donne un doublon, jamais une perte
+            self.history.append(moved)
+            for it in moved:
+                self.progress.clear(it.get('iid'))
+                self._forget(it.get('iid'))
+            if self._store is not None:
+                self._store.delete_many([it.get('iid') for it in moved])
+            else:
+                self._save_queue()
+            log('info', f'history: {removed} item(s) archivé(s)')
+        except Exception as e:
+            log('error', f'history: archivage échoué: {e}')
         return removed
 
+    def _history_loop(self):
+        # orphelins d'une exécution précédente (crash, items supprimés hors ligne)
+        try:
+            self.workdirs.cleanup_orphans(keep=[it['iid'] for it in self.queue])
+        except Exception as e:
+            log('error', f'workdir: nettoyage des orphelins échoué: {e}')
+        last_gc = time.time()
+        while not self._history_stop.wait(60.0):
+            self.archive_done()
+            # dossiers de travail abandonnés (items supprimés ailleurs, crash...): une fois par heure
+            if time.time() - last_gc >= 3600.0:
+                last_gc = time.time()
+                gc_workdirs(keep=[it['iid'] for it in self.queue])
+
+    # --- resynchronisation avec la base partagée (workers autonomes) ---
+    def _resync_loop(self):
+        """Relit les changements de la base: statuts écrits par les workers autonomes, items remis
+        en attente (bail expiré, reset du quota), ajouts et suppressions d'autres processus."""
+        while not self._history_stop.wait(RESYNC_INTERVAL):
+            try:
+                self._resync()
+            except Exception as e:
+                log('error', f'webapp: resynchronisation de la file échouée: {e}')
+
+    def _resync(self):
+        rows, gone, rev = self._store.changes_since(self._store_rev)
+        now = time.time()
+        wake = False
+        with self._queue_cv:
+            for row, owner, expires in rows:
+                wake = self._apply_store_row(row, owner, expires, now) or wake
+            for iid in gone:
+                if iid in self._active or iid in self._agent_leases:
+                    continue
+                self._deferred.pop(iid, None)
+                if self.queue.remove(iid) is not None:
+                    self.progress.clear(iid)
+                    self._forget(iid)
+            # baux d'autres processus échus sans changement en base (ex: worker tué)
+            for iid, expires in list(self._deferred.items()):
+                if expires <= now:
+                    del self._deferred[iid]
+                    it = self.queue.get(iid)
+                    if it is not None and (it.get('status') or 'en attente') in LEASABLE_STATUSES:
+                        self.queue.mark_ready(it)
+                        wake = True
+            self._store_rev = rev
+            if wake:
+                self._queue_cv.notify_all()
+
+    def _resync_item(self, iid: str):
+        """Relit un seul item (bail refusé): remis en file, ou revu à l'expiration du bail."""
+        try:
+            got = self._store.get_leased(iid)
+        except Exception as e:
+            log('error', f'webapp: lecture de {iid} échouée: {e}')
+            return
+        if got is None:
+            return  # supprimé: retiré par la prochaine resynchronisation
+        with self._queue_cv:
+            if self._apply_store_row(*got, time.time()):
+                self._queue_cv.notify_all()
+
+    def _apply_store_row(self, row: Dict, owner: str, expires: float, now: float) -> bool:
+        """Applique une ligne de la base à la file en mémoire (`_queue_cv` tenu).
+
+        Retourne True si l'item redevient prêt (réveiller les workers).
+        """
+        iid = row['iid']
+        if iid in self._active or iid in self._agent_leases:
+            return False
+        it = self.queue.get(iid)
+        if it is None:
+            it = self.queue.append(row)
+            changed = True
+        else:
+            with self._lock:
+                changed = any(it.get(k) != v for k, v in row.items())
+                if changed:
+                    it.update(row)
+        if changed:
+            self._touch(it)
+        if (it.get('status') or 'en attente') in LEASABLE_STATUSES:
+            if not owner or expires <= now:
+                self._deferred.pop(iid, None)
+                self.queue.mark_ready(it)
+                return True
+            # réservé par un autre processus (bail, quota): revu à l'expiration
+            self._deferred[iid] = expires
+        else:
+            self._deferred.pop(iid, None)
+        self.queue.discard_ready(iid)
+        return False
+
     def resume_errors(self) -> int:
         changed = 0
         try:
@@ -478,23 +834,33 @@ class AppState:
                     it['status'] = 'en attente'
                     it['d_pct'] = 0
                     it['u_pct'] = 0
+                    self.progress.clear(it.get('iid'))
+                    self.queue.mark_ready(it)
                     changed += 1
-            if changed:
+                    if self._store is not None:
+                        self._save_item(it, 'status', 'd_pct', 'u_pct')
+                    else:
+                        self._touch(it)
+            if changed and self._store is None:
                 self._save_queue()
         except Exception:
             pass
+        if changed:
+            self._wake_workers()
         return changed
 
     def remove_item(self, iid: str) -> bool:
-        idx = -1
         try:
-            for i, it in enumerate(self.queue):
-                if (it.get('iid') or '') == iid:
-                    idx = i
-                    break
-            if idx >= 0:
-                self.queue.pop(idx)
-                self._save_queue()
+            if self.queue.remove(iid) is not None:
+                self.progress.clear(iid)
+                remove_workdir(iid)
+                self._forget(iid)
+                with self._lock:
+                    self._quota_held.pop(iid, None)
+                if self._store is not None:
+                    self._store.delete(iid)
+                else:
+                    self._save_queue()
                 return True
         except Exception:
             pass
@@ -502,6 +868,7 @@ class AppState:
 
     def _watch_worker(self):
         self.watch_running = True
+        stop = self._watch_stop
         while self.watch_running:
             try:
                 handle = (self.handle or '').strip()
@@ -509,14 +876,10 @@ class AppState:
                     handle = f'https://www.tiktok.com/{handle}'
                 if not handle:
                     break
-                # list videos flat
-                try:
-                    import yt_dlp
-                except Exception:
-                    yt_dlp = None
+                # list videos flat (instance du pool réutilisée d'une scrutation à l'autre)
                 urls = []
-                if yt_dlp is not None:
-                    with yt_dlp.YoutubeDL({'extract_flat': True, 'skip_download': True}) as ydl:
+                if ydl_pool_available():
+                    with ydl_pool.get({'extract_flat': True, 'skip_download': True}) as ydl:
                         info = ydl.extract_info(handle, download=False)
                         for e in (info.get('entries') or []):
                             u = e.get('url') or e.get('webpage_url')
@@ -528,7 +891,7 @@ class AppState:
                         break
                     if u in self._seen:
                         continue
-                    meta = fetch_tiktok_metadata(u) or {}
+                    meta = fetch_tiktok_metadata(u, with_info=True) or {}
                     # Filtres (mots-clés + durée)
                     def _ok(meta):
                         try:
@@ -556,7 +919,8 @@ class AppState:
                     title = meta.get('title') or ''
                     desc = (meta.get('description') or '').strip()
                     tags = meta.get('hashtags') or []
-                    self.queue_add(u, title, desc, tags)
+                    # classe 'bulk': les ajouts manuels et les posts programmés passent devant
+                    self.queue_add(u, title, desc, tags, priority='bulk', ie_info=meta.get('info'))
                     self._seen.add(u)
                     self._save_watch()
                     added += 1
@@ -570,12 +934,13 @@ class AppState:
                 from datetime import datetime
                 self.last_poll = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 self._save_watch()
+                self.events.publish('watch', {'running': self.watch_running, 'handle': self.handle,
+                                              'last_poll': self.last_poll})
             except Exception:
                 pass
-            for _ in range(int(t)):
-                if not self.watch_running:
-                    break
-                time.sleep(1)
+            # attente interruptible: stop_watch réveille immédiatement
+            if stop.wait(t):
+                break
         self.watch_running = False
 
     def start_watch(self, handle: str, interval_min: float, quota: int, inc_kw: list[str] | None = None, exc_kw: list[str] | None = None, min_dur: int = 0, max_dur: int = 0):
@@ -588,11 +953,32 @@ class AppState:
         self.max_dur = int(max_dur or 0)
         self._save_watch()
         if not self.watch_running:
+            # un Event par exécution: un ancien watcher en fin de course ne peut pas être relancé
+            self._watch_stop = threading.Event()
             self._watch_thread = threading.Thread(target=self._watch_worker, daemon=True)
             self._watch_thread.start()
 
     def stop_watch(self):
         self.watch_running = False
+        self._watch_stop.set()
+
+
+_state: Optional[AppState] = None
+_state_lock = threading.Lock()
+
+
+def get_state() -> AppState:
+    """Instance de la webapp (file, historique, flux SSE), construite au premier appel."""
+    global _state
+    with _state_lock:
+        if _state is None:
+            _state = AppState()
+        return _state
 
 
-state = AppState()
+def __getattr__(name):
+    # `from .state import state`: construction paresseuse, pour que les workers autonomes et
+    # les agents importent `AppState` sans démarrer la file et les threads de la webapp
+    if name == 'state':
+        return get_state()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
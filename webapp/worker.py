@@ -0,0 +1,108 @@
+"""
+Processus worker autonome partageant la file de la webapp (backend SQLite).
+
+Exemples:
+    python -m webapp.worker                       # tous les items
+    python -m webapp.worker --profile chaine2     # seulement le profil YouTube "chaine2"
+    python -m webapp.worker --threads 2 --name gpu
+
+Chaque item est pris en bail (owner = hôte:pid:nom); le bail est prolongé tant que
+le processus vit. Si le processus meurt, l'item est repris après expiration du bail
+par la webapp ou un autre worker.
+
+Le worker n'ouvre que la base, les limiteurs d'étapes et le pipeline (pas d'historique,
+de nettoyage ni de flux SSE); la webapp relit la base pour afficher ses statuts.
+"""
+from __future__ import annotations
+from typing import Dict
+import argparse
+import threading
+
+from t2y.leases import LeaseKeeper, make_owner, supports_leases, DEFAULT_TTL
+from t2y.logger import log
+from t2y.pipeline import StageLimiter, PrefetchGate, load_concurrency
+from t2y.progress import ProgressRegistry
+from t2y.queue_store import open_queue_store
+from t2y.workdir import manager as workdirs
+from webapp.runner import ItemRunner
+
+
+def _make_runner(store, keeper: LeaseKeeper, stop: threading.Event) -> ItemRunner:
+    """Pipeline sans file en mémoire: la base SQLite est la seule source.
+
+    Ni historique ni ramasse-miettes des dossiers (tâches de la webapp), ni flux SSE ni
+    ChangeLog: les statuts écrits en base sont relus par la webapp (resynchronisation).
+    """
+    lock = threading.RLock()
+
+    def _save(it: Dict, *keys: str):
+        try:
+            store.update(it.get('iid'), {k: it.get(k) for k in keys})
+        except Exception as e:
+            log('error', f'worker: save item failed: {e}')
+
+    def _requeue(it: Dict):
+        # le bail est rendu par le runner: l'item redevient disponible pour tous
+        with lock:
+            it['status'] = 'en attente'
+
+    def _hold_for_quota(it: Dict, reset_at: float):
+        with lock:
+            it['status'] = 'quota'
+            it['result'] = 'quota YouTube épuisé — reprise au reset'
+        # réservé jusqu'au reset, puis remis en attente par `reclaim_expired` (webapp ou worker)
+        keeper.hold(it['iid'], reset_at)
+
+    return ItemRunner(ProgressRegistry(), StageLimiter(load_concurrency()), PrefetchGate(), workdirs,
+                      save=_save, requeue=_requeue, hold_for_quota=_hold_for_quota,
+                      running=lambda: not stop.is_set(), leases=keeper, lock=lock)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description='Worker de file TikTok → YouTube (baux SQLite)')
+    ap.add_argument('--name', default='worker', help='suffixe du propriétaire des baux')
+    ap.add_argument('--profile', default=None, help="ne traiter que ce profil YouTube ('' = défaut)")
+    ap.add_argument('--threads', type=int, default=1, help='items traités en parallèle')
+    ap.add_argument('--ttl', type=float, default=DEFAULT_TTL, help='durée du bail (s)')
+    ap.add_argument('--poll', type=float, default=2.0, help='intervalle de scrutation quand la file est vide (s)')
+    ap.add_argument('--once', action='store_true', help="s'arrêter quand la file est vide")
+    args = ap.parse_args(argv)
+
+    store = open_queue_store()
+    if not supports_leases(store):
+        print('Le worker autonome nécessite le backend SQLite (T2Y_QUEUE_BACKEND=sqlite).')
+        return 2
+    keeper = LeaseKeeper(store, make_owner(args.name), ttl=args.ttl)
+    stop = threading.Event()
+    runner = _make_runner(store, keeper, stop)
+
+    def _loop():
+        while not stop.is_set():
+            it = keeper.lease_next(profile=args.profile)
+            if it is None:
+                if args.once:
+                    break
+                # pas de notification inter-processus: scrutation lente de la base
+                stop.wait(args.poll)
+                continue
+            if runner.quota_blocked(it):
+                continue
+            log('info', f"worker {keeper.owner}: {it['iid']} {it.get('url', '')}")
+            runner.process(it)
+
+    threads = [threading.Thread(target=_loop, daemon=True) for _ in range(max(1, args.threads))]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            while t.is_alive():
+                t.join(1.0)
+    except KeyboardInterrupt:
+        stop.set()
+    finally:
+        keeper.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())